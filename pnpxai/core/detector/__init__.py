@@ -1 +1,2 @@
 from .detector import detect_model_architecture, symbolic_trace, extract_graph_data
+from .graph import ModelGraph
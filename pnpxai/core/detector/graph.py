@@ -0,0 +1,141 @@
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+import threading
+import weakref
+
+import torch
+from torch import Tensor, fx, nn
+
+from pnpxai.utils import select_batch
+from .detector import symbolic_trace, DEFAULT_MODULE_TYPES_TO_DETECT
+from .types import ModuleType
+
+
+class ModelGraph:
+    """
+    Analyses of a model shared by explainers, traced once and memoized per model.
+
+    `ModelGraph.of(model)` returns the same instance for the same model object. Artifacts such as
+    traces, the module inventory or ones derived by explainers (e.g. the CAM target layer) are
+    computed on first access by `get` and reused afterwards.
+
+    Memoized artifacts are dropped when the version of the model changes. The version consists of
+    identities of its modules and parameters, which change when modules or parameters are replaced,
+    and a counter bumped by `invalidate`. In-place updates of parameter values do not change the
+    structure of the graph, so they keep the artifacts, e.g. while canonizers of LRP temporarily
+    merge batch norms into weights.
+
+    Parameters:
+        model (nn.Module): The model to analyse.
+    """
+
+    _instances: 'weakref.WeakKeyDictionary[nn.Module, ModelGraph]' = weakref.WeakKeyDictionary()
+    _instances_lock = threading.Lock()
+
+    def __init__(self, model: nn.Module):
+        self._model_ref = weakref.ref(model)
+        self._counter = 0
+        self._version = None
+        self._artifacts: Dict[Hashable, Any] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def of(cls, model: nn.Module) -> 'ModelGraph':
+        with cls._instances_lock:
+            graph = cls._instances.get(model)
+            if graph is None:
+                graph = cls._instances[model] = cls(model)
+            return graph
+
+    @property
+    def model(self) -> nn.Module:
+        model = self._model_ref()
+        assert model is not None, "The model of the graph has been garbage collected."
+        return model
+
+    @property
+    def version(self) -> Tuple:
+        model = self.model
+        return (
+            self._counter,
+            tuple((name, id(module)) for name, module in model.named_modules()),
+            tuple(id(param) for param in model.parameters()),
+        )
+
+    def invalidate(self):
+        """
+        Drops all memoized artifacts, e.g. after the model was modified in a way its version does not capture.
+        """
+        with self._lock:
+            self._counter += 1
+            self._artifacts.clear()
+
+    def get(self, key: Hashable, compute: Callable[['ModelGraph'], Any]) -> Any:
+        """
+        Returns the artifact of the key, computing it by `compute(self)` if not memoized for the current version.
+        """
+        with self._lock:
+            self._sync_version()
+            if key not in self._artifacts:
+                self._artifacts[key] = compute(self)
+            return self._artifacts[key]
+
+    def set(self, key: Hashable, value: Any):
+        """
+        Seeds the artifact of the key for the current version, e.g. from results computed elsewhere.
+        """
+        with self._lock:
+            self._sync_version()
+            self._artifacts[key] = value
+
+    def _sync_version(self):
+        version = self.version
+        if version != self._version:
+            self._artifacts.clear()
+            self._version = version
+
+    @property
+    def trace(self) -> fx.GraphModule:
+        """
+        The model traced by the tracer of the detector, keeping modules such as timm's attention as leaves.
+        """
+        return self.get('trace', lambda graph: symbolic_trace(graph.model))
+
+    @property
+    def fx_trace(self) -> fx.GraphModule:
+        """
+        The model traced by `torch.fx.symbolic_trace`.
+        """
+        return self.get('fx_trace', lambda graph: fx.symbolic_trace(graph.model))
+
+    def n_classes(self, inputs: Tuple[Tensor, ...]) -> int:
+        """
+        The size of the last dimension of outputs, inferred by a dry run of the first sample of
+        inputs unless seeded with `set('n_classes', ...)`. Inputs whose leading dimension is not the
+        batch size of the first input are passed as they are.
+        """
+        return self.get('n_classes', lambda graph: _infer_n_classes(graph.model, inputs))
+
+    @property
+    def inventory(self) -> Dict[ModuleType, List[str]]:
+        """
+        Names of modules per detected module type.
+        """
+        return self.get('inventory', _inventory)
+
+
+def _infer_n_classes(model: nn.Module, inputs: Tuple[Tensor, ...]) -> int:
+    bsz = len(inputs[0])
+    indices = torch.arange(1, device=inputs[0].device)
+    with torch.no_grad():
+        outputs = model(*select_batch(tuple(inputs), indices, bsz=bsz))
+    return outputs.shape[-1]
+
+
+def _inventory(graph: ModelGraph) -> Dict[ModuleType, List[str]]:
+    inventory = {}
+    for name, module in graph.model.named_modules():
+        module_type = next(
+            (target for target in DEFAULT_MODULE_TYPES_TO_DETECT if isinstance(module, target)), None)
+        if module_type is not None:
+            inventory.setdefault(module_type, []).append(name)
+    return inventory
@@ -9,6 +9,9 @@ from pnpxai.core.experiment.experiment import Experiment
 from pnpxai.core.modality.modality import Modality, ImageModality, TextModality, TimeSeriesModality
 from pnpxai.core.recommender import XaiRecommender
 from pnpxai.explainers.types import TargetLayer
+from pnpxai.explainers.perturbation import PerturbationEngine
+from pnpxai.explainers.gradient_cache import GradientCache
+from pnpxai.explainers.cam_engine import CamEngine
 from pnpxai.evaluator.metrics import PIXEL_FLIPPING_METRICS
 from pnpxai.evaluator.metrics import (
     MuFidelity,
@@ -42,6 +45,15 @@ class AutoExplanation(Experiment):
         target_extractor (Optional[Callable], optional): Custom function to extract target features.
         input_visualizer (Optional[Callable], optional): Custom function for visualizing input features.
         target_labels (Optional[bool]): Whether to use target labels.
+        share_perturbations (bool): Whether Lime and KernelShap fit their surrogates on forwards of
+            perturbed inputs shared by a `PerturbationEngine`, instead of sampling them separately by captum.
+            This changes results of Lime, whose shared surrogate is a ridge regression weighted by the
+            cosine similarity of coalitions rather than captum's lasso weighted by the similarity of inputs.
+        share_gradients (bool): Whether Gradient, GradientXInput and the noise-free copies of SmoothGrad and
+            VarGrad share plain input gradients by a `GradientCache`. Lookups hash the contents of inputs, which
+            pays off only if several of them explain the same data.
+        share_cams (bool): Whether GradCam and GuidedGradCam share forwards and gradients of the target layer
+            computed by a `CamEngine`, instead of running captum's implementations separately.
 
     Attributes:
         recommended (RecommenderOutput): A data object, containing recommended explainers.
@@ -55,8 +67,14 @@ class AutoExplanation(Experiment):
         input_extractor: Optional[Callable] = None,
         label_extractor: Optional[Callable] = None,
         target_extractor: Optional[Callable] = None,
-        target_labels: bool = False
+        target_labels: bool = False,
+        share_perturbations: bool = False,
+        share_gradients: bool = False,
+        share_cams: bool = False,
     ):
+        self.share_perturbations = share_perturbations
+        self.share_gradients = share_gradients
+        self.share_cams = share_cams
         self.recommended = XaiRecommender().recommend(modality=modality, model=model)
         self.modality = modality
 
@@ -75,9 +93,21 @@ class AutoExplanation(Experiment):
 
     def _load_default_explainers(self, model):
         explainers = []
+        # perturbation-based explainers share forwards of perturbed inputs if opted in
+        perturbation_engine = PerturbationEngine(model) if self.share_perturbations else None
+        # gradient-based explainers share plain input gradients if opted in
+        gradient_cache = GradientCache() if self.share_gradients else None
+        # cam-based explainers share activations and gradients of the target layer if opted in
+        cam_engine = CamEngine(model) if self.share_cams else None
         for explainer_type in self.recommended.explainers:
             explainer = explainer_type(model=model)
             default_kwargs = self._generate_default_kwargs_for_explainer()
+            if perturbation_engine is not None:
+                default_kwargs['perturbation_engine'] = perturbation_engine
+            if gradient_cache is not None:
+                default_kwargs['gradient_cache'] = gradient_cache
+            if cam_engine is not None:
+                default_kwargs['cam_engine'] = cam_engine
             for k, v in default_kwargs.items():
                 if hasattr(explainer, k):
                     explainer = explainer.set_kwargs(**{k: v})
@@ -129,6 +159,9 @@ class AutoExplanationForImageClassification(AutoExplanation):
         target_extractor (Optional[Callable]): Custom function to extract target features.
         target_labels (Optional[bool]): Whether to use target labels.
         channel_dim (int): Channel dimension.
+        share_perturbations (bool): Whether Lime and KernelShap share forwards of perturbed inputs.
+        share_gradients (bool): Whether gradient-based explainers share plain input gradients.
+        share_cams (bool): Whether GradCam and GuidedGradCam share forwards of the target layer.
 
     Attributes:
         modality (ImageModality): An object to specify modality-specific workflow.
@@ -143,6 +176,9 @@ class AutoExplanationForImageClassification(AutoExplanation):
         target_extractor: Optional[Callable] = None,
         target_labels: bool = False,
         channel_dim: int = 1,
+        share_perturbations: bool = False,
+        share_gradients: bool = False,
+        share_cams: bool = False,
     ):
         super().__init__(
             model=model,
@@ -151,7 +187,10 @@ class AutoExplanationForImageClassification(AutoExplanation):
             input_extractor=input_extractor,
             label_extractor=label_extractor,
             target_extractor=target_extractor,
-            target_labels=target_labels
+            target_labels=target_labels,
+            share_perturbations=share_perturbations,
+            share_gradients=share_gradients,
+            share_cams=share_cams,
         )
 
 
@@ -171,6 +210,9 @@ class AutoExplanationForTextClassification(AutoExplanation):
         target_extractor (Optional[Callable], optional): Custom function to extract target features.
         target_labels (Optional[bool]): Whether to use target labels.
         channel_dim (int): Channel dimension.
+        share_perturbations (bool): Whether Lime and KernelShap share forwards of perturbed inputs.
+        share_gradients (bool): Whether gradient-based explainers share plain input gradients.
+        share_cams (bool): Whether GradCam and GuidedGradCam share forwards of the target layer.
 
     Attributes:
         modality (ImageModality): An object to specify modality-specific workflow.
@@ -189,6 +231,9 @@ class AutoExplanationForTextClassification(AutoExplanation):
         target_extractor: Optional[Callable] = None,
         target_labels: bool = False,
         channel_dim: int = -1,
+        share_perturbations: bool = False,
+        share_gradients: bool = False,
+        share_cams: bool = False,
     ):
         self.layer = layer
         self.mask_token_id = mask_token_id
@@ -203,7 +248,10 @@ class AutoExplanationForTextClassification(AutoExplanation):
             input_extractor=input_extractor,
             label_extractor=label_extractor,
             target_extractor=target_extractor,
-            target_labels=target_labels
+            target_labels=target_labels,
+            share_perturbations=share_perturbations,
+            share_gradients=share_gradients,
+            share_cams=share_cams,
         )
 
     def _generate_default_kwargs_for_explainer(self):
@@ -239,6 +287,9 @@ class AutoExplanationForVisualQuestionAnswering(AutoExplanation):
         target_extractor (Optional[Callable], optional): Custom function to extract target features.
         target_labels (Optional[bool]): Whether to use target labels.
         channel_dim (Tuple[int]): Channel dimension. Requires a tuple channel dimensions for image and text modalities.
+        share_perturbations (bool): Whether Lime and KernelShap share forwards of perturbed inputs.
+        share_gradients (bool): Whether gradient-based explainers share plain input gradients.
+        share_cams (bool): Whether GradCam and GuidedGradCam share forwards of the target layer.
 
     Attributes:
         modality (Tuple[ImageModality, TextModality]): A tuple of objects to specify modality-specific workflow.
@@ -257,6 +308,9 @@ class AutoExplanationForVisualQuestionAnswering(AutoExplanation):
         target_extractor: Optional[Callable] = None,
         target_labels: bool = False,
         channel_dim: Tuple[int] = (1, -1),
+        share_perturbations: bool = False,
+        share_gradients: bool = False,
+        share_cams: bool = False,
     ):
         self.layer = layer
         self.mask_token_id = mask_token_id
@@ -272,7 +326,10 @@ class AutoExplanationForVisualQuestionAnswering(AutoExplanation):
             input_extractor=input_extractor,
             label_extractor=label_extractor,
             target_extractor=target_extractor,
-            target_labels=target_labels
+            target_labels=target_labels,
+            share_perturbations=share_perturbations,
+            share_gradients=share_gradients,
+            share_cams=share_cams,
         )
 
     def _generate_default_kwargs_for_explainer(self):
@@ -310,6 +367,9 @@ class AutoExplanationForTSClassification(AutoExplanation):
         target_labels (Optional[bool]): Whether to use target labels.
         sequence_dim (Tuple[int]): Sequence dimension.
         mask_agg_dim (Tuple[int]): A dimension for aggregating mask values. Usually, a channel dimension.
+        share_perturbations (bool): Whether Lime and KernelShap share forwards of perturbed inputs.
+        share_gradients (bool): Whether gradient-based explainers share plain input gradients.
+        share_cams (bool): Whether GradCam and GuidedGradCam share forwards of the target layer.
 
     Attributes:
         modality (TimeSeriesModality): An object to specify modality-specific workflow.
@@ -325,6 +385,9 @@ class AutoExplanationForTSClassification(AutoExplanation):
         target_labels: bool = False,
         sequence_dim: int = -1,
         mask_agg_dim: int = -2,
+        share_perturbations: bool = False,
+        share_gradients: bool = False,
+        share_cams: bool = False,
     ):
         self.mask_agg_dim = mask_agg_dim
         super().__init__(
@@ -334,7 +397,10 @@ class AutoExplanationForTSClassification(AutoExplanation):
             input_extractor=input_extractor,
             label_extractor=label_extractor,
             target_extractor=target_extractor,
-            target_labels=target_labels
+            target_labels=target_labels,
+            share_perturbations=share_perturbations,
+            share_gradients=share_gradients,
+            share_cams=share_cams,
         )
 
     def _generate_default_kwargs_for_metric(self):
@@ -1,34 +1,308 @@
-from typing import Any, Optional, Union
+from typing import Any, Optional, Union, Literal, Dict, List, Tuple
+import inspect
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+import numpy as np
 import torch
-from pnpxai.utils import to_device
+from torch import nn
+from pnpxai.core.experiment.cache_index import CacheIndex
+from pnpxai.core.experiment.disk_cache import DiskCache
+from pnpxai.utils import to_device, flatten, class_to_string, tensor_fingerprint
+
+
+EvictionPolicy = Literal['lru', 'layer']
+
+
+def _synchronized(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class ExperimentCache:
+    """
+    A key-value cache of model outputs, explanations and evaluations produced by an experiment.
+
+    The cache optionally keeps the total size of cached tensors under a byte budget. When the budget
+    is exceeded, entries are evicted either in least-recently-used order (`'lru'`) or layer by layer
+    (`'layer'`): evaluations first, then explanations, then outputs, each in LRU order.
+
+    Keys are content-addressed: explainers, postprocessors and metrics are keyed by fingerprints of their
+    classes and hyperparameters registered by `set_fingerprint`, and all keys are bound to the fingerprint
+    of the model weights. Duplicate configurations therefore share cached results, and results of a
+    changed configuration are never served for the new one.
+
+    If `cache_dir` is given, explanations and evaluations are also written to a `DiskCache` under the
+    directory when `flush` is called, and lookups missing in memory fall back to it. As keys do not depend
+    on the order objects are added in, the directory can be shared across experiments and processes
+    working on the same data.
+
+    Which results are available, in memory or on disk, is tracked by a `CacheIndex` of dense flags, so
+    that finding missing work over many data is a vectorized query (see `computed` and `missing`).
+
+    Args:
+        cache_device (Optional[Union[torch.device, str]]): Device to store cached tensors on.
+        max_bytes (Optional[int]): Byte budget of cached tensors. If None, the cache is unbounded.
+            The latest entry is never evicted, even if it exceeds the budget alone.
+        eviction_policy (EvictionPolicy): Order of eviction when the budget is exceeded.
+        cache_dir (Optional[str]): Directory of the persistent tier. If None, nothing is persisted.
+        model_fingerprint (Optional[str]): Fingerprint of the model weights, e.g. computed by
+            `get_model_fingerprint`.
+
+    Attributes:
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of lookups not found in the cache.
+        evictions (int): Number of entries evicted to keep the cache under the budget.
+        disk_hits (int): Number of lookups served from the persistent tier.
+        nbytes (int): Total size of cached tensors in bytes.
+
+    All public methods are serialized by a reentrant lock, so that the cache can be shared by threads of
+    a pipelined experiment.
+    """
+
+    __MODEL_KEY = "model"
     __EXPLAINER_KEY = "explainer"
     __METRIC_KEY = "metric"
     __POSTPROCESSOR_KEY = "postprocessor"
     __EVALUATION_KEY = "evaluation"
     __DATA_KEY = "data"
 
-    def __init__(self, cache_device: Optional[Union[torch.device, str]] = None):
+    OUTPUT_LAYER = "output"
+    EXPLANATION_LAYER = "explanation"
+    EVALUATION_LAYER = "evaluation"
+    # eviction order of the 'layer' policy
+    LAYER_EVICTION_ORDER = (EVALUATION_LAYER, EXPLANATION_LAYER, OUTPUT_LAYER)
+
+    def __init__(
+        self,
+        cache_device: Optional[Union[torch.device, str]] = None,
+        max_bytes: Optional[int] = None,
+        eviction_policy: EvictionPolicy = 'lru',
+        cache_dir: Optional[str] = None,
+        model_fingerprint: Optional[str] = None,
+    ):
         cpu_device = torch.device("cpu")
         if isinstance(cache_device, str):
             cache_device = torch.device(cache_device)
         self._device = cache_device if cache_device is not None else cpu_device
+        self._lock = threading.RLock()
+
+        assert eviction_policy in ('lru', 'layer'), \
+            f"Unsupported eviction policy: {eviction_policy}"
+        self.max_bytes = max_bytes
+        self.eviction_policy = eviction_policy
+        self._disk = DiskCache(cache_dir) if cache_dir is not None else None
+        self.model_fingerprint = model_fingerprint
+        self._fingerprints: Dict[str, Dict[int, str]] = {
+            self.__EXPLAINER_KEY: {},
+            self.__POSTPROCESSOR_KEY: {},
+            self.__METRIC_KEY: {},
+        }
+        self.clear()
 
-        self._global_cache = {}
+    @property
+    def disk(self) -> Optional[DiskCache]:
+        return self._disk
+
+    @_synchronized
+    def clear(self):
+        """
+        Clears entries in memory. Entries in the persistent tier are kept.
+        """
+        # insertion order of the ordered dicts keeps the LRU order
+        self._global_cache: Dict[str, Any] = OrderedDict()
+        self._layers: Dict[str, Dict[str, int]] = {
+            layer: OrderedDict() for layer in self.LAYER_EVICTION_ORDER
+        }
+        self.nbytes = 0
+        # entries to be written to the persistent tier
+        self._pending: List[Tuple[str, Any]] = []
+        self._index = CacheIndex()
+        # key -> coordinates in the index, to unflag evicted entries
+        self._coords: Dict[str, Tuple[int, ...]] = {}
+        # data ids of results on disk, grouped by fingerprints they depend on
+        self._disk_groups = self._group_disk_keys()
+        for kind, fingerprints in self._fingerprints.items():
+            for fingerprint in fingerprints.values():
+                self._index.column(kind, fingerprint)
+        self._mark_disk_groups()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'disk_hits': self.disk_hits,
+            'entries': len(self._global_cache),
+            'nbytes': self.nbytes,
+        }
+
+    def __len__(self):
+        return len(self._global_cache)
 
     def to_device(self, x):
         return to_device(x, self._device)
 
+    @_synchronized
+    def set_fingerprint(self, kind: str, id: int, fingerprint: str):
+        """
+        Registers the fingerprint of an explainer, a postprocessor or a metric, which replaces its id in keys.
+
+        Args:
+            kind (str): One of 'explainer', 'postprocessor' and 'metric'.
+            id (int): Id of the object.
+            fingerprint (str): Fingerprint of the object, e.g. computed by `get_fingerprint`.
+        """
+        assert kind in self._fingerprints, f"Unsupported kind: {kind}"
+        self._fingerprints[kind][id] = fingerprint
+        if not self._index.has_column(kind, fingerprint):
+            self._index.column(kind, fingerprint)
+            self._mark_disk_groups()
+
+    def _get_fingerprint(self, kind: str, id: int) -> str:
+        # objects without a registered fingerprint are keyed by their ids
+        return self._fingerprints[kind].get(id, str(id))
+
+    def _group_disk_keys(self) -> Dict[Tuple[str, ...], np.ndarray]:
+        if self._disk is None:
+            return {}
+        groups = {}
+        for key in self._disk.keys():
+            tokens = dict(token.split('_', 1) for token in key.split('.'))
+            if tokens.get(self.__MODEL_KEY) != self.model_fingerprint:
+                continue
+            group = tuple(
+                tokens[name] for name in
+                (self.__EXPLAINER_KEY, self.__POSTPROCESSOR_KEY, self.__EVALUATION_KEY)
+                if name in tokens
+            )
+            groups.setdefault(group, []).append(int(tokens[self.__DATA_KEY]))
+        return {group: np.asarray(data_ids) for group, data_ids in groups.items()}
+
+    def _mark_disk_groups(self):
+        # flags results on disk whose fingerprints are all registered
+        kinds = (self.__EXPLAINER_KEY, self.__POSTPROCESSOR_KEY, self.__METRIC_KEY)
+        for group, data_ids in self._disk_groups.items():
+            if not all(self._index.has_column(kind, fp) for kind, fp in zip(kinds, group)):
+                continue
+            cols = tuple(self._index.column(kind, fp) for kind, fp in zip(kinds, group))
+            self._index.mark_many(data_ids, *cols)
+
+    def _get_coords(
+        self,
+        data_id: int,
+        explainer_id: Optional[int] = None,
+        postprocessor_id: Optional[int] = None,
+        metric_id: Optional[int] = None,
+    ) -> Tuple[int, ...]:
+        coords = (data_id,)
+        if explainer_id is None:
+            return coords
+        coords += (self._get_column(self.__EXPLAINER_KEY, explainer_id),)
+        if metric_id is None:
+            return coords
+        return coords + (
+            self._get_column(self.__POSTPROCESSOR_KEY, postprocessor_id),
+            self._get_column(self.__METRIC_KEY, metric_id),
+        )
+
+    def _get_column(self, kind: str, id: int) -> int:
+        return self._index.column(kind, self._get_fingerprint(kind, id))
+
+    @_synchronized
+    def computed(
+        self,
+        data_ids: List[int],
+        explainer_id: Optional[int] = None,
+        postprocessor_id: Optional[int] = None,
+        metric_id: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Flags which of outputs, explanations or evaluations of data are available.
+
+        Args:
+            data_ids (List[int]): Data ids to look up.
+            explainer_id (Optional[int]): If given, explanations of the explainer are looked up.
+            postprocessor_id (Optional[int]): Id of the postprocessor of evaluations.
+            metric_id (Optional[int]): If given, evaluations of the metric are looked up.
+
+        Returns:
+            np.ndarray: A boolean array aligned with `data_ids`.
+        """
+        cols = self._get_coords(0, explainer_id, postprocessor_id, metric_id)[1:]
+        return self._index.query(data_ids, *cols)
+
+    @_synchronized
+    def missing(
+        self,
+        data_ids: List[int],
+        explainer_id: Optional[int] = None,
+        postprocessor_id: Optional[int] = None,
+        metric_id: Optional[int] = None,
+    ) -> List[int]:
+        """
+        Returns data ids whose outputs, explanations or evaluations are not available.
+        """
+        flags = self.computed(data_ids, explainer_id, postprocessor_id, metric_id)
+        return np.asarray(data_ids, dtype=np.int64)[~flags].tolist()
+
+    @_synchronized
+    def computed_evaluations(
+        self,
+        data_ids: List[int],
+        explainer_ids: List[int],
+        postprocessor_ids: List[int],
+        metric_ids: List[int],
+    ) -> np.ndarray:
+        """
+        Flags which evaluations are available over a grid of ids.
+
+        Returns:
+            np.ndarray: A boolean array of shape (explainers, postprocessors, metrics, data).
+        """
+        return self._index.query_evaluations(
+            data_ids,
+            [self._get_column(self.__EXPLAINER_KEY, idx) for idx in explainer_ids],
+            [self._get_column(self.__POSTPROCESSOR_KEY, idx) for idx in postprocessor_ids],
+            [self._get_column(self.__METRIC_KEY, idx) for idx in metric_ids],
+        )
+
+    @_synchronized
+    def flush(self):
+        """
+        Writes explanations and evaluations set since the last flush to the persistent tier.
+        """
+        if self._disk is None:
+            return
+        pending, self._pending = self._pending, []
+        self._disk.put_many(
+            [key for key, _ in pending],
+            [value for _, value in pending],
+        )
+
+    @_synchronized
     def get_output(self, data_id: int) -> Optional[Any]:
         key = self._get_key(data_id)
-        return self._global_cache.get(key, None)
+        return self._get(key, self.OUTPUT_LAYER)
 
+    @_synchronized
     def get_explanation(self, data_id: int, explainer_id: int) -> Optional[Any]:
         key = self._get_key(data_id, explainer_id)
-        return self._global_cache.get(key, None)
+        return self._get(key, self.EXPLANATION_LAYER)
 
+    @_synchronized
     def get_evaluation(
         self,
         data_id: int,
@@ -37,16 +311,21 @@ class ExperimentCache:
         metric_id: int
     ) -> Optional[Any]:
         key = self._get_key(data_id, explainer_id, postprocessor_id, metric_id)
-        return self._global_cache.get(key, None)
+        return self._get(key, self.EVALUATION_LAYER)
 
+    @_synchronized
     def set_output(self, data_id: int, output: Any):
         key = self._get_key(data_id)
-        self._global_cache[key] = self.to_device(output)
+        self._set(key, self.OUTPUT_LAYER, output, self._get_coords(data_id))
 
+    @_synchronized
     def set_explanation(self, data_id: int, explainer_id: int, explanation: Any):
         key = self._get_key(data_id, explainer_id)
-        self._global_cache[key] = self.to_device(explanation)
+        coords = self._get_coords(data_id, explainer_id)
+        self._set(key, self.EXPLANATION_LAYER, explanation, coords)
+        self._persist(key, explanation)
 
+    @_synchronized
     def set_evaluation(
         self,
         data_id: int,
@@ -56,7 +335,79 @@ class ExperimentCache:
         evaluation: Any
     ):
         key = self._get_key(data_id, explainer_id, postprocessor_id, metric_id)
-        self._global_cache[key] = self.to_device(evaluation)
+        coords = self._get_coords(data_id, explainer_id, postprocessor_id, metric_id)
+        self._set(key, self.EVALUATION_LAYER, evaluation, coords)
+        self._persist(key, evaluation)
+
+    def _persist(self, key: str, value: Any):
+        if self._disk is None:
+            return
+        self._pending.append((key, value))
+
+    def _get(self, key: str, layer: str) -> Optional[Any]:
+        value = self._global_cache.get(key, None)
+        if value is None:
+            value = self._get_from_disk(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            return value
+        self.hits += 1
+        self._global_cache.move_to_end(key)
+        self._layers[layer].move_to_end(key)
+        return value
+
+    def _get_from_disk(self, key: str) -> Optional[Any]:
+        if self._disk is None:
+            return None
+        value = self._disk.get(key)
+        if value is None:
+            return None
+        # memory-mapped entries are served as they are, not counted in the byte budget
+        return self.to_device(value)
+
+    def _set(self, key: str, layer: str, value: Any, coords: Tuple[int, ...]):
+        self._pop(key)
+        value = self.to_device(value)
+        size = _nbytes(value)
+        self._global_cache[key] = value
+        self._layers[layer][key] = size
+        self.nbytes += size
+        self._coords[key] = coords
+        self._index.mark(coords)
+        # the new entry is kept even if it exceeds the budget alone, so the next get hits it
+        self._evict_if_needed(keep=key)
+
+    def _pop(self, key: str) -> Optional[Any]:
+        value = self._global_cache.pop(key, None)
+        for sizes in self._layers.values():
+            size = sizes.pop(key, None)
+            if size is not None:
+                self.nbytes -= size
+                break
+        coords = self._coords.pop(key, None)
+        if coords is not None and (self._disk is None or key not in self._disk):
+            self._index.mark(coords, False)
+        return value
+
+    def _evict_if_needed(self, keep: Optional[str] = None):
+        if self.max_bytes is None:
+            return
+        while self.nbytes > self.max_bytes:
+            key = self._next_key_to_evict(keep)
+            if key is None:
+                break
+            self._pop(key)
+            self.evictions += 1
+
+    def _next_key_to_evict(self, keep: Optional[str] = None) -> Optional[str]:
+        if self.eviction_policy == 'layer':
+            for layer in self.LAYER_EVICTION_ORDER:
+                key = next((key for key in self._layers[layer] if key != keep), None)
+                if key is not None:
+                    return key
+        return next((key for key in self._global_cache if key != keep), None)
 
     def _get_key(
         self,
@@ -66,11 +417,184 @@ class ExperimentCache:
         metric_id: Optional[int] = None
     ):
         key = f"{self.__DATA_KEY}_{data_id}"
+        if self.model_fingerprint is not None:
+            key = f"{self.__MODEL_KEY}_{self.model_fingerprint}.{key}"
         if explainer_id is None:
             return key
 
-        key = f"{key}.{self.__EXPLAINER_KEY}_{explainer_id}"
+        explainer_fp = self._get_fingerprint(self.__EXPLAINER_KEY, explainer_id)
+        key = f"{key}.{self.__EXPLAINER_KEY}_{explainer_fp}"
         if metric_id is None:
             return key
 
-        return f"{key}.{self.__POSTPROCESSOR_KEY}_{postprocessor_id}.{self.__EVALUATION_KEY}_{metric_id}"
+        postprocessor_fp = self._get_fingerprint(self.__POSTPROCESSOR_KEY, postprocessor_id)
+        metric_fp = self._get_fingerprint(self.__METRIC_KEY, metric_id)
+        return f"{key}.{self.__POSTPROCESSOR_KEY}_{postprocessor_fp}.{self.__EVALUATION_KEY}_{metric_fp}"
+
+
+def _nbytes(value: Any) -> int:
+    return sum(
+        elem.element_size() * elem.nelement()
+        for elem in flatten(value) if torch.is_tensor(elem)
+    )
+
+
+# attributes holding the model, shared engines, caches or runtime state rather than configuration
+_SIGNATURE_EXCLUDED_ATTRS = {
+    'model',
+    'device',
+    'explainer',
+    'perturbation_engine',
+    'gradient_cache',
+    'cam_engine',
+    '_active_session',
+    '_bytes_per_sample',
+    '_lock',
+    # handles and tensors of registered zennit composites and hooks
+    'handles',
+    'hook_refs',
+    'stored_tensors',
+    'tensor_handles',
+}
+_SIGNATURE_MAX_DEPTH = 8
+
+
+class UndescribableError(TypeError):
+    """
+    Raised if an object has no stable description, e.g. it holds locks or weak references.
+    """
+
+
+def get_signature(obj: Any) -> str:
+    """
+    Describes an explainer, a postprocessor or a metric by its class and configuration.
+
+    The configuration consists of attributes listed by `get_tunables` and all instance attributes,
+    public or private, except the model and shared engines or caches. Values are described
+    recursively: modules by their path in the model of the object (or their weights if not in it),
+    functions by their qualified name, code, defaults and closures, and other objects by their
+    attributes.
+
+    Args:
+        obj (Any): The object to describe.
+
+    Returns:
+        str: The signature of the object.
+
+    Raises:
+        UndescribableError: If the object holds a value without a stable description.
+    """
+    model = getattr(obj, 'model', None)
+    module_paths = {}
+    if isinstance(model, nn.Module):
+        module_paths = {id(module): name for name, module in model.named_modules()}
+    return _describe(obj, module_paths, [])
+
+
+def _describe(obj: Any, module_paths: Dict[int, str], stack: List[int]) -> str:
+    if obj is None or isinstance(obj, (bool, int, float, str, bytes)):
+        return repr(obj)
+    if len(stack) > _SIGNATURE_MAX_DEPTH:
+        raise UndescribableError(f"Too deeply nested: {type(obj).__name__}")
+    if id(obj) in stack:
+        # a reference back to an object being described
+        return f"<{type(obj).__qualname__}>"
+    stack = stack + [id(obj)]
+    describe = functools.partial(_describe, module_paths=module_paths, stack=stack)
+
+    if isinstance(obj, (tuple, list)):
+        return f"({','.join(describe(elem) for elem in obj)})"
+    if isinstance(obj, (set, frozenset)):
+        return f"{{{','.join(sorted(describe(elem) for elem in obj))}}}"
+    if isinstance(obj, dict):
+        items = sorted(f"{describe(k)}:{describe(v)}" for k, v in obj.items())
+        return f"{{{','.join(items)}}}"
+    if torch.is_tensor(obj):
+        return f"Tensor({tensor_fingerprint(obj)})"
+    if isinstance(obj, np.ndarray):
+        return f"ndarray({tensor_fingerprint(torch.from_numpy(np.ascontiguousarray(obj)))})"
+    if isinstance(obj, nn.Module):
+        if id(obj) in module_paths:
+            return f"{class_to_string(obj)}@{module_paths[id(obj)] or '<model>'}"
+        return f"{class_to_string(obj)}#{get_model_fingerprint(obj)}"
+    if inspect.isclass(obj):
+        return f"{obj.__module__}.{obj.__qualname__}"
+    if isinstance(obj, functools.partial):
+        return f"partial({describe(obj.func)},{describe(obj.args)},{describe(obj.keywords)})"
+    if inspect.ismethod(obj):
+        return f"{describe(obj.__self__)}.{obj.__func__.__name__}"
+    if inspect.isfunction(obj):
+        closure = tuple(
+            _cell_contents(cell) for cell in (obj.__closure__ or ())
+        )
+        return (
+            f"{obj.__module__}.{obj.__qualname__}"
+            f"[{_code_digest(obj.__code__)}]"
+            f"({describe(obj.__defaults__)},{describe(obj.__kwdefaults__)},{describe(closure)})"
+        )
+    if inspect.isroutine(obj):
+        return f"{getattr(obj, '__module__', None)}.{getattr(obj, '__qualname__', repr(obj))}"
+    if not hasattr(obj, '__dict__'):
+        raise UndescribableError(f"Cannot describe an object of {type(obj).__qualname__}")
+
+    tunables = obj.get_tunables() if hasattr(obj, 'get_tunables') else {}
+    attrs = (set(tunables.keys()) | set(vars(obj).keys())) - _SIGNATURE_EXCLUDED_ATTRS
+    params = ','.join(
+        f"{attr}={describe(getattr(obj, attr, None))}"
+        for attr in sorted(attrs)
+    )
+    return f"{class_to_string(obj)}({params})"
+
+
+def _cell_contents(cell) -> Any:
+    try:
+        return cell.cell_contents
+    except ValueError:  # an empty cell
+        return None
+
+
+def _code_digest(code) -> str:
+    # nested code objects, e.g. of inner lambdas, are digested recursively as their reprs hold addresses
+    digest = hashlib.sha1(code.co_code)
+    for const in code.co_consts:
+        digest.update((
+            _code_digest(const) if inspect.iscode(const) else repr(const)
+        ).encode())
+    digest.update(repr(code.co_names).encode())
+    return digest.hexdigest()[:16]
+
+
+def get_fingerprint(obj: Any) -> Optional[str]:
+    """
+    Computes a stable fingerprint of an explainer, a postprocessor or a metric from its signature.
+
+    Args:
+        obj (Any): The object to fingerprint.
+
+    Returns:
+        Optional[str]: A hex digest identifying the class and configuration of the object, or None
+            if it cannot be described, in which case its results are not shared by content.
+    """
+    try:
+        signature = get_signature(obj)
+    except UndescribableError:
+        return None
+    return hashlib.sha1(signature.encode()).hexdigest()[:16]
+
+
+def get_model_fingerprint(model: nn.Module) -> str:
+    """
+    Computes a stable fingerprint of a model from its class and the values of its state dict.
+
+    Args:
+        model (nn.Module): The model to fingerprint.
+
+    Returns:
+        str: A hex digest identifying the model weights.
+    """
+    digest = hashlib.sha1(class_to_string(model).encode())
+    for name, tensor in model.state_dict().items():
+        tensor = tensor.detach().cpu().contiguous().reshape(-1)
+        digest.update(f"{name}:{tensor.dtype}:{tuple(tensor.shape)}".encode())
+        digest.update(tensor.view(torch.uint8).numpy().tobytes())
+    return digest.hexdigest()[:16]
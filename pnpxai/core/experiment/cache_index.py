@@ -0,0 +1,140 @@
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+
+class CacheIndex:
+    """
+    Dense bitmaps of flags telling which results are available in an `ExperimentCache`.
+
+    Outputs, explanations and evaluations are flagged in boolean arrays indexed by
+    `(data,)`, `(data, explainer)` and `(data, explainer, postprocessor, metric)` respectively.
+    Explainers, postprocessors and metrics are assigned columns by their fingerprints, so objects
+    sharing a fingerprint share their flags. Arrays grow geometrically as new data ids and
+    columns appear, and queries over many data ids are single vectorized lookups.
+    """
+
+    KINDS = ('explainer', 'postprocessor', 'metric')
+
+    def __init__(self):
+        self._columns: Dict[str, Dict[str, int]] = {kind: {} for kind in self.KINDS}
+        self.outputs = np.zeros((0,), dtype=bool)
+        self.explanations = np.zeros((0, 0), dtype=bool)
+        self.evaluations = np.zeros((0, 0, 0, 0), dtype=bool)
+
+    def column(self, kind: str, fingerprint: str) -> int:
+        """
+        Returns the column of a fingerprint, assigning a new one if it is not indexed yet.
+        """
+        columns = self._columns[kind]
+        if fingerprint not in columns:
+            columns[fingerprint] = len(columns)
+        return columns[fingerprint]
+
+    def has_column(self, kind: str, fingerprint: str) -> bool:
+        return fingerprint in self._columns[kind]
+
+    def mark(self, coords: Tuple[int, ...], flag: bool = True):
+        """
+        Sets the flag of a result.
+
+        Args:
+            coords (Tuple[int, ...]): `(data_id,)`, `(data_id, explainer_col)` or
+                `(data_id, explainer_col, postprocessor_col, metric_col)`.
+            flag (bool): Whether the result is available.
+        """
+        self._grow(coords)
+        self._layer(coords)[coords] = flag
+
+    def mark_many(self, data_ids: Sequence[int], *cols: int):
+        """
+        Sets flags of many data at once.
+
+        Args:
+            data_ids (Sequence[int]): Data ids to flag.
+            *cols (int): Columns of the explainer, or of the explainer, postprocessor and metric.
+        """
+        data_ids = np.asarray(data_ids, dtype=np.int64)
+        if len(data_ids) == 0:
+            return
+        self._grow((int(data_ids.max()),) + cols)
+        self._layer((0,) + cols)[(data_ids,) + cols] = True
+
+    def is_marked(self, coords: Tuple[int, ...]) -> bool:
+        layer = self._layer(coords)
+        if any(c >= size for c, size in zip(coords, layer.shape)):
+            return False
+        return bool(layer[coords])
+
+    def query(self, data_ids: Sequence[int], *cols: int) -> np.ndarray:
+        """
+        Looks up flags of many data at once.
+
+        Args:
+            data_ids (Sequence[int]): Data ids to look up.
+            *cols (int): Columns of the explainer, or of the explainer, postprocessor and metric.
+                No columns look up outputs.
+
+        Returns:
+            np.ndarray: A boolean array of flags aligned with `data_ids`.
+        """
+        data_ids = np.asarray(data_ids, dtype=np.int64)
+        layer = self._layer((0,) + cols)
+        flags = np.zeros(len(data_ids), dtype=bool)
+        if any(c >= size for c, size in zip(cols, layer.shape[1:])):
+            return flags
+        valid = data_ids < layer.shape[0]
+        flags[valid] = layer[(data_ids[valid],) + cols]
+        return flags
+
+    def query_evaluations(
+        self,
+        data_ids: Sequence[int],
+        explainer_cols: Sequence[int],
+        postprocessor_cols: Sequence[int],
+        metric_cols: Sequence[int],
+    ) -> np.ndarray:
+        """
+        Looks up flags of evaluations over a grid of data, explainers, postprocessors and metrics.
+
+        Returns:
+            np.ndarray: A boolean array of shape (explainers, postprocessors, metrics, data).
+        """
+        index = [
+            np.asarray(ids, dtype=np.int64) for ids in
+            (data_ids, explainer_cols, postprocessor_cols, metric_cols)
+        ]
+        self._grow(tuple(int(ids.max()) if len(ids) > 0 else 0 for ids in index))
+        flags = self.evaluations[np.ix_(*index)]
+        return flags.transpose(1, 2, 3, 0)
+
+    def clear(self):
+        self.outputs[:] = False
+        self.explanations[:] = False
+        self.evaluations[:] = False
+
+    def _layer(self, coords: Tuple[int, ...]) -> np.ndarray:
+        if len(coords) == 1:
+            return self.outputs
+        if len(coords) == 2:
+            return self.explanations
+        return self.evaluations
+
+    def _grow(self, coords: Tuple[int, ...]):
+        for name in ('outputs', 'explanations', 'evaluations'):
+            layer = getattr(self, name)
+            shape = layer.shape
+            required = tuple(
+                max(size, coords[dim] + 1) if dim < len(coords) else size
+                for dim, size in enumerate(shape)
+            )
+            if required == shape:
+                continue
+            # doubling keeps amortized growth cost linear
+            new_shape = tuple(
+                size if req == size else max(req, 2 * size)
+                for size, req in zip(shape, required)
+            )
+            grown = np.zeros(new_shape, dtype=bool)
+            grown[tuple(slice(0, size) for size in shape)] = layer
+            setattr(self, name, grown)
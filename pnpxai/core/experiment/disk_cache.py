@@ -0,0 +1,177 @@
+from typing import Any, Optional, Dict, List, Tuple
+import os
+import json
+import uuid
+import socket
+import threading
+from collections import OrderedDict
+
+import torch
+
+from pnpxai.utils import map_recursive
+
+
+class DiskCache:
+    """
+    A persistent tier of `ExperimentCache`, storing cached entries as tensor shards on disk.
+
+    Entries are written in batches. Each batch becomes a shard file saved by `torch.save`, and a line
+    describing its keys is appended to the index file of the writing process. Re-opening the
+    directory reads only the indices, and shards are memory-mapped on first access so that loading
+    cached entries is lazy and zero-copy. Shards have unique names and every process appends to its
+    own index, so that processes of several hosts may share the directory.
+
+    Keys are expected to carry fingerprints of objects their entries depend on (e.g. the explainer
+    and its hyperparameters), so that changed hyperparameters never hit stale entries.
+
+    Args:
+        root (str): Directory to store shards and the index in.
+        max_open_shards (int): Maximum number of memory-mapped shards kept open.
+    """
+
+    INDEX_PREFIX = "index"
+    INDEX_SUFFIX = ".jsonl"
+    SHARD_PREFIX = "shard_"
+    SHARD_SUFFIX = ".pt"
+
+    def __init__(self, root: str, max_open_shards: int = 64):
+        self.root = root
+        self.max_open_shards = max_open_shards
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.RLock()
+        # key -> (shard name, position in shard)
+        self._index: Dict[str, Tuple[str, int]] = {}
+        self._open_shards: Dict[str, List[Any]] = OrderedDict()
+        self._writer_id = uuid.uuid4().hex[:8]
+        self._load_index()
+
+    @property
+    def index_path(self) -> str:
+        # the process id is read on every write, so that forked processes have their own indices
+        writer = f"{socket.gethostname()}_{os.getpid()}_{self._writer_id}"
+        return os.path.join(self.root, f"{self.INDEX_PREFIX}_{writer}{self.INDEX_SUFFIX}")
+
+    def _index_paths(self) -> List[str]:
+        return sorted(
+            os.path.join(self.root, filename) for filename in os.listdir(self.root)
+            if filename.startswith(self.INDEX_PREFIX) and filename.endswith(self.INDEX_SUFFIX)
+        )
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key: str):
+        return key in self._index
+
+    def keys(self):
+        return self._index.keys()
+
+    def _load_index(self):
+        for index_path in self._index_paths():
+            with open(index_path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # a partially written line of an interrupted process
+                        continue
+                    shard = record['shard']
+                    if not os.path.exists(self._shard_path(shard)):
+                        continue
+                    for pos, key in enumerate(record['keys']):
+                        self._index[key] = (shard, pos)
+
+    def _shard_path(self, shard: str) -> str:
+        return os.path.join(self.root, shard)
+
+    def _new_shard_name(self) -> str:
+        # unique across hosts and processes writing to a shared directory, even of reused pids
+        return f"{self.SHARD_PREFIX}{uuid.uuid4().hex}{self.SHARD_SUFFIX}"
+
+    def put_many(
+        self,
+        keys: List[str],
+        values: List[Any],
+    ):
+        """
+        Writes entries into a new shard.
+
+        Args:
+            keys (List[str]): Keys of entries.
+            values (List[Any]): Values of entries. Tensors are moved to cpu before saving.
+        """
+        assert len(keys) == len(values)
+        if len(keys) == 0:
+            return
+        values = [
+            map_recursive(value, lambda x: x.detach().cpu())
+            for value in values
+        ]
+        with self._lock:
+            shard = self._new_shard_name()
+            tmp_path = self._shard_path(shard) + ".tmp"
+            torch.save(values, tmp_path)
+            os.replace(tmp_path, self._shard_path(shard))
+            record = {'shard': shard, 'keys': list(keys)}
+            with open(self.index_path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+            for pos, key in enumerate(keys):
+                self._index[key] = (shard, pos)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Reads an entry.
+
+        Args:
+            key (str): Key of the entry.
+
+        Returns:
+            The entry, or None if it does not exist.
+        """
+        with self._lock:
+            located = self._index.get(key, None)
+            if located is None:
+                return None
+            shard, pos = located
+            values = self._open_shard(shard)
+            if values is None:
+                self._index.pop(key)
+                return None
+            return values[pos]
+
+    def _open_shard(self, shard: str) -> Optional[List[Any]]:
+        if shard in self._open_shards:
+            self._open_shards.move_to_end(shard)
+            return self._open_shards[shard]
+        path = self._shard_path(shard)
+        if not os.path.exists(path):
+            return None
+        values = _load_mmap(path)
+        self._open_shards[shard] = values
+        while len(self._open_shards) > self.max_open_shards:
+            self._open_shards.popitem(last=False)
+        return values
+
+    def clear(self):
+        with self._lock:
+            for shard in {shard for shard, _ in self._index.values()}:
+                path = self._shard_path(shard)
+                if os.path.exists(path):
+                    os.remove(path)
+            for index_path in self._index_paths():
+                os.remove(index_path)
+            self._index = {}
+            self._open_shards = OrderedDict()
+
+
+def _load_mmap(path: str) -> List[Any]:
+    try:
+        return torch.load(path, map_location='cpu', mmap=True)
+    except TypeError:
+        # torch<2.1 does not support memory-mapped loading
+        return torch.load(path, map_location='cpu')
+
@@ -0,0 +1,309 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import warnings
+import multiprocessing as mp
+
+from pnpxai.core.experiment.disk_cache import DiskCache
+
+
+_RESULT_KINDS = ('outputs', 'explanations', 'evaluations')
+
+
+def _work(runner: 'DistributedRunner', data_ids: Optional[Sequence[int]]):
+    runner.work(data_ids)
+
+
+class DistributedRunner:
+    """
+    Runs an experiment across nodes sharing a filesystem, coordinated by files under `root`.
+
+    The data ids are split into deterministic shards of `shard_size`, recorded in a manifest by
+    the first worker. Workers claim shards by atomically creating lock files, run them by
+    `Experiment.run`, and write their outputs, explanations and evaluations to a private `DiskCache`
+    per attempt, atomically renamed into the results of the shard before marking it done. Workers
+    touch their claims between micro-batches, and claims untouched for `claim_timeout` without a
+    done marker are considered abandoned by a failed worker and may be taken over. A shard whose
+    explainers or metrics raised is not marked done; its errors are recorded under `failed`. A reducer then merges results of all shards into one experiment, from
+    which evaluations and ranks are read as usual.
+
+    Every node calls `work`, and one of them calls `reduce` once `is_complete`. For a single
+    machine, `run_local` runs several processes as stand-in nodes and reduces their results.
+
+    Parameters:
+        experiment_factory (Callable[[], Experiment]): Builds the experiment of each worker. Must be
+            picklable and build the same explainers, postprocessors and metrics in the same order.
+        root (str): Directory on the shared filesystem.
+        shard_size (int): Number of data per shard.
+        batch_size (Optional[int]): Size of micro-batches run by workers.
+        claim_timeout (Optional[float]): Seconds after which a claim without results is abandoned.
+            If None, claims never expire.
+    """
+
+    MANIFEST_FILENAME = "manifest.json"
+
+    def __init__(
+        self,
+        experiment_factory: Callable[[], Any],
+        root: str,
+        shard_size: int = 64,
+        batch_size: Optional[int] = None,
+        claim_timeout: Optional[float] = None,
+    ):
+        self.experiment_factory = experiment_factory
+        self.root = root
+        self.shard_size = shard_size
+        self.batch_size = batch_size
+        self.claim_timeout = claim_timeout
+        # shard id -> token of the claims held by this worker
+        self._claims: Dict[int, str] = {}
+        for dirname in ('claims', 'done', 'results', 'failed'):
+            os.makedirs(os.path.join(root, dirname), exist_ok=True)
+
+    @property
+    def worker_id(self) -> str:
+        return f"{socket.gethostname()}-{os.getpid()}"
+
+    def _path(self, *names: str) -> str:
+        return os.path.join(self.root, *names)
+
+    def _claim_path(self, shard_id: int) -> str:
+        return self._path('claims', f"shard_{shard_id}.lock")
+
+    def _done_path(self, shard_id: int) -> str:
+        return self._path('done', f"shard_{shard_id}.done")
+
+    def _results_dir(self, shard_id: int) -> str:
+        return self._path('results', f"shard_{shard_id}")
+
+    def _failed_path(self, shard_id: int) -> str:
+        return self._path('failed', f"shard_{shard_id}.json")
+
+    def shards(self, data_ids: Optional[Sequence[int]] = None) -> List[List[int]]:
+        """
+        Returns the shards of data ids, recording them in the manifest if it does not exist yet.
+
+        Args:
+            data_ids (Optional[Sequence[int]]): Data ids to split. Ignored if the manifest exists.
+
+        Returns:
+            List[List[int]]: Data ids of each shard.
+        """
+        manifest_path = self._path(self.MANIFEST_FILENAME)
+        if not os.path.exists(manifest_path):
+            if data_ids is None:
+                data_ids = self.experiment_factory().manager.get_data_ids()
+            data_ids = [int(idx) for idx in data_ids]
+            shards = [
+                data_ids[start:start+self.shard_size]
+                for start in range(0, len(data_ids), self.shard_size)
+            ]
+            tmp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'shards': shards}, f)
+            try:
+                # the first worker to link its manifest wins
+                os.link(tmp_path, manifest_path)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmp_path)
+        with open(manifest_path) as f:
+            return json.load(f)['shards']
+
+    def _try_claim(self, shard_id: int) -> bool:
+        path = self._claim_path(shard_id)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not self._is_abandoned(shard_id):
+                return False
+            try:
+                # renaming is atomic, so only one worker takes over an abandoned claim
+                os.rename(path, f"{path}.{uuid.uuid4().hex}.abandoned")
+            except FileNotFoundError:
+                return False
+            return self._try_claim(shard_id)
+        token = uuid.uuid4().hex
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'worker': self.worker_id, 'token': token, 'claimed_at': time.time()}, f)
+        self._claims[shard_id] = token
+        return True
+
+    def _refresh_claim(self, shard_id: int) -> bool:
+        # touches the claim, or returns False if it has been taken over by another worker
+        path = self._claim_path(shard_id)
+        try:
+            with open(path) as f:
+                token = json.load(f).get('token')
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if token != self._claims.get(shard_id):
+            return False
+        os.utime(path)
+        return True
+
+    def _release_claim(self, shard_id: int):
+        if self._claims.pop(shard_id, None) is not None and not self.is_done(shard_id):
+            try:
+                os.remove(self._claim_path(shard_id))
+            except FileNotFoundError:
+                pass
+
+    def _is_abandoned(self, shard_id: int) -> bool:
+        if self.claim_timeout is None or self.is_done(shard_id):
+            return False
+        try:
+            claimed_at = os.path.getmtime(self._claim_path(shard_id))
+        except FileNotFoundError:
+            return False
+        return time.time() - claimed_at > self.claim_timeout
+
+    def is_done(self, shard_id: int) -> bool:
+        return os.path.exists(self._done_path(shard_id))
+
+    def is_complete(self) -> bool:
+        return all(self.is_done(shard_id) for shard_id in range(len(self.shards())))
+
+    def work(self, data_ids: Optional[Sequence[int]] = None) -> int:
+        """
+        Claims and runs shards until none is left.
+
+        Args:
+            data_ids (Optional[Sequence[int]]): Data ids to split, if the manifest does not exist yet.
+
+        Returns:
+            int: Number of shards run by this worker.
+        """
+        shards = self.shards(data_ids)
+        experiment = None
+        n_run = 0
+        for shard_id, shard_data_ids in enumerate(shards):
+            if self.is_done(shard_id) or not self._try_claim(shard_id):
+                continue
+            # the model is loaded once the worker has work to do
+            experiment = experiment if experiment is not None else self.experiment_factory()
+            if self._run_shard(experiment, shard_id, shard_data_ids):
+                n_run += 1
+            experiment.manager.clear_cache()
+        return n_run
+
+    def _run_shard(self, experiment, shard_id: int, shard_data_ids: List[int]) -> bool:
+        # `Experiment.run` resets errors, so those of micro-batches are gathered
+        errors = []
+        for batch_ids in experiment._split_data_ids(shard_data_ids, self.batch_size):
+            if not self._refresh_claim(shard_id):
+                warnings.warn(f"\n[DistributedRunner] Shard {shard_id} was taken over by another worker.")
+                self._claims.pop(shard_id, None)
+                return False
+            experiment.run(data_ids=batch_ids, batch_size=self.batch_size)
+            errors += experiment.errors
+        if errors:
+            # holes of a failed shard are never merged, and the shard may be claimed again
+            with open(self._failed_path(shard_id), 'w') as f:
+                json.dump({
+                    'worker': self.worker_id,
+                    'failed_at': time.time(),
+                    'errors': [f"{type(e).__name__}: {e}" for e in errors],
+                }, f)
+            warnings.warn(
+                f"\n[DistributedRunner] Shard {shard_id} failed with {len(errors)} errors.")
+            self._release_claim(shard_id)
+            return False
+        if not self._refresh_claim(shard_id):
+            self._claims.pop(shard_id, None)
+            return False
+        self._write_results(shard_id, experiment.manager.export_results(shard_data_ids))
+        self._claims.pop(shard_id, None)
+        if os.path.exists(self._failed_path(shard_id)):
+            # errors of a former attempt are resolved
+            os.remove(self._failed_path(shard_id))
+        return True
+
+    def _write_results(self, shard_id: int, results: Dict[str, Dict[Tuple[int, ...], Any]]):
+        # each attempt writes to a private directory, so an attempt taken over after
+        # `claim_timeout` never interleaves with the one it replaced
+        results_dir = self._results_dir(shard_id)
+        tmp_dir = f"{results_dir}.{uuid.uuid4().hex}.tmp"
+        disk = DiskCache(tmp_dir)
+        for kind in _RESULT_KINDS:
+            ids, values = zip(*results[kind].items()) if results[kind] else ((), ())
+            disk.put_many([_result_key(kind, idx) for idx in ids], list(values))
+        try:
+            # renaming is atomic, so the results directory only ever holds a complete attempt
+            os.rename(tmp_dir, results_dir)
+        except OSError:
+            # another attempt has published its complete results first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        with open(self._done_path(shard_id), 'w') as f:
+            json.dump({'worker': self.worker_id, 'done_at': time.time()}, f)
+
+    def reduce(self, experiment=None):
+        """
+        Merges results of all done shards.
+
+        Args:
+            experiment (Optional[Experiment]): The experiment results are merged into. If None, it is built by the factory.
+
+        Returns:
+            The Experiment instance with merged results.
+        """
+        experiment = experiment if experiment is not None else self.experiment_factory()
+        for shard_id in range(len(self.shards())):
+            if not self.is_done(shard_id):
+                warnings.warn(f"\n[DistributedRunner] Shard {shard_id} is not done and is not merged.")
+                continue
+            disk = DiskCache(self._results_dir(shard_id))
+            results = {kind: {} for kind in _RESULT_KINDS}
+            for key in disk.keys():
+                kind, idx = _parse_result_key(key)
+                results[kind][idx] = disk.get(key)
+            experiment.manager.import_results(results)
+        return experiment
+
+    def run_local(
+        self,
+        n_processes: int,
+        data_ids: Optional[Sequence[int]] = None,
+        mp_context: str = 'spawn',
+    ):
+        """
+        Runs several local processes as stand-in nodes, and reduces their results.
+
+        Args:
+            n_processes (int): Number of worker processes.
+            data_ids (Optional[Sequence[int]]): Data ids to split, if the manifest does not exist yet.
+            mp_context (str): Start method of worker processes.
+
+        Returns:
+            The Experiment instance with merged results.
+        """
+        self.shards(data_ids)
+        ctx = mp.get_context(mp_context)
+        processes = [
+            ctx.Process(target=_work, args=(self, data_ids))
+            for _ in range(n_processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        failed = [process.exitcode for process in processes if process.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {n_processes} workers failed with exit codes {failed}.")
+        if not self.is_complete():
+            raise RuntimeError(f"Shards are left not done. Errors of failed shards are recorded in {self._path('failed')}.")
+        return self.reduce()
+
+
+def _result_key(kind: str, idx: Tuple[int, ...]) -> str:
+    return f"{kind}:{'.'.join(str(i) for i in idx)}"
+
+
+def _parse_result_key(key: str) -> Tuple[str, Tuple[int, ...]]:
+    kind, idx = key.split(':')
+    return kind, tuple(int(i) for i in idx.split('.'))
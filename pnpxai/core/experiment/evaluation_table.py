@@ -0,0 +1,82 @@
+from typing import Sequence
+
+import numpy as np
+
+
+class EvaluationTable:
+    """
+    A columnar store of scalar evaluations, kept as a float array of shape
+    (explainers, postprocessors, metrics, data) indexed by ids of the experiment manager.
+
+    Missing evaluations are NaN. Evaluations are written in place, and the array grows
+    geometrically as new ids appear, so that ranking and aggregation over all evaluations
+    are single array reductions.
+    """
+
+    def __init__(self):
+        self.values = np.full((0, 0, 0, 0), np.nan)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def write(
+        self,
+        explainer_id: int,
+        postprocessor_id: int,
+        metric_id: int,
+        data_ids: Sequence[int],
+        evaluations: np.ndarray,
+    ):
+        """
+        Writes evaluations of data computed by an explainer, a postprocessor and a metric.
+
+        Args:
+            explainer_id (int): Id of the explainer.
+            postprocessor_id (int): Id of the postprocessor.
+            metric_id (int): Id of the metric.
+            data_ids (Sequence[int]): Ids of evaluated data.
+            evaluations (np.ndarray): Scalar evaluations aligned with `data_ids`.
+        """
+        data_ids = np.asarray(data_ids, dtype=np.int64)
+        if len(data_ids) == 0:
+            return
+        self._grow((explainer_id, postprocessor_id, metric_id, int(data_ids.max())))
+        self.values[explainer_id, postprocessor_id, metric_id, data_ids] = evaluations
+
+    def read(
+        self,
+        explainer_ids: Sequence[int],
+        postprocessor_ids: Sequence[int],
+        metric_ids: Sequence[int],
+        data_ids: Sequence[int],
+    ) -> np.ndarray:
+        """
+        Reads evaluations over a grid of ids.
+
+        Returns:
+            np.ndarray: A float array of shape (explainers, postprocessors, metrics, data).
+        """
+        index = [
+            np.asarray(ids, dtype=np.int64) for ids in
+            (explainer_ids, postprocessor_ids, metric_ids, data_ids)
+        ]
+        self._grow(tuple(int(ids.max()) if len(ids) > 0 else 0 for ids in index))
+        return self.values[np.ix_(*index)]
+
+    def clear(self):
+        self.values = np.full((0, 0, 0, 0), np.nan)
+
+    def _grow(self, coords):
+        shape = self.values.shape
+        required = tuple(max(size, c + 1) for size, c in zip(shape, coords))
+        if required == shape:
+            return
+        # doubling keeps amortized growth cost linear
+        new_shape = tuple(
+            size if req == size else max(req, 2 * size)
+            for size, req in zip(shape, required)
+        )
+        grown = np.full(new_shape, np.nan)
+        grown[tuple(slice(0, size) for size in shape)] = self.values
+        self.values = grown
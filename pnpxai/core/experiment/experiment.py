@@ -12,10 +12,13 @@ from plotly.graph_objects import Figure
 
 from pnpxai.core._types import DataSource, Model
 from pnpxai.core.modality.modality import Modality, TextModality
+from pnpxai.core.detector import ModelGraph
 from pnpxai.core.experiment.experiment_metrics_defaults import EVALUATION_METRIC_REVERSE_SORT, EVALUATION_METRIC_SORT_PRIORITY
 from pnpxai.core.experiment.observable import ExperimentObservableEvent
 from pnpxai.core.experiment.manager import ExperimentManager
-from pnpxai.explainers import Explainer, Lime, KernelShap
+from pnpxai.core.experiment.pipeline import ExperimentPipeline
+from pnpxai.core.experiment.cache import EvictionPolicy, get_model_fingerprint
+from pnpxai.explainers import Explainer, Lime, KernelShap, MultiRuleLRP
 from pnpxai.explainers.utils.postprocess import Identity
 from pnpxai.evaluator.optimizer.types import OptimizationOutput
 from pnpxai.evaluator.optimizer.objectives import Objective
@@ -28,7 +31,7 @@ from pnpxai.messages import get_message
 
 from pnpxai.utils import (
     class_to_string, Observable, to_device,
-    format_into_tuple, format_out_tuple_if_single,
+    format_into_tuple, format_out_tuple_if_single, select_batch,
 )
 
 
@@ -44,6 +47,62 @@ def default_target_extractor(y):
     return y.argmax(-1)
 
 
+def postprocess(explainer: Explainer, postprocessor: Callable, explanations, modality: Modality):
+    """
+    Postprocesses explanations of an explainer, applying a postprocessor per modality.
+
+    Raises:
+        NotImplementedError: If the postprocessor does not support the explainer.
+    """
+    modalities = format_into_tuple(modality)
+    explanations = format_into_tuple(explanations)
+    postprocessors = format_into_tuple(postprocessor)
+
+    batch = []
+    for mod, attr, pp in zip(modalities, explanations, postprocessors):
+        if (
+            isinstance(explainer, (Lime, KernelShap))
+            and isinstance(mod, TextModality)
+            and not isinstance(pp.pooling_fn, Identity)
+        ):
+            raise NotImplementedError(
+                f'{class_to_string(pp.pooling_fn)} does not support {class_to_string(explainer)} for text.')
+        batch.append(pp(attr))
+    return format_out_tuple_if_single(batch)
+
+
+def rank_explainers(evaluations: np.ndarray, metric_names: Sequence[str]) -> np.ndarray:
+    """
+    Ranks explainers by evaluations, considering sorting preferences and priorities of metrics.
+
+    Args:
+        evaluations (np.ndarray): Evaluations of shape (explainers, postprocessors, metrics, data). Missing evaluations are NaN.
+        metric_names (Sequence[str]): Class names of metrics.
+
+    Returns:
+        np.ndarray: Ranks of shape (explainers, postprocessors, data), where 0 is the best.
+    """
+    # negate metrics where higher is better, so that lower is better for all of them
+    signs = np.array([
+        -1. if EVALUATION_METRIC_REVERSE_SORT.get(name, False) else 1.
+        for name in metric_names
+    ])
+    evaluations = evaluations * signs[None, None, :, None]
+    # missing evaluations are ranked last
+    evaluations = np.nan_to_num(evaluations, nan=np.inf)
+
+    n_explainers = evaluations.shape[0]
+    ranks = evaluations.argsort(axis=0).argsort(axis=0) + 1
+    # (explainers, postprocessors, data)
+    scores = ranks.sum(axis=2)
+    for metric_name in EVALUATION_METRIC_SORT_PRIORITY:
+        if metric_name not in metric_names:
+            continue
+        idx = list(metric_names).index(metric_name)
+        scores = scores * n_explainers + ranks[:, :, idx, :]
+    return scores.argsort(axis=0).argsort(axis=0)
+
+
 class Experiment(Observable):
     """
     A class representing an experiment for model interpretability.
@@ -62,6 +121,10 @@ class Experiment(Observable):
         target_visualizer (Optional[Callable[[Any], Any]]): Function to visualize target data.
         cache_device (Optional[Union[torch.device, str]]): Device to cache data and results.
         target_labels (bool): True if the target is a label, False otherwise.
+        cache_max_bytes (Optional[int]): Byte budget of cached results. Evicted results are recomputed on demand. If None, the cache is unbounded.
+        cache_eviction_policy (EvictionPolicy): Eviction order of cached results, either 'lru' or 'layer' (evaluations, explanations, then outputs).
+        cache_dir (Optional[str]): Directory persisting explanations and evaluations across runs. Results are keyed by fingerprints of the model weights and of the configurations of explainers, postprocessors and metrics, so the directory can be shared by experiments on the same data. If None, nothing is persisted.
+        joint_lrp (bool): Whether `run` explains LRP explainers of the same model jointly by `MultiRuleLRP`, sharing a forward pass and the canonizers of the first explainer, instead of by their own `attribute`.
 
     Attributes:
         modality (Modality): Object defining the modality-specific control flow of the experiment.
@@ -88,12 +151,30 @@ class Experiment(Observable):
         target_visualizer: Optional[Callable[[Any], Any]] = None,
         cache_device: Optional[Union[torch.device, str]] = None,
         target_labels: bool = False,
+        cache_max_bytes: Optional[int] = None,
+        cache_eviction_policy: EvictionPolicy = 'lru',
+        cache_dir: Optional[str] = None,
+        joint_lrp: bool = False,
     ):
         super(Experiment, self).__init__()
         self.model = model
+        self.joint_lrp = joint_lrp
         self.model_device = next(self.model.parameters()).device
 
-        self.manager = ExperimentManager(data=data, cache_device=cache_device)
+        self.manager = ExperimentManager(
+            data=data,
+            cache_device=cache_device,
+            cache_max_bytes=cache_max_bytes,
+            cache_eviction_policy=cache_eviction_policy,
+            cache_dir=cache_dir,
+            # weights are hashed only if results are shared through the persistent tier
+            model_fingerprint=get_model_fingerprint(model) if cache_dir is not None else None,
+        )
+        self.manager.set_recompute_fns(
+            output_fn=self._forward_batch,
+            explanation_fn=self._attribute_batch,
+            evaluation_fn=self._evaluate_batch,
+        )
         for explainer in explainers:
             self.manager.add_explainer(explainer)
         for postprocessor in postprocessors:
@@ -184,17 +265,19 @@ class Experiment(Observable):
 
         This method orchestrates the experiment by configuring the manager and processing data. It then caches the results in the manager, and returns back to the user.
         """
-        data_ids_pred = [
-            idx for idx in data_ids
-            if self.manager.get_output_by_id(idx) is None
-        ]
+        data_ids_pred = self.manager.get_missing_data_ids(data_ids)
         if len(data_ids_pred) > 0:
-            data = self.manager.batch_data_by_ids(data_ids_pred)
-            outputs = self.model(
-                *format_into_tuple(self.input_extractor(data)))
+            outputs = self._forward_batch(data_ids_pred)
             self.manager.cache_outputs(data_ids_pred, outputs)
+            if torch.is_tensor(outputs):
+                # explainers requiring the number of classes read it from outputs
+                ModelGraph.of(self.model).set('n_classes', outputs.shape[-1])
         return self.manager.batch_outputs_by_ids(data_ids)
 
+    def _forward_batch(self, data_ids: Sequence[int]):
+        data = self.to_device(self.manager.batch_data_by_ids(data_ids))
+        return self.model(*format_into_tuple(self.input_extractor(data)))
+
     def explain_batch(
         self,
         data_ids: Sequence[int],
@@ -212,20 +295,20 @@ class Experiment(Observable):
         This method orchestrates the experiment by configuring the manager, obtaining explainer instance,
         processing data, and generating explanations. It then caches the results in the manager, and returns back to the user.
         """
-        data_ids_expl = [
-            idx for idx in data_ids
-            if self.manager.get_explanation_by_id(idx, explainer_id) is None
-        ]
+        data_ids_expl = self.manager.get_missing_data_ids(data_ids, explainer_id)
         if len(data_ids_expl):
-            data = self.manager.batch_data_by_ids(data_ids_expl)
-            inputs = self.input_extractor(data)
-            targets = self._get_targets(data_ids_expl)
-            explainer = self.manager.get_explainer_by_id(explainer_id)
-            explanations = explainer.attribute(inputs, targets)
+            explanations = self._attribute_batch(data_ids_expl, explainer_id)
             self.manager.cache_explanations(
                 explainer_id, data_ids_expl, explanations)
         return self.manager.batch_explanations_by_ids(data_ids, explainer_id)
 
+    def _attribute_batch(self, data_ids: Sequence[int], explainer_id: int):
+        data = self.to_device(self.manager.batch_data_by_ids(data_ids))
+        inputs = self.input_extractor(data)
+        targets = self._get_targets(data_ids)
+        explainer = self.manager.get_explainer_by_id(explainer_id)
+        return explainer.attribute(inputs, targets)
+
     def postprocess_batch(
         self,
         data_ids: List[int],
@@ -249,22 +332,11 @@ class Experiment(Observable):
         explanations = self.manager.batch_explanations_by_ids(
             data_ids, explainer_id)
         postprocessor = self.manager.get_postprocessor_by_id(postprocessor_id)
-
-        modalities = format_into_tuple(self.modality)
-        explanations = format_into_tuple(explanations)
-        postprocessors = format_into_tuple(postprocessor)
-
-        batch = []
         explainer = self.manager.get_explainer_by_id(explainer_id)
-        for mod, attr, pp in zip(modalities, explanations, postprocessors):
-            if (
-                isinstance(explainer, (Lime, KernelShap))
-                and isinstance(mod, TextModality)
-                and not isinstance(pp.pooling_fn, Identity)
-            ):
-                raise ValueError(f'postprocessor {postprocessor_id} does not support explainer {explainer_id}.')
-            batch.append(pp(attr))
-        return format_out_tuple_if_single(batch)
+        try:
+            return postprocess(explainer, postprocessor, explanations, self.modality)
+        except NotImplementedError:
+            raise ValueError(f'postprocessor {postprocessor_id} does not support explainer {explainer_id}.')
 
     def evaluate_batch(
         self,
@@ -288,21 +360,11 @@ class Experiment(Observable):
         This method orchestrates the experiment by configuring the manager, obtaining explainer instance,
         processing data, generating explanations, and evaluating results. It then caches the results in the manager, and returns back to the user.
         """
-        data_ids_eval = [
-            idx for idx in data_ids
-            if self.manager.get_evaluation_by_id(
-                idx, explainer_id, postprocessor_id, metric_id) is None
-        ]
+        data_ids_eval = self.manager.get_missing_data_ids(
+            data_ids, explainer_id, postprocessor_id, metric_id)
         if len(data_ids_eval):
-            data = self.manager.batch_data_by_ids(data_ids_eval)
-            inputs = self.input_extractor(data)
-            targets = self._get_targets(data_ids_eval)
-            postprocessed = self.postprocess_batch(
-                data_ids_eval, explainer_id, postprocessor_id)
-            explainer = self.manager.get_explainer_by_id(explainer_id)
-            metric = self.manager.get_metric_by_id(metric_id)
-            evaluations = metric.set_explainer(explainer).evaluate(
-                inputs, targets, postprocessed)
+            evaluations = self._evaluate_batch(
+                data_ids_eval, explainer_id, postprocessor_id, metric_id)
             self.manager.cache_evaluations(
                 explainer_id, postprocessor_id, metric_id,
                 data_ids_eval, evaluations
@@ -311,11 +373,22 @@ class Experiment(Observable):
             data_ids, explainer_id, postprocessor_id, metric_id
         )
 
-    def _get_targets(self, data_ids):
-        if self.target_labels:
-            return self.label_extractor(self.manager.batch_data_by_ids(data_ids))
-        outputs = self.manager.batch_outputs_by_ids(data_ids)
-        return self.target_extractor(outputs)
+    def _evaluate_batch(
+        self,
+        data_ids: Sequence[int],
+        explainer_id: int,
+        postprocessor_id: int,
+        metric_id: int,
+    ):
+        data = self.to_device(self.manager.batch_data_by_ids(data_ids))
+        inputs = self.input_extractor(data)
+        targets = self._get_targets(data_ids)
+        postprocessed = self.postprocess_batch(
+            data_ids, explainer_id, postprocessor_id)
+        explainer = self.manager.get_explainer_by_id(explainer_id)
+        metric = self.manager.get_metric_by_id(metric_id)
+        return metric.set_explainer(explainer).evaluate(
+            inputs, targets, postprocessed)
 
     def optimize(
         self,
@@ -393,6 +466,7 @@ class Experiment(Observable):
         explainer_ids: Optional[Sequence[int]] = None,
         postprocessor_ids: Optional[Sequence[int]] = None,
         metric_ids: Optional[Sequence[int]] = None,
+        batch_size: Optional[int] = None,
     ) -> 'Experiment':
         """
         Run the experiment by processing data, generating explanations, evaluating with metrics, caching and retrieving the data.
@@ -402,6 +476,7 @@ class Experiment(Observable):
             explainer_ids (Optional[Sequence[int]]): A sequence of explainer IDs to specify the subset of explainers to use.
             postprocessor_ids (Optional[Sequence[int]]): A sequence of postprocessor IDs to specify the subset of postprocessors to use.
             metric_ids (Optional[Sequence[int]]): A sequence of metric IDs to specify the subset of metrics to evaluate.
+            batch_size (Optional[int]): Size of micro-batches pushed through prediction, explanation, postprocessing and evaluation. If None, the batch size of the data loader is used.
 
         Returns:
             The Experiment instance with updated results and state.
@@ -413,109 +488,148 @@ class Experiment(Observable):
         If not provided, the method processes all available data, explainers, postprocessors, and metrics.
         """
         self.reset_errors()
-        # self.manager.set_config(data_ids, explainer_ids, metrics_ids)
+        data_ids = data_ids if data_ids is not None else self.manager.get_data_ids()
+        batches = self._split_data_ids(data_ids, batch_size)
 
         # inference
-
-        # data_ids is filtered out data indices whose output is saved in cache
-        data, data_ids_pred = self.manager.get_data_to_predict(data_ids)
-        outputs = self._predict(data)
-        self.manager.save_outputs(outputs, data, data_ids_pred)
+        for batch_ids in batches:
+            self.predict_batch(batch_ids)
 
         # explain
         explainers, explainer_ids = self.manager.get_explainers(explainer_ids)
         postprocessors, postprocessor_ids = self.manager.get_postprocessors(postprocessor_ids)
         metrics, metric_ids = self.manager.get_metrics(metric_ids)
 
+        # LRP explainers of the same model share forward passes if opted in
+        for positions in MultiRuleLRP.group(explainers) if self.joint_lrp else []:
+            for batch_ids in batches:
+                self._explain_micro_batch_jointly(
+                    batch_ids, [explainer_ids[pos] for pos in positions])
+
         for explainer, explainer_id in zip(explainers, explainer_ids):
-            explainer_name = class_to_string(explainer)
-
-            # data_ids is filtered out data indices whose explanation is saved in cache
-            data, data_ids_expl = self.manager.get_data_to_process_for_explainer(
-                explainer_id, data_ids)
-            explanations = self._explain(data, data_ids_expl, explainer)
-            self.manager.save_explanations(
-                explanations, data, data_ids_expl, explainer_id
-            )
-            message = get_message(
-                'experiment.event.explainer', explainer=explainer_name
-            )
-            print(f"[Experiment] {message}")
-            self.fire(ExperimentObservableEvent(
-                self.manager, message, explainer))
-
-            for postprocessor, postprocessor_id in zip(postprocessors, postprocessor_ids):
-                for metric, metric_id in zip(metrics, metric_ids):
-                    metric_name = class_to_string(metric)
-                    data, data_ids_eval = self.manager.get_data_to_process_for_metric(
-                        explainer_id, postprocessor_id, metric_id, data_ids)
-                    explanations, data_ids_eval = self.manager.get_valid_explanations(
-                        explainer_id, data_ids_eval)
-                    data, _ = self.manager.get_data(data_ids_eval)
-                    evaluations = self._evaluate(
-                        data, data_ids_eval, explanations, explainer, postprocessor, metric)
-                    self.manager.save_evaluations(
-                        evaluations, data, data_ids_eval, explainer_id, postprocessor_id, metric_id)
-
-                    message = get_message(
-                        'experiment.event.explainer.metric', explainer=explainer_name, metric=metric_name)
-                    print(f"[Experiment] {message}")
-                    self.fire(ExperimentObservableEvent(
-                        self.manager, message, explainer, metric))
+            for batch_ids in batches:
+                if not self._explain_micro_batch(batch_ids, explainer_id):
+                    continue
+                # evaluate while explanations of the batch are in cache
+                for postprocessor_id in postprocessor_ids:
+                    for metric, metric_id in zip(metrics, metric_ids):
+                        self._evaluate_micro_batch(
+                            batch_ids, explainer_id, postprocessor_id, metric_id)
+            self._fire_run_events(explainer, postprocessors, metrics)
         return self
 
-    def _predict(self, data: DataSource):
+    def run_pipelined(
+        self,
+        data_ids: Optional[Sequence[int]] = None,
+        explainer_ids: Optional[Sequence[int]] = None,
+        postprocessor_ids: Optional[Sequence[int]] = None,
+        metric_ids: Optional[Sequence[int]] = None,
+        batch_size: Optional[int] = None,
+        n_workers: int = 4,
+        prefetch: int = 2,
+    ) -> 'Experiment':
         """
-        Predict input data with experiment model.
+        Run the experiment like `run`, overlapping data loading, explanation on the model device and metric evaluation.
 
         Args:
-            data (DataSource): A data to be explained.
+            data_ids (Optional[Sequence[int]]): A sequence of data IDs to specify the subset of data to process.
+            explainer_ids (Optional[Sequence[int]]): A sequence of explainer IDs to specify the subset of explainers to use.
+            postprocessor_ids (Optional[Sequence[int]]): A sequence of postprocessor IDs to specify the subset of postprocessors to use.
+            metric_ids (Optional[Sequence[int]]): A sequence of metric IDs to specify the subset of metrics to evaluate.
+            batch_size (Optional[int]): Size of micro-batches. If None, the batch size of the data loader is used.
+            n_workers (int): Number of threads evaluating metrics.
+            prefetch (int): Number of micro-batches loaded ahead of the device stage.
 
         Returns:
-            Predictions corresponding to input data.
+            The Experiment instance with updated results and state.
         """
-        outputs = [
-            self.model(*format_into_tuple(
-                self.to_device(self.input_extractor(datum)))
-            ) for datum in data
-        ]
-        return outputs
+        pipeline = ExperimentPipeline(
+            self, batch_size=batch_size, n_workers=n_workers, prefetch=prefetch)
+        return pipeline.run(data_ids, explainer_ids, postprocessor_ids, metric_ids)
 
-    def _explain(self, data: DataSource, data_ids: Sequence[int], explainer: Explainer):
-        """
-        Explain input data with an explainer.
+    def _fire_run_events(self, explainer: Explainer, postprocessors: Sequence[Callable], metrics: Sequence[Metric]):
+        explainer_name = class_to_string(explainer)
+        message = get_message(
+            'experiment.event.explainer', explainer=explainer_name
+        )
+        print(f"[Experiment] {message}")
+        self.fire(ExperimentObservableEvent(
+            self.manager, message, explainer))
 
-        Args:
-            data (DataSource): A data to be explained.
-            data_ids (Sequence[int]): A sequence of data IDs corresponding to the provided data source. Data IDs are used to cache results.
-            explainer (Explainer): A explainer object to use for explanation.
+        for postprocessor in postprocessors:
+            for metric in metrics:
+                metric_name = class_to_string(metric)
+                message = get_message(
+                    'experiment.event.explainer.metric', explainer=explainer_name, metric=metric_name)
+                print(f"[Experiment] {message}")
+                self.fire(ExperimentObservableEvent(
+                    self.manager, message, explainer, metric))
+
+    def _split_data_ids(self, data_ids: Sequence[int], batch_size: Optional[int] = None) -> List[List[int]]:
+        data_ids = list(data_ids)
+        batch_size = batch_size or getattr(self.manager.data, 'batch_size', None) or len(data_ids)
+        return [
+            data_ids[start:start+batch_size]
+            for start in range(0, len(data_ids), max(batch_size, 1))
+        ]
 
-        Returns:
-            Explanations corresponding to input data, generated by the explainer.
+    def _explain_micro_batch(self, data_ids: Sequence[int], explainer_id: int) -> bool:
+        explainer_name = class_to_string(self.manager.get_explainer_by_id(explainer_id))
+        try:
+            self.explain_batch(data_ids, explainer_id)
+        except NotImplementedError as error:
+            warnings.warn(
+                f"\n[Experiment] {get_message('experiment.errors.explainer_unsupported', explainer=explainer_name)}")
+            raise error
+        except Exception as e:
+            warnings.warn(
+                f"\n[Experiment] {get_message('experiment.errors.explanation', explainer=explainer_name, error=e)}")
+            self._errors.append(e)
+            return False
+        return True
+
+    def _explain_micro_batch_jointly(self, data_ids: Sequence[int], explainer_ids: Sequence[int]):
+        # explanations left missing on failure are computed and reported per explainer afterwards
+        missing = [self.manager.get_missing_data_ids(data_ids, idx) for idx in explainer_ids]
+        union = sorted(set().union(*map(set, missing)))
+        if len(union) == 0:
+            return
+        data = self.to_device(self.manager.batch_data_by_ids(union))
+        try:
+            attrs = MultiRuleLRP([
+                self.manager.get_explainer_by_id(idx) for idx in explainer_ids
+            ]).attribute(self.input_extractor(data), self._get_targets(union))
+        except Exception as e:
+            explainer_names = ', '.join(
+                class_to_string(self.manager.get_explainer_by_id(idx)) for idx in explainer_ids)
+            warnings.warn(
+                f"\n[Experiment] {get_message('experiment.errors.explanation', explainer=explainer_names, error=e)}")
+            return
+        positions = {data_id: pos for pos, data_id in enumerate(union)}
+        for explainer_id, missing_ids, explanations in zip(explainer_ids, missing, attrs):
+            if len(missing_ids) == 0:
+                continue
+            indices = torch.tensor([positions[data_id] for data_id in missing_ids])
+            self.manager.cache_explanations(
+                explainer_id, list(missing_ids), select_batch(explanations, indices))
 
-        This method explains data with a specified explainer. Produced results are cached by the manager.
-        """
-        explanations = [None] * len(data)
-        explainer_name = class_to_string(explainer)
-        for i, (datum, data_id) in enumerate(zip(data, data_ids)):
-            try:
-                datum = self.to_device(datum)
-                inputs = format_into_tuple(self.input_extractor(datum))
-                targets = self.label_extractor(datum) if self.target_labels \
-                    else self._get_targets(data_ids)
-                explanations[i] = explainer.attribute(
-                    inputs=inputs,
-                    targets=targets,
-                )
-            except NotImplementedError as error:
-                warnings.warn(
-                    f"\n[Experiment] {get_message('experiment.errors.explainer_unsupported', explainer=explainer_name)}")
-                raise error
-            except Exception as e:
-                warnings.warn(
-                    f"\n[Experiment] {get_message('experiment.errors.explanation', explainer=explainer_name, error=e)}")
-                self._errors.append(e)
-        return explanations
+    def _evaluate_micro_batch(
+        self,
+        data_ids: Sequence[int],
+        explainer_id: int,
+        postprocessor_id: int,
+        metric_id: int,
+    ) -> bool:
+        try:
+            self.evaluate_batch(data_ids, explainer_id, postprocessor_id, metric_id)
+        except Exception as e:
+            explainer_name = class_to_string(self.manager.get_explainer_by_id(explainer_id))
+            metric_name = class_to_string(self.manager.get_metric_by_id(metric_id))
+            warnings.warn(
+                f"\n[Experiment] {get_message('experiment.errors.evaluation', explainer=explainer_name, metric=metric_name, error=e)}")
+            self._errors.append(e)
+            return False
+        return True
 
     # def _evaluate(self, data: DataSource, data_ids: List[int], explanations: DataSource, explainer: Explainer, postprocessor: Callable, metric: Metric):
     #     if explanations is None:
@@ -553,31 +667,20 @@ class Experiment(Observable):
 
     def _get_targets(self, data_ids: Sequence[int]):
         """
-        Retrieve and flatten last run target (output) data.
+        Retrieve target data of selected batch of data.
 
         Args:
-            data_ids (Optional[Sequence[int]]): A sequence of data IDs to specify the subset of data to process.
+            data_ids (Sequence[int]): A sequence of data IDs to specify the subset of data to process.
 
         Returns:
-            Flattened target (output) data.
-
-        This method retrieves target (output) data using the target extractor and flattens it for further processing.
+            Batched target data.
 
-        Note: The input parameters allow for flexibility in specifying subsets of data to process. If not provided, the method processes all available data.
+        This method retrieves labels if the targets are labels. Otherwise, it predicts outputs missing in cache, and extracts targets from the outputs using the target extractor.
         """
+        if self.target_labels:
+            return self.to_device(self.label_extractor(self.manager.batch_data_by_ids(data_ids)))
         # predict if not cached
-        not_predicted = [
-            data_id for data_id in data_ids
-            if self.manager._cache.get_output(data_id) is None
-        ]
-        if len(not_predicted) > 0:
-            self.predict_batch(not_predicted)
-
-        # load outputs from cache
-        outputs = torch.stack([
-            self.manager._cache.get_output(data_id)
-            for data_id in data_ids
-        ])
+        outputs = self.predict_batch(data_ids)
         return self.target_extractor(outputs)
 
     # def get_visualizations_flattened(self) -> Sequence[Sequence[Figure]]:
@@ -795,50 +898,44 @@ class Experiment(Observable):
 
         return formatted
 
-    def get_explainers_ranks(self) -> Optional[Sequence[Sequence[int]]]:
+    def get_evaluation_table(self, data_ids: Optional[Sequence[int]] = None) -> Tensor:
         """
-        Calculate and return rankings for explainers based on evaluations.
+        Retrieve scalar evaluations for all explainers, postprocessors and metrics as a columnar table.
+
+        Args:
+            data_ids (Optional[Sequence[int]]): A sequence of data IDs to specify the subset of data to process.
 
         Returns:
-            Rankings of explainers. Returns None if rankings cannot be calculated.
+            A tensor of shape (explainers, postprocessors, metrics, data). Missing evaluations are NaN.
 
-        This method calculates rankings for explainers based on evaluations and metric scores. It considers
-        metric priorities and sorting preferences to produce rankings.
+        Note: The input parameters allow for flexibility in specifying subsets of data to process. If not provided, the method processes all available data.
         """
-        evaluations = [[[
-            data_evaluation.detach().cpu() if data_evaluation is not None else None
-            for data_evaluation in metric_data
-        ]for metric_data in explainer_data
-        ]for explainer_data in self.get_evaluations_flattened()]
-        # (explainers, metrics, data)
-        evaluations = np.array(evaluations, dtype=float)
-        evaluations = np.nan_to_num(evaluations, nan=-np.inf)
-        if evaluations.ndim != 3:
-            return None
+        return torch.from_numpy(self.manager.get_evaluation_table(data_ids=data_ids))
 
-        evaluations = evaluations.argsort(axis=-3).argsort(axis=-3) + 1
-        n_explainers = evaluations.shape[0]
-        metric_name_to_idx = {}
-
-        for idx, metric in enumerate(self.get_current_metrics()):
-            metric_name = class_to_string(metric)
-            evaluations[:, idx, :] = evaluations[:, idx, :]
-            if EVALUATION_METRIC_REVERSE_SORT.get(metric_name, False):
-                evaluations[:, idx, :] = \
-                    n_explainers - evaluations[:, idx, :] + 1
+    def get_explainers_ranks(self, data_ids: Optional[Sequence[int]] = None) -> Optional[Sequence[Sequence[Sequence[int]]]]:
+        """
+        Calculate and return rankings for explainers based on evaluations.
 
-            metric_name_to_idx[metric_name] = idx
-        # (explainers, data)
-        scores: np.ndarray = evaluations.sum(axis=-2)
+        Args:
+            data_ids (Optional[Sequence[int]]): A sequence of data IDs to specify the subset of data to process.
 
-        for metric_name in EVALUATION_METRIC_SORT_PRIORITY:
-            if metric_name not in metric_name_to_idx:
-                continue
+        Returns:
+            Rankings of explainers of shape (explainers, postprocessors, data), where 0 is the best. Returns None if rankings cannot be calculated.
 
-            idx = metric_name_to_idx[metric_name]
-            scores = scores * n_explainers + evaluations[:, idx, :]
+        This method calculates rankings for explainers based on evaluations and metric scores. It considers
+        metric priorities and sorting preferences to produce rankings.
+        """
+        _, metric_ids = self.manager.get_metrics()
+        # (explainers, postprocessors, metrics, data)
+        evaluations = self.manager.get_evaluation_table(data_ids=data_ids)
+        if evaluations.size == 0:
+            return None
 
-        return scores.argsort(axis=-2).argsort(axis=-2).tolist()
+        metric_names = [
+            class_to_string(self.manager.get_metric_by_id(metric_id))
+            for metric_id in metric_ids
+        ]
+        return rank_explainers(evaluations, metric_names).tolist()
 
     @property
     def has_explanations(self):
@@ -1,15 +1,19 @@
-from typing import Any, List, Optional, Sequence, Union, Type, Tuple, Callable
+from typing import Any, List, Optional, Sequence, Union, Type, Tuple, Callable, Dict
+import threading
+import uuid
 
+import numpy as np
 import torch
 from torch import Tensor
 from torch.utils.data import DataLoader, Subset, Dataset
 
-from pnpxai.core.experiment.cache import ExperimentCache
+from pnpxai.core.experiment.cache import ExperimentCache, EvictionPolicy, get_fingerprint
+from pnpxai.core.experiment.evaluation_table import EvaluationTable
 from pnpxai.core._types import DataSource
 from pnpxai.explainers.base import Explainer
 from pnpxai.explainers.utils.postprocess import PostProcessor
 from pnpxai.evaluator.metrics.base import Metric
-from pnpxai.utils import format_into_tuple, format_out_tuple_if_single
+from pnpxai.utils import format_into_tuple, format_out_tuple_if_single, map_recursive
 
 
 class ExperimentManager:
@@ -17,6 +21,10 @@ class ExperimentManager:
         self,
         data: DataSource,
         cache_device: Optional[Union[torch.device, str]] = None,
+        cache_max_bytes: Optional[int] = None,
+        cache_eviction_policy: EvictionPolicy = 'lru',
+        cache_dir: Optional[str] = None,
+        model_fingerprint: Optional[str] = None,
     ):
         self._data = data
         self.set_data_ids()
@@ -27,14 +35,55 @@ class ExperimentManager:
         self._metrics: List[Metric] = []
         self._metric_ids: List[int] = []
 
-        self._cache = ExperimentCache(cache_device)
+        self._cache = ExperimentCache(
+            cache_device,
+            max_bytes=cache_max_bytes,
+            eviction_policy=cache_eviction_policy,
+            cache_dir=cache_dir,
+            model_fingerprint=model_fingerprint,
+        )
+        self._evaluation_table = EvaluationTable()
+        self._lock = threading.RLock()
+        # collated batches loaded ahead of use, keyed by data ids
+        self._prefetched: Dict[Tuple[int, ...], Any] = {}
+        self._output_fn: Optional[Callable] = None
+        self._explanation_fn: Optional[Callable] = None
+        self._evaluation_fn: Optional[Callable] = None
 
     def clear(self):
         self._explainers = []
         self._explainer_ids = []
         self._metrics = []
         self._metric_ids = []
-        self._cache._global_cache = {}
+        self.clear_cache()
+
+    def clear_cache(self):
+        self._cache.clear()
+        with self._lock:
+            self._evaluation_table.clear()
+
+    @property
+    def cache_stats(self):
+        return self._cache.stats
+
+    def set_recompute_fns(
+        self,
+        output_fn: Optional[Callable] = None,
+        explanation_fn: Optional[Callable] = None,
+        evaluation_fn: Optional[Callable] = None,
+    ):
+        """
+        Sets functions recomputing batches of results missing in the cache, e.g. evicted by its byte budget.
+
+        Args:
+            output_fn (Optional[Callable]): Computes outputs from `data_ids`.
+            explanation_fn (Optional[Callable]): Computes explanations from `data_ids` and `explainer_id`.
+            evaluation_fn (Optional[Callable]): Computes evaluations from `data_ids`, `explainer_id`,
+                `postprocessor_id` and `metric_id`.
+        """
+        self._output_fn = output_fn
+        self._explanation_fn = explanation_fn
+        self._evaluation_fn = evaluation_fn
 
     @property
     def data(self):
@@ -72,6 +121,7 @@ class ExperimentManager:
         for idx, *explanation in zip(data_ids, *explanations):
             explanation = format_into_tuple(explanation)
             self._cache.set_explanation(idx, explainer_id, explanation)
+        self._cache.flush()
 
     def cache_evaluations(
         self,
@@ -87,6 +137,80 @@ class ExperimentManager:
             evaluation = format_into_tuple(evaluation)
             self._cache.set_evaluation(
                 idx, explainer_id, postprocessor_id, metric_id, evaluation)
+        self._cache.flush()
+        self._write_evaluation_table(
+            explainer_id, postprocessor_id, metric_id, data_ids,
+            format_out_tuple_if_single(evaluations),
+        )
+
+    def _write_evaluation_table(
+        self,
+        explainer_id: int,
+        postprocessor_id: int,
+        metric_id: int,
+        data_ids: Sequence[int],
+        evaluations,
+    ):
+        # only scalar evaluations are stored in the table
+        scalars = _as_scalars(evaluations)
+        if scalars is None:
+            return
+        with self._lock:
+            self._evaluation_table.write(
+                explainer_id, postprocessor_id, metric_id, data_ids, scalars)
+
+    def export_results(
+        self,
+        data_ids: Optional[Sequence[int]] = None,
+        explainer_ids: Optional[Sequence[int]] = None,
+        postprocessor_ids: Optional[Sequence[int]] = None,
+        metric_ids: Optional[Sequence[int]] = None,
+    ) -> Dict[str, Dict[Tuple[int, ...], Any]]:
+        """
+        Collects cached outputs, explanations and evaluations over a grid of ids as cpu tensors, e.g. to
+        send results of a worker process to its parent.
+
+        Returns:
+            Dict[str, Dict[Tuple[int, ...], Any]]: Cached values of 'outputs', 'explanations' and
+                'evaluations', keyed by tuples of ids.
+        """
+        data_ids = list(data_ids if data_ids is not None else self._data_ids)
+        explainer_ids = explainer_ids if explainer_ids is not None else self._explainer_ids
+        postprocessor_ids = postprocessor_ids if postprocessor_ids is not None else self._postprocessor_ids
+        metric_ids = metric_ids if metric_ids is not None else self._metric_ids
+        to_cpu = lambda value: map_recursive(value, lambda x: x.detach().cpu())
+
+        results = {'outputs': {}, 'explanations': {}, 'evaluations': {}}
+        for data_id in np.asarray(data_ids)[self._cache.computed(data_ids)].tolist():
+            results['outputs'][(data_id,)] = to_cpu(self._cache.get_output(data_id))
+        for explainer_id in explainer_ids:
+            computed = self._cache.computed(data_ids, explainer_id)
+            for data_id in np.asarray(data_ids)[computed].tolist():
+                results['explanations'][(data_id, explainer_id)] = to_cpu(
+                    self._cache.get_explanation(data_id, explainer_id))
+            for postprocessor_id in postprocessor_ids:
+                for metric_id in metric_ids:
+                    ids = (explainer_id, postprocessor_id, metric_id)
+                    computed = self._cache.computed(data_ids, *ids)
+                    for data_id in np.asarray(data_ids)[computed].tolist():
+                        results['evaluations'][(data_id, *ids)] = to_cpu(
+                            self._cache.get_evaluation(data_id, *ids))
+        return results
+
+    def import_results(self, results: Dict[str, Dict[Tuple[int, ...], Any]]):
+        """
+        Caches results collected by `export_results` of a manager with the same explainers,
+        postprocessors and metrics.
+        """
+        for (data_id,), output in results.get('outputs', {}).items():
+            self._cache.set_output(data_id, output)
+        for (data_id, explainer_id), explanation in results.get('explanations', {}).items():
+            self._cache.set_explanation(data_id, explainer_id, explanation)
+        for (data_id, *ids), evaluation in results.get('evaluations', {}).items():
+            self._cache.set_evaluation(data_id, *ids, evaluation)
+            self._write_evaluation_table(
+                *ids, [data_id], [format_out_tuple_if_single(evaluation)])
+        self._cache.flush()
 
     def get_data_ids(self) -> Sequence[int]:
         return self._data_ids
@@ -155,22 +279,39 @@ class ExperimentManager:
             return format_out_tuple_if_single(cached)
         return cached # This may be None
 
+    def prefetch_batch(self, data_ids: List[int]):
+        """
+        Loads and collates a batch ahead of use. Until released by `release_batch`, the batch is
+        served by `batch_data_by_ids` without loading it again.
+        """
+        batch = self.batch_data_by_ids(data_ids)
+        with self._lock:
+            self._prefetched[tuple(data_ids)] = batch
+        return batch
+
+    def release_batch(self, data_ids: List[int]):
+        with self._lock:
+            self._prefetched.pop(tuple(data_ids), None)
+
     def batch_data_by_ids(
         self,
         data_ids: List[int],
     ):
+        prefetched = self._prefetched.get(tuple(data_ids), None)
+        if prefetched is not None:
+            return prefetched
         batch = [self._data.dataset[idx] for idx in data_ids]
         batch = self._data.collate_fn(batch)
         return batch
 
     def batch_outputs_by_ids(self, data_ids: List[int]):
-        batch = []
-        for data_id in data_ids:
-            output = self.get_output_by_id(data_id)
-            if output is None:
-                raise KeyError(f"Output for {data_id} does not exist in cache.")
-            batch.append(output)
-        return self._format_batch(batch)
+        return self._collect_batch(
+            data_ids,
+            get_fn=self.get_output_by_id,
+            recompute_fn=self._output_fn,
+            cache_fn=self.cache_outputs,
+            name='Output',
+        )
 
     def batch_explainers_by_ids(self, explainer_ids: List[int]):
         return [self._explainers[idx] for idx in explainer_ids]
@@ -180,11 +321,15 @@ class ExperimentManager:
         data_ids: List[int],
         explainer_id: int,
     ):
-        batch = [
-            self.get_explanation_by_id(data_id, explainer_id)
-            for data_id in data_ids
-        ]
-        return self._format_batch(batch)
+        return self._collect_batch(
+            data_ids,
+            get_fn=lambda data_id: self.get_explanation_by_id(
+                data_id, explainer_id),
+            recompute_fn=self._bind_ids(self._explanation_fn, explainer_id),
+            cache_fn=lambda ids, values: self.cache_explanations(
+                explainer_id, ids, values),
+            name='Explanation',
+        )
 
     def batch_evaluations_by_ids(
         self,
@@ -193,13 +338,54 @@ class ExperimentManager:
         postprocessor_id: int,
         metric_id: int,
     ):
-        batch = [
-            self.get_evaluation_by_id(
-                data_id, explainer_id, postprocessor_id, metric_id)
-            for data_id in data_ids
+        return self._collect_batch(
+            data_ids,
+            get_fn=lambda data_id: self.get_evaluation_by_id(
+                data_id, explainer_id, postprocessor_id, metric_id),
+            recompute_fn=self._bind_ids(
+                self._evaluation_fn, explainer_id, postprocessor_id, metric_id),
+            cache_fn=lambda ids, values: self.cache_evaluations(
+                explainer_id, postprocessor_id, metric_id, ids, values),
+            name='Evaluation',
+        )
+
+    def _collect_batch(
+        self,
+        data_ids: List[int],
+        get_fn: Callable,
+        recompute_fn: Optional[Callable],
+        cache_fn: Callable,
+        name: str,
+    ):
+        batch = [get_fn(data_id) for data_id in data_ids]
+        missing = [
+            data_id for data_id, value in zip(data_ids, batch)
+            if value is None
         ]
+        if len(missing) > 0:
+            if recompute_fn is None:
+                raise KeyError(f"{name} for {missing} does not exist in cache.")
+            # recompute entries missing in cache, e.g. evicted ones
+            recomputed = recompute_fn(missing)
+            cache_fn(missing, recomputed)
+            recomputed = dict(zip(missing, self._unbatch(recomputed)))
+            batch = [
+                recomputed[data_id] if value is None else value
+                for data_id, value in zip(data_ids, batch)
+            ]
         return self._format_batch(batch)
 
+    @staticmethod
+    def _bind_ids(fn: Optional[Callable], *ids):
+        if fn is None:
+            return None
+        return lambda data_ids: fn(data_ids, *ids)
+
+    @staticmethod
+    def _unbatch(batch):
+        batch = format_into_tuple(batch)
+        return [format_out_tuple_if_single(tuple(values)) for values in zip(*batch)]
+
     def _format_batch(self, batch):
         if isinstance(batch[0], Tuple):
             cnt = len(batch[0])
@@ -219,6 +405,7 @@ class ExperimentManager:
         explainer_id = len(self._explainers)
         self._explainers.append(explainer)
         self._explainer_ids.append(explainer_id)
+        self._cache.set_fingerprint('explainer', explainer_id, _fingerprint_or_unique(explainer))
         return explainer_id
 
     def _get_explainers_by_ids(self, explainer_ids: Optional[Sequence[int]] = None) -> List[Explainer]:
@@ -233,6 +420,7 @@ class ExperimentManager:
         postprocessor_id = len(self._postprocessors)
         self._postprocessors.append(postprocessor)
         self._postprocessor_ids.append(postprocessor_id)
+        self._cache.set_fingerprint('postprocessor', postprocessor_id, _fingerprint_or_unique(postprocessor))
         return postprocessor_id
 
     def _get_postprocessors_by_ids(self, postprocessor_ids: Optional[Sequence[int]]=None) -> List[Callable]:
@@ -247,6 +435,7 @@ class ExperimentManager:
         metric_id = len(self._metrics)
         self._metrics.append(metric)
         self._metric_ids.append(metric_id)
+        self._cache.set_fingerprint('metric', metric_id, _fingerprint_or_unique(metric))
         return metric_id
 
     def _get_metrics_by_ids(self, metric_ids: Optional[Sequence[int]] = None) -> List[Metric]:
@@ -263,9 +452,7 @@ class ExperimentManager:
         data_ids: Optional[List[int]] = None,
     ) -> Tuple[DataSource, List[int]]:
         data_ids = data_ids or self._data_ids
-        data_ids = [
-            idx for idx in data_ids if self._cache.get_explanation(idx, explainer_id) is None
-        ]
+        data_ids = self._cache.missing(data_ids, explainer_id)
         return self._get_data_by_ids(data_ids), data_ids
 
     def save_explanations(self, explanations: DataSource, data: DataSource, data_ids: Sequence[int], explainer_id: int):
@@ -273,6 +460,7 @@ class ExperimentManager:
         assert len(explanations) == len(data_ids)
         for idx, explanation in zip(data_ids, explanations):
             self._cache.set_explanation(idx, explainer_id, explanation)
+        self._cache.flush()
 
     def get_data_to_process_for_metric(
         self,
@@ -282,17 +470,24 @@ class ExperimentManager:
         data_ids: Optional[List[int]]=None,
     ) -> Tuple[DataSource, List[int]]:
         data_ids = data_ids or self._data_ids
-        data_ids = [
-            idx for idx in data_ids
-            if self._cache.get_evaluation(idx, explainer_id, postprocessor_id, metric_id) is None
-        ]
+        data_ids = self._cache.missing(data_ids, explainer_id, postprocessor_id, metric_id)
         return self._get_data_by_ids(data_ids), data_ids
 
+    def get_missing_data_ids(
+        self,
+        data_ids: Sequence[int],
+        explainer_id: Optional[int] = None,
+        postprocessor_id: Optional[int] = None,
+        metric_id: Optional[int] = None,
+    ) -> List[int]:
+        """
+        Returns data ids whose outputs, explanations or evaluations are not available in cache.
+        """
+        return self._cache.missing(data_ids, explainer_id, postprocessor_id, metric_id)
+
     def get_data_to_predict(self, data_ids: List[int]) -> Tuple[DataSource, List[int]]:
         data_ids = data_ids or self._data_ids
-        data_ids = [
-            idx for idx in data_ids if self._cache.get_output(idx) is None
-        ]
+        data_ids = self._cache.missing(data_ids)
         return self._get_data_by_ids(data_ids), data_ids
 
 
@@ -318,7 +513,11 @@ class ExperimentManager:
 
     def get_flat_explanations(self, explainer_id: int, data_ids: Optional[Sequence[int]] = None) -> Sequence[Tensor]:
         data_ids = data_ids if data_ids is not None else self._data_ids
-        return [self._cache.get_explanation(idx, explainer_id) for idx in data_ids]
+        computed = self._cache.computed(data_ids, explainer_id)
+        return [
+            self._cache.get_explanation(idx, explainer_id) if is_computed else None
+            for idx, is_computed in zip(data_ids, computed)
+        ]
 
     def get_flat_evaluations(
         self,
@@ -328,8 +527,67 @@ class ExperimentManager:
         data_ids: Optional[Sequence[int]] = None
     ) -> Sequence[Tensor]:
         data_ids = data_ids if data_ids is not None else self._data_ids
-        return [self._cache.get_evaluation(
-            idx, explainer_id, postprocessor_id, metric_id) for idx in data_ids]
+        computed = self._cache.computed(data_ids, explainer_id, postprocessor_id, metric_id)
+        return [
+            self._cache.get_evaluation(idx, explainer_id, postprocessor_id, metric_id)
+            if is_computed else None
+            for idx, is_computed in zip(data_ids, computed)
+        ]
+
+    def get_computed_evaluations(
+        self,
+        explainer_ids: Optional[List[int]] = None,
+        postprocessor_ids: Optional[List[int]] = None,
+        metric_ids: Optional[List[int]] = None,
+        data_ids: Optional[Sequence[int]] = None,
+    ) -> np.ndarray:
+        """
+        Flags which evaluations are available over a grid of ids, defaulting to all of them.
+
+        Returns:
+            np.ndarray: A boolean array of shape (explainers, postprocessors, metrics, data).
+        """
+        return self._cache.computed_evaluations(
+            data_ids if data_ids is not None else self._data_ids,
+            explainer_ids if explainer_ids is not None else self._explainer_ids,
+            postprocessor_ids if postprocessor_ids is not None else self._postprocessor_ids,
+            metric_ids if metric_ids is not None else self._metric_ids,
+        )
+
+    def get_evaluation_table(
+        self,
+        explainer_ids: Optional[List[int]] = None,
+        postprocessor_ids: Optional[List[int]] = None,
+        metric_ids: Optional[List[int]] = None,
+        data_ids: Optional[Sequence[int]] = None,
+    ) -> np.ndarray:
+        """
+        Returns scalar evaluations over a grid of ids, defaulting to all of them. Missing evaluations are NaN.
+
+        Returns:
+            np.ndarray: A float array of shape (explainers, postprocessors, metrics, data).
+        """
+        explainer_ids = explainer_ids if explainer_ids is not None else self._explainer_ids
+        postprocessor_ids = postprocessor_ids if postprocessor_ids is not None else self._postprocessor_ids
+        metric_ids = metric_ids if metric_ids is not None else self._metric_ids
+        data_ids = data_ids if data_ids is not None else self._data_ids
+        ids = (explainer_ids, postprocessor_ids, metric_ids, data_ids)
+        with self._lock:
+            table = self._evaluation_table.read(*ids)
+
+        # backfill evaluations available in cache but not in the table, e.g. loaded from disk
+        computed = self.get_computed_evaluations(*ids)
+        unfilled = np.argwhere(computed & np.isnan(table))
+        for e, p, m, n in unfilled:
+            evaluation = self._cache.get_evaluation(
+                data_ids[n], explainer_ids[e], postprocessor_ids[p], metric_ids[m])
+            scalars = _as_scalars([format_out_tuple_if_single(evaluation)])
+            if scalars is None:
+                continue
+            self._write_evaluation_table(
+                explainer_ids[e], postprocessor_ids[p], metric_ids[m], [data_ids[n]], scalars)
+            table[e, p, m, n] = scalars[0]
+        return table
 
     def get_flat_outputs(self, data_ids: Optional[Sequence[int]] = None) -> Tuple[DataSource, List[int]]:
         data_ids = data_ids if data_ids is not None else self._data_ids
@@ -349,7 +607,10 @@ class ExperimentManager:
 
         for idx, evaluation in zip(data_ids, evaluations):
             self._cache.set_evaluation(
-                idx, explainer_id, metric_id, postprocessor_id, evaluation)
+                idx, explainer_id, postprocessor_id, metric_id, evaluation)
+        self._cache.flush()
+        self._write_evaluation_table(
+            explainer_id, postprocessor_id, metric_id, data_ids, evaluations)
 
     def save_outputs(self, outputs: DataSource, data: DataSource, data_ids: Sequence[int]):
         outputs = self.flatten_if_batched(outputs, data)
@@ -431,3 +692,21 @@ class ExperimentManager:
     @property
     def _available_data_ids(self):
         return self._all_data_ids if self._data_ids is None else self._data_ids
+
+
+def _as_scalars(evaluations) -> Optional[np.ndarray]:
+    if torch.is_tensor(evaluations):
+        if evaluations.dim() != 1:
+            return None
+        return evaluations.detach().cpu().double().numpy()
+    if not all(
+        isinstance(ev, (int, float)) or (torch.is_tensor(ev) and ev.numel() == 1)
+        for ev in evaluations
+    ):
+        return None
+    return np.array([float(ev) for ev in evaluations])
+
+
+def _fingerprint_or_unique(obj: Any) -> str:
+    # objects without a stable description never share results, in memory or on disk
+    return get_fingerprint(obj) or f"unique-{uuid.uuid4().hex[:16]}"
@@ -0,0 +1,257 @@
+from typing import Optional, Sequence, List, Tuple, Deque
+import threading
+from queue import Queue, Empty, Full
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from contextlib import contextmanager
+
+from pnpxai.explainers import (
+    Explainer,
+    Gradient,
+    GradientXInput,
+    SmoothGrad,
+    VarGrad,
+    IntegratedGradients,
+    Lime,
+    KernelShap,
+)
+from pnpxai.evaluator.metrics.base import Metric
+from pnpxai.evaluator.metrics.sensitivity import Sensitivity
+
+
+# explainers attributing without registering hooks on the model
+HOOK_FREE_EXPLAINERS = (
+    Gradient,
+    GradientXInput,
+    SmoothGrad,
+    VarGrad,
+    IntegratedGradients,
+    Lime,
+    KernelShap,
+)
+
+# metrics re-running the explainer while evaluating
+EXPLAINING_METRICS = (Sensitivity,)
+
+_END = object()
+
+
+class ModelLock:
+    """
+    A readers-writer lock guarding a model shared by threads.
+
+    Work only running the model (e.g. forwards of metrics) holds the lock shared, while work
+    registering hooks on the model (e.g. LRP composites, or hooks on a target layer) holds it
+    exclusively. Waiting exclusive holders are preferred over new shared ones.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._writer or self._waiting_writers > 0:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers > 0:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+    def acquire(self, exclusive: bool):
+        return self.exclusive() if exclusive else self.shared()
+
+
+def hooks_model(explainer: Explainer) -> bool:
+    """
+    Returns whether attributing by the explainer modifies the model, e.g. by registering hooks.
+    """
+    if getattr(explainer, 'layer', None) is not None:
+        return True
+    return not isinstance(explainer, HOOK_FREE_EXPLAINERS)
+
+
+class ExperimentPipeline:
+    """
+    Runs an experiment as a pipeline of concurrent stages over micro-batches of data.
+
+    The (data x explainer x postprocessor x metric) grid is processed as a dependency graph: a
+    loader thread prefetches and collates micro-batches into a bounded queue, the calling thread
+    predicts and explains each batch on the model device, and every evaluation of an explained
+    batch is submitted to a thread pool. CPU-bound work of the stages (data loading, segmentation,
+    rank correlations, histograms, postprocessing) therefore overlaps with the device work of the
+    next explanations.
+
+    Work that hooks into the shared model is serialized by a `ModelLock`, so that concurrent
+    forwards of metrics never observe hooks of an explainer in progress.
+
+    Parameters:
+        experiment (Experiment): The experiment to run.
+        batch_size (Optional[int]): Size of micro-batches. If None, the batch size of the data loader is used.
+        n_workers (int): Number of threads evaluating metrics.
+        prefetch (int): Number of micro-batches loaded ahead of the device stage.
+        max_pending_batches (int): Number of explained micro-batches whose evaluations may be in flight.
+    """
+
+    def __init__(
+        self,
+        experiment,
+        batch_size: Optional[int] = None,
+        n_workers: int = 4,
+        prefetch: int = 2,
+        max_pending_batches: int = 2,
+    ):
+        self.experiment = experiment
+        self.batch_size = batch_size
+        self.n_workers = n_workers
+        self.prefetch = prefetch
+        self.max_pending_batches = max_pending_batches
+        self.model_lock = ModelLock()
+
+    def run(
+        self,
+        data_ids: Optional[Sequence[int]] = None,
+        explainer_ids: Optional[Sequence[int]] = None,
+        postprocessor_ids: Optional[Sequence[int]] = None,
+        metric_ids: Optional[Sequence[int]] = None,
+    ):
+        """
+        Runs the experiment over the selected grid.
+
+        Returns:
+            The Experiment instance with updated results and state.
+        """
+        experiment = self.experiment
+        manager = experiment.manager
+        experiment.reset_errors()
+
+        data_ids = data_ids if data_ids is not None else manager.get_data_ids()
+        batches = experiment._split_data_ids(data_ids, self.batch_size)
+        explainers, explainer_ids = manager.get_explainers(explainer_ids)
+        postprocessors, postprocessor_ids = manager.get_postprocessors(postprocessor_ids)
+        metrics, metric_ids = manager.get_metrics(metric_ids)
+
+        queue = Queue(maxsize=max(self.prefetch, 1))
+        stop = threading.Event()
+        loader = threading.Thread(
+            target=self._load, args=(batches, queue, stop), daemon=True)
+        loader.start()
+
+        in_flight: Deque[Tuple[List[int], List[Future]]] = deque()
+        with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+            try:
+                while True:
+                    batch_ids = queue.get()
+                    if batch_ids is _END:
+                        break
+                    if isinstance(batch_ids, BaseException):
+                        raise batch_ids
+                    futures = self._process_batch(
+                        pool, batch_ids, explainers, explainer_ids,
+                        postprocessor_ids, metrics, metric_ids,
+                    )
+                    in_flight.append((batch_ids, futures))
+                    self._drain(in_flight, self.max_pending_batches)
+            finally:
+                # the loader is stopped even if the loop raised, unblocking its pending put
+                stop.set()
+                _clear(queue)
+                loader.join()
+                self._drain(in_flight, 0)
+
+        for explainer in explainers:
+            experiment._fire_run_events(explainer, postprocessors, metrics)
+        return experiment
+
+    def _load(self, batches: List[List[int]], queue: Queue, stop: threading.Event):
+        try:
+            for batch_ids in batches:
+                if stop.is_set():
+                    return
+                self.experiment.manager.prefetch_batch(batch_ids)
+                _put(queue, batch_ids, stop)
+        except BaseException as e:
+            _put(queue, e, stop)
+            return
+        _put(queue, _END, stop)
+
+    def _process_batch(
+        self,
+        pool: ThreadPoolExecutor,
+        batch_ids: List[int],
+        explainers: List[Explainer],
+        explainer_ids: List[int],
+        postprocessor_ids: List[int],
+        metrics: List[Metric],
+        metric_ids: List[int],
+    ) -> List[Future]:
+        experiment = self.experiment
+        with self.model_lock.shared():
+            experiment.predict_batch(batch_ids)
+
+        futures = []
+        for explainer, explainer_id in zip(explainers, explainer_ids):
+            with self.model_lock.acquire(hooks_model(explainer)):
+                explained = experiment._explain_micro_batch(batch_ids, explainer_id)
+            if not explained:
+                continue
+            for postprocessor_id in postprocessor_ids:
+                for metric, metric_id in zip(metrics, metric_ids):
+                    exclusive = isinstance(metric, EXPLAINING_METRICS) and hooks_model(explainer)
+                    futures.append(pool.submit(
+                        self._evaluate, exclusive, batch_ids,
+                        explainer_id, postprocessor_id, metric_id,
+                    ))
+        return futures
+
+    def _evaluate(self, exclusive: bool, *args):
+        with self.model_lock.acquire(exclusive):
+            return self.experiment._evaluate_micro_batch(*args)
+
+    def _drain(self, in_flight: Deque[Tuple[List[int], List[Future]]], limit: int):
+        while len(in_flight) > limit:
+            batch_ids, futures = in_flight.popleft()
+            wait(futures)
+            self.experiment.manager.release_batch(batch_ids)
+            for future in futures:
+                # errors of evaluations are collected by the experiment
+                future.result()
+
+
+def _put(queue: Queue, item, stop: threading.Event, timeout: float = .1):
+    # puts an item unless stopped while the queue is full
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=timeout)
+            return
+        except Full:
+            continue
+
+
+def _clear(queue: Queue):
+    while True:
+        try:
+            queue.get_nowait()
+        except Empty:
+            return
@@ -0,0 +1,156 @@
+from typing import Any, Callable, Dict, List, Literal, Optional, Sequence, Tuple
+import os
+import math
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import torch
+
+
+ShardBy = Literal['data', 'explainer']
+
+# experiment built once per worker process by `_init_worker`
+_WORKER_EXPERIMENT = None
+
+
+def _init_worker(experiment_factory: Callable[[], Any], n_threads: int):
+    global _WORKER_EXPERIMENT
+    torch.set_num_threads(n_threads)
+    _WORKER_EXPERIMENT = experiment_factory()
+
+
+def _run_shard(
+    data_ids: Sequence[int],
+    explainer_ids: Sequence[int],
+    postprocessor_ids: Sequence[int],
+    metric_ids: Sequence[int],
+    batch_size: Optional[int],
+) -> Tuple[Dict[str, Dict[Tuple[int, ...], Any]], List[str]]:
+    experiment = _WORKER_EXPERIMENT
+    experiment.run(
+        data_ids=data_ids,
+        explainer_ids=explainer_ids,
+        postprocessor_ids=postprocessor_ids,
+        metric_ids=metric_ids,
+        batch_size=batch_size,
+    )
+    results = experiment.manager.export_results(
+        data_ids, explainer_ids, postprocessor_ids, metric_ids)
+    # exceptions are not necessarily picklable
+    errors = [repr(error) for error in experiment.errors]
+    # results of the shard are sent to the parent, so they need not stay in the worker
+    experiment.manager.clear_cache()
+    return results, errors
+
+
+class ShardedRunner:
+    """
+    Runs an experiment across worker processes, each owning a shard of data or explainers.
+
+    Every worker builds its own experiment once by calling `experiment_factory`, so the model is
+    loaded once per process rather than once per shard. Shards are run by `Experiment.run` in the
+    workers, and their cached outputs, explanations and evaluations are merged back into the
+    manager of the parent experiment.
+
+    The factory must be picklable (e.g. a module-level function or a `functools.partial` of one)
+    and must build experiments with the same explainers, postprocessors and metrics in the same
+    order, since results are merged by ids.
+
+    Parameters:
+        experiment_factory (Callable[[], Experiment]): Builds the experiment run by workers.
+        n_workers (Optional[int]): Number of worker processes. Defaults to the number of cpus.
+        shard_by (ShardBy): Whether data ids or explainer ids are partitioned across shards.
+        shards_per_worker (int): Number of shards per worker, balancing uneven shards.
+        batch_size (Optional[int]): Size of micro-batches run by workers.
+        n_threads (Optional[int]): Number of torch threads of each worker. Defaults to an even split of cpus.
+        mp_context (str): Start method of worker processes.
+    """
+
+    def __init__(
+        self,
+        experiment_factory: Callable[[], Any],
+        n_workers: Optional[int] = None,
+        shard_by: ShardBy = 'data',
+        shards_per_worker: int = 4,
+        batch_size: Optional[int] = None,
+        n_threads: Optional[int] = None,
+        mp_context: str = 'spawn',
+    ):
+        assert shard_by in ('data', 'explainer'), f"Unsupported shard_by: {shard_by}"
+        n_cpus = os.cpu_count() or 1
+        self.experiment_factory = experiment_factory
+        self.n_workers = n_workers or n_cpus
+        self.shard_by = shard_by
+        self.shards_per_worker = shards_per_worker
+        self.batch_size = batch_size
+        self.n_threads = n_threads or max(1, n_cpus // self.n_workers)
+        self.mp_context = mp_context
+
+    def split(self, ids: Sequence[int]) -> List[List[int]]:
+        """
+        Partitions ids into contiguous shards.
+        """
+        ids = list(ids)
+        n_shards = min(len(ids), self.n_workers * self.shards_per_worker)
+        if n_shards == 0:
+            return []
+        shard_size = math.ceil(len(ids) / n_shards)
+        return [ids[start:start+shard_size] for start in range(0, len(ids), shard_size)]
+
+    def run(
+        self,
+        experiment=None,
+        data_ids: Optional[Sequence[int]] = None,
+        explainer_ids: Optional[Sequence[int]] = None,
+        postprocessor_ids: Optional[Sequence[int]] = None,
+        metric_ids: Optional[Sequence[int]] = None,
+    ):
+        """
+        Runs shards in worker processes and merges their results.
+
+        Args:
+            experiment (Optional[Experiment]): The experiment results are merged into. If None, it is built by the factory.
+            data_ids (Optional[Sequence[int]]): A sequence of data IDs to specify the subset of data to process.
+            explainer_ids (Optional[Sequence[int]]): A sequence of explainer IDs to specify the subset of explainers to use.
+            postprocessor_ids (Optional[Sequence[int]]): A sequence of postprocessor IDs to specify the subset of postprocessors to use.
+            metric_ids (Optional[Sequence[int]]): A sequence of metric IDs to specify the subset of metrics to evaluate.
+
+        Returns:
+            The Experiment instance with merged results.
+        """
+        experiment = experiment if experiment is not None else self.experiment_factory()
+        manager = experiment.manager
+        experiment.reset_errors()
+
+        data_ids = list(data_ids if data_ids is not None else manager.get_data_ids())
+        _, explainer_ids = manager.get_explainers(explainer_ids)
+        _, postprocessor_ids = manager.get_postprocessors(postprocessor_ids)
+        _, metric_ids = manager.get_metrics(metric_ids)
+
+        if self.shard_by == 'data':
+            shards = [
+                (shard, explainer_ids) for shard in self.split(data_ids)
+            ]
+        else:
+            shards = [
+                (data_ids, shard) for shard in self.split(explainer_ids)
+            ]
+
+        with ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=mp.get_context(self.mp_context),
+            initializer=_init_worker,
+            initargs=(self.experiment_factory, self.n_threads),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _run_shard, shard_data_ids, shard_explainer_ids,
+                    postprocessor_ids, metric_ids, self.batch_size,
+                )
+                for shard_data_ids, shard_explainer_ids in shards
+            ]
+            for future in as_completed(futures):
+                results, errors = future.result()
+                manager.import_results(results)
+                experiment.errors.extend(RuntimeError(error) for error in errors)
+        return experiment
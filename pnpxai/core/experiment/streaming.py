@@ -0,0 +1,213 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+import warnings
+
+import numpy as np
+import torch
+from torch import nn
+
+from pnpxai.core.modality.modality import Modality
+from pnpxai.core.experiment.experiment import (
+    Experiment,
+    default_input_extractor,
+    default_label_extractor,
+    default_target_extractor,
+    postprocess,
+    rank_explainers,
+)
+from pnpxai.explainers.base import Explainer
+from pnpxai.evaluator.metrics.base import Metric
+from pnpxai.messages import get_message
+from pnpxai.utils import class_to_string, format_into_tuple, to_device
+
+
+class RunningAggregates:
+    """
+    Aggregates of evaluations over a stream in constant memory: the mean evaluation per
+    (explainer, postprocessor, metric) and the mean rank per (explainer, postprocessor).
+
+    Means are cumulative, or exponential moving averages if `decay` is given.
+
+    Parameters:
+        shape (Tuple[int, int, int]): Numbers of explainers, postprocessors and metrics.
+        decay (Optional[float]): Weight of the past in exponential moving averages, in [0, 1).
+    """
+
+    def __init__(self, shape: Tuple[int, int, int], decay: Optional[float] = None):
+        assert decay is None or 0. <= decay < 1., "decay must be in [0, 1)."
+        self.decay = decay
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.mean_evaluations = np.full(shape, np.nan)
+        self.rank_counts = np.zeros(shape[:2], dtype=np.int64)
+        self.mean_ranks = np.full(shape[:2], np.nan)
+
+    def update(self, evaluations: np.ndarray, ranks: np.ndarray):
+        """
+        Updates aggregates with a batch.
+
+        Args:
+            evaluations (np.ndarray): Evaluations of shape (explainers, postprocessors, metrics, batch). Missing evaluations are NaN.
+            ranks (np.ndarray): Ranks of shape (explainers, postprocessors, batch).
+        """
+        self._update(self.mean_evaluations, self.counts, evaluations)
+        self._update(self.mean_ranks, self.rank_counts, ranks.astype(float))
+
+    def _update(self, means: np.ndarray, counts: np.ndarray, values: np.ndarray):
+        valid = ~np.isnan(values)
+        n = valid.sum(-1)
+        batch_means = np.where(valid, values, 0.).sum(-1) / np.maximum(n, 1)
+        updated = n > 0
+        first = updated & (counts == 0)
+        if self.decay is None:
+            weights = n / np.maximum(counts + n, 1)
+        else:
+            weights = np.full(means.shape, 1. - self.decay)
+        means[first] = batch_means[first]
+        rest = updated & ~first
+        means[rest] += weights[rest] * (batch_means[rest] - means[rest])
+        counts += n
+
+
+class ExperimentStream:
+    """
+    Explains and evaluates an unbounded stream of batches without keeping past results.
+
+    Unlike `Experiment`, which caches results of a data source with known length and random
+    access, every batch of the stream is predicted, explained, postprocessed and evaluated once.
+    Results are emitted per batch by `stream` and to an optional callback, while
+    `RunningAggregates` keep the mean evaluations and ranks of explainers so far.
+
+    Parameters:
+        model (nn.Module): The model to explain.
+        explainers (Sequence[Explainer]): Explainers to run on every batch.
+        postprocessors (Sequence[Callable]): Postprocessors applied to explanations.
+        metrics (Sequence[Metric]): Metrics evaluating postprocessed explanations.
+        modality (Modality): Modality of the data.
+        input_extractor (Optional[Callable[[Any], Any]]): Extracts inputs from a batch.
+        label_extractor (Optional[Callable[[Any], Any]]): Extracts labels from a batch.
+        target_extractor (Optional[Callable[[Any], Any]]): Extracts targets from outputs.
+        target_labels (bool): Whether labels are used as targets instead of predictions.
+        decay (Optional[float]): If given, aggregates are exponential moving averages with this weight of the past.
+        callback (Optional[Callable[[Dict[str, Any]], None]]): Called with results of each batch.
+    """
+
+    def __init__(
+        self,
+        model: nn.Module,
+        explainers: Sequence[Explainer],
+        postprocessors: Sequence[Callable],
+        metrics: Sequence[Metric],
+        modality: Modality,
+        input_extractor: Optional[Callable[[Any], Any]] = None,
+        label_extractor: Optional[Callable[[Any], Any]] = None,
+        target_extractor: Optional[Callable[[Any], Any]] = None,
+        target_labels: bool = False,
+        decay: Optional[float] = None,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.model = model
+        self.model_device = next(model.parameters()).device
+        self.explainers = list(explainers)
+        self.postprocessors = list(postprocessors)
+        self.metrics = list(metrics)
+        self.modality = modality
+        self.input_extractor = input_extractor or default_input_extractor
+        self.label_extractor = label_extractor or default_label_extractor
+        self.target_extractor = target_extractor or default_target_extractor
+        self.target_labels = target_labels
+        self.callback = callback
+        self.metric_names = [class_to_string(metric) for metric in self.metrics]
+        self.aggregates = RunningAggregates(
+            (len(self.explainers), len(self.postprocessors), len(self.metrics)),
+            decay=decay,
+        )
+
+    @classmethod
+    def from_experiment(cls, experiment: Experiment, **kwargs) -> 'ExperimentStream':
+        """
+        Creates a stream with the model, explainers, postprocessors, metrics and extractors of an experiment.
+        """
+        return cls(
+            model=experiment.model,
+            explainers=experiment.manager.explainers,
+            postprocessors=experiment.manager.postprocessors,
+            metrics=experiment.manager.metrics,
+            modality=experiment.modality,
+            input_extractor=experiment.input_extractor,
+            label_extractor=experiment.label_extractor,
+            target_extractor=experiment.target_extractor,
+            target_labels=experiment.target_labels,
+            **kwargs,
+        )
+
+    def stream(self, batches: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Processes batches one by one.
+
+        Args:
+            batches (Iterable[Any]): Batches in the format of data loaders of experiments, e.g. from an IterableDataset.
+
+        Yields:
+            The dictionary of batch index, outputs, targets, explanations keyed by explainer ids, evaluations
+            of shape (explainers, postprocessors, metrics, batch), ranks of shape (explainers, postprocessors, batch),
+            and the running aggregates.
+        """
+        for batch_idx, batch in enumerate(batches):
+            result = self.process_batch(batch)
+            result['batch_index'] = batch_idx
+            if self.callback is not None:
+                self.callback(result)
+            yield result
+
+    def run(self, batches: Iterable[Any]) -> RunningAggregates:
+        """
+        Consumes batches, e.g. with a callback, and returns the aggregates.
+        """
+        for _ in self.stream(batches):
+            pass
+        return self.aggregates
+
+    def process_batch(self, batch: Any) -> Dict[str, Any]:
+        inputs = to_device(self.input_extractor(batch), self.model_device)
+        outputs = self.model(*format_into_tuple(inputs))
+        targets = self.label_extractor(batch) if self.target_labels \
+            else self.target_extractor(outputs)
+        targets = to_device(targets, self.model_device)
+        batch_size = len(targets)
+
+        explanations = {}
+        evaluations = np.full(self.aggregates.counts.shape + (batch_size,), np.nan)
+        for explainer_id, explainer in enumerate(self.explainers):
+            explainer_name = class_to_string(explainer)
+            try:
+                explanations[explainer_id] = explainer.attribute(inputs, targets)
+            except Exception as e:
+                warnings.warn(
+                    f"\n[Experiment] {get_message('experiment.errors.explanation', explainer=explainer_name, error=e)}")
+                continue
+            for postprocessor_id, postprocessor in enumerate(self.postprocessors):
+                try:
+                    postprocessed = postprocess(
+                        explainer, postprocessor, explanations[explainer_id], self.modality)
+                except NotImplementedError:
+                    continue
+                for metric_id, metric in enumerate(self.metrics):
+                    try:
+                        evaluation = metric.set_explainer(explainer).evaluate(
+                            inputs, targets, postprocessed)
+                    except Exception as e:
+                        warnings.warn(
+                            f"\n[Experiment] {get_message('experiment.errors.evaluation', explainer=explainer_name, metric=self.metric_names[metric_id], error=e)}")
+                        continue
+                    evaluations[explainer_id, postprocessor_id, metric_id] = \
+                        torch.as_tensor(evaluation).detach().cpu().double().numpy()
+
+        ranks = rank_explainers(evaluations, self.metric_names)
+        self.aggregates.update(evaluations, ranks)
+        return {
+            'outputs': outputs,
+            'targets': targets,
+            'explanations': explanations,
+            'evaluations': evaluations,
+            'ranks': ranks,
+            'aggregates': self.aggregates,
+        }
@@ -1,13 +1,12 @@
 from typing import Callable, Optional, Union, Tuple, Dict, Any
 
 import torch
-import torch.nn.functional as F
 from torch.nn.modules import Module
 
 from pnpxai.explainers.types import Tensor, TensorOrTupleOfTensors
 from pnpxai.explainers.base import Explainer
 from pnpxai.explainers import GradCam
-from pnpxai.utils import format_into_tuple, format_into_tuple_all
+from pnpxai.utils import format_into_tuple, format_into_tuple_all, compiled, compiled_model
 from pnpxai.explainers.utils.postprocess import PostProcessor
 from pnpxai.evaluator.metrics.base import Metric
 
@@ -94,7 +93,8 @@ class PixelFlipping(Metric):
         bsz = formatted['forward_args'][0].size(0)
         results = []
 
-        outputs = self.model(
+        forward = compiled_model(self.model)
+        outputs = forward(
             *formatted['forward_args'],
             *formatted['additional_forward_args'],
         )
@@ -118,33 +118,29 @@ class PixelFlipping(Metric):
                 descending=descending,
                 stable=True,
             )
+            # rank of each feature in the order of flipping
+            ranks = sorted_indices.argsort(-1).to(self.device)
             probs = [_extract_target_probs(init_probs, targets)]
             preds = [init_preds]
             for step in range(1, self.n_steps):
                 n_flipped = n_flipped_per_step * step
                 if step + 1 == self.n_steps:
                     n_flipped = valid_n_features
-                is_index_of_flipped = (
-                    F.one_hot(n_flipped-1, num_classes=attrs.size(-1)).to(self.device)
-                    .flip(-1).cumsum(-1).flip(-1)
-                )
-                is_flipped = _sort_by_order(
-                    is_index_of_flipped, sorted_indices.argsort(-1))
-                is_flipped = _recover_shape_if_flattened(is_flipped, original_size)
-                is_flipped = _match_channel_dim_if_pooled(
-                    is_flipped,
+                baseline = baseline_fn(forward_arg)
+                flipped_forward_arg = _flip(
+                    forward_arg,
+                    baseline,
+                    ranks,
+                    n_flipped.to(self.device),
+                    original_size,
                     formatted['channel_dim'][pos],
-                    forward_arg.size()
                 )
 
-                baseline = baseline_fn(forward_arg)
-                flipped_forward_arg = baseline * is_flipped + forward_arg * (1 - is_flipped)
-
                 flipped_forward_args = tuple(
                     flipped_forward_arg if i == pos else formatted['forward_args'][i]
                     for i in range(len(formatted['forward_args']))
                 )
-                flipped_outputs = self.model(
+                flipped_outputs = forward(
                     *flipped_forward_args,
                     *formatted['additional_forward_args'],
                 )
@@ -381,13 +377,13 @@ def _extract_target_probs(probs, targets):
     # please ensure probs.size() == (batch_size, n_classes)
     return probs[torch.arange(probs.size(0)), targets]
 
-def _sort_by_order(x, permutation):
-    d1, d2 = x.size()
-    ret = x[
-        torch.arange(d1).unsqueeze(1).repeat((1, d2)).flatten().to(x.device),
-        permutation.flatten().to(x.device)
-    ].view(d1, d2)
-    return ret
+@compiled
+def _flip(forward_arg, baseline, ranks, n_flipped, original_size, channel_dim):
+    # replaces features ranked before n_flipped by the baseline
+    is_flipped = (ranks < n_flipped.unsqueeze(-1)).to(forward_arg.dtype)
+    is_flipped = _recover_shape_if_flattened(is_flipped, original_size)
+    is_flipped = _match_channel_dim_if_pooled(is_flipped, channel_dim, forward_arg.size())
+    return baseline * is_flipped + forward_arg * (1 - is_flipped)
 
 def _flatten_if_not_1d(batch):
     if batch.dim() > 2:
@@ -13,6 +13,7 @@ from pnpxai.explainers.lrp import (
     LRPEpsilonGammaBox,
     LRPEpsilonPlus,
     LRPEpsilonAlpha2Beta1,
+    MultiRuleLRP,
 )
 from pnpxai.explainers.rap import RAP
 from pnpxai.explainers.kernel_shap import KernelShap
@@ -21,6 +21,7 @@ from pnpxai.explainers.zennit.base import ZennitExplainer
 from pnpxai.explainers.utils import captum_wrap_model_input
 from pnpxai.explainers.types import ForwardArgumentExtractor
 from pnpxai.evaluator.optimizer.utils import generate_param_key
+from pnpxai.utils import compiled
 
 
 def rollout_min_head_fusion_function(attn_weights):
@@ -41,6 +42,32 @@ def _get_rollout_head_fusion_function(method: Literal['min', 'max', 'mean']):
         return rollout_mean_head_fusion_function
 
 
+def _discard(fused_attn_map, discard_ratio):
+    org_size = fused_attn_map.size() # keep size to recover it after discard
+    flattened = fused_attn_map.flatten(1)
+    bsz, n_tokens = flattened.size()
+    attn_cls = flattened[:, 0] # keep attn scores of cls token to recover them after discard
+    _, indices = flattened.topk(
+        k=int(n_tokens*discard_ratio),
+        dim=-1,
+        largest=False,
+    )
+    flattened[torch.arange(bsz, device=flattened.device)[:, None], indices] = 0. # discard
+    flattened[:, 0] = attn_cls # recover attn scores of cls token
+    discarded = flattened.view(*org_size)
+    return discarded
+
+@compiled
+def _rollout_step(rollout, attn_weights, head_fusion_function, discard_ratio):
+    # multiplies the rollout by the fused, discarded and normalized attention map of a layer
+    attn_map = head_fusion_function(attn_weights)
+    attn_map = _discard(attn_map, discard_ratio)
+    identity = torch.eye(attn_map.size(-1), dtype=attn_map.dtype, device=attn_map.device)
+    attn_map = .5 * attn_map + .5 * identity
+    attn_map /= attn_map.sum(dim=-1, keepdim=True)
+    return torch.matmul(rollout, attn_map)
+
+
 class AttentionRolloutBase(ZennitExplainer):
     SUPPORTED_MODULES = [Attention]
 
@@ -77,19 +104,7 @@ class AttentionRolloutBase(ZennitExplainer):
         raise NotImplementedError
 
     def _discard(self, fused_attn_map):
-        org_size = fused_attn_map.size() # keep size to recover it after discard
-        flattened = fused_attn_map.flatten(1)
-        bsz, n_tokens = flattened.size()
-        attn_cls = flattened[:, 0] # keep attn scores of cls token to recover them after discard
-        _, indices = flattened.topk(
-            k=int(n_tokens*self.discard_ratio),
-            dim=-1,
-            largest=False,
-        )
-        flattened[torch.arange(bsz)[:, None], indices] = 0. # discard
-        flattened[:, 0] = attn_cls # recover attn scores of cls token
-        discarded = flattened.view(*org_size)
-        return discarded
+        return _discard(fused_attn_map, self.discard_ratio)
     
     def attribute(
         self,
@@ -160,12 +175,8 @@ class AttentionRollout(AttentionRolloutBase):
         bsz, num_heads, tgt_len, src_len = sz
         rollout = torch.eye(tgt_len).repeat(bsz, 1, 1).to(self.device)
         for attn_weights in weights_all:
-            attn_map = self.head_fusion_function(attn_weights)
-            attn_map = self._discard(attn_map)
-            identity = torch.eye(tgt_len).repeat(bsz, 1, 1).to(self.device)
-            attn_map = .5 * attn_map + .5 * identity
-            attn_map /= attn_map.sum(dim=-1, keepdim=True)
-            rollout = torch.matmul(rollout, attn_map)
+            rollout = _rollout_step(
+                rollout, attn_weights, self.head_fusion_function, self.discard_ratio)
         return rollout
 
 
@@ -270,13 +281,8 @@ class TransformerAttribution(AttentionRolloutBase):
         assert tgt_len == src_len, "Must be self-attention"
         rollout = torch.eye(tgt_len).repeat(bsz, 1, 1).to(self.device)
         for grad, rel in zip(grads, rels):
-            grad_x_rel = grad * rel
-            attn_map = self.head_fusion_function(grad_x_rel)
-            attn_map = self._discard(attn_map)
-            identity = torch.eye(tgt_len).repeat(bsz, 1, 1).to(self.device)
-            attn_map = .5 * attn_map + .5 * identity
-            attn_map /= attn_map.sum(dim=-1, keepdim=True)
-            rollout = torch.matmul(rollout, attn_map)
+            rollout = _rollout_step(
+                rollout, grad * rel, self.head_fusion_function, self.discard_ratio)
         return rollout
 
 
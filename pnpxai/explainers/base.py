@@ -25,6 +25,9 @@ NON_DISPLAYED_ATTRS = [
     'device',
     'n_classes',
     'zennit_composite',
+    'perturbation_engine',
+    'gradient_cache',
+    'cam_engine',
 ]
 
 
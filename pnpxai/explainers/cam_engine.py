@@ -0,0 +1,215 @@
+from typing import Any, Hashable, NamedTuple, Optional, Tuple
+import threading
+from collections import OrderedDict
+
+import torch
+from torch import Tensor, nn
+from torch.nn.modules import Module
+from captum._utils.common import _run_forward, _select_targets
+from captum.attr import LayerAttribution
+
+from pnpxai.utils import format_into_tuple, tensor_fingerprint
+from .gradient_cache import model_version
+from .utils.multi_target import is_multi_target, multi_target_gradients
+
+
+class CamTensors(NamedTuple):
+    """
+    Tensors of a batch shared by explainers of the CAM family.
+
+    Attributes:
+        cam (Tensor): Activations of the target layer weighted by spatially averaged gradients and summed over channels, before upsampling, of shape (bsz, 1, *layer_dims), or (bsz, k, 1, *layer_dims) for targets of shape (bsz, k).
+        guided (Optional[Tensor]): Guided backpropagation of the first forward argument, with a dimension of k targets after the batch dimension if any. None unless requested.
+    """
+    cam: Tensor
+    guided: Optional[Tensor] = None
+
+
+class CamEngine:
+    """
+    Computes tensors of `GradCam` and `GuidedGradCam` of a batch from a single forward.
+
+    Activations of the target layer are captured by a forward hook. The plain backward to the
+    activations gives the CAM. Only if the guided backpropagation is requested, the outputs of
+    `nn.ReLU` modules get tensor hooks clamping their gradients, and the guided backward to the
+    inputs runs on the retained graph with the hooks enabled, which is equivalent to captum's.
+    Results are kept in an LRU of `max_entries` batches, so that both explainers of the same batch
+    share them, a `GuidedGradCam` explained first computing the CAM of `GradCam` too. For targets
+    of shape (bsz, k), the backwards are batched vector-Jacobian products of the k targets.
+
+    Parameters:
+        model (Module): The model.
+        max_entries (int): Number of batches whose tensors are kept.
+    """
+
+    def __init__(self, model: Module, max_entries: int = 4):
+        self.model = model
+        self.max_entries = max_entries
+        self._results: 'OrderedDict[Hashable, CamTensors]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._guided = False
+
+    def compute(
+        self,
+        layer: Module,
+        forward_args: Tuple[Tensor],
+        targets: Optional[Tensor],
+        additional_forward_args: Any = None,
+        guided: bool = False,
+    ) -> CamTensors:
+        """
+        Returns tensors of a batch, computing the guided backpropagation only if `guided`.
+        """
+        forward_args = format_into_tuple(forward_args)
+        key = self._key(layer, forward_args, targets, additional_forward_args)
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None and (result.guided is not None or not guided):
+                self._results.move_to_end(key)
+                return result
+            result = self._compute(layer, forward_args, targets, additional_forward_args, guided)
+            self._results[key] = result
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result
+
+    def grad_cam(
+        self,
+        layer: Module,
+        forward_args: Tuple[Tensor],
+        targets: Optional[Tensor],
+        additional_forward_args: Any = None,
+        interpolate_mode: str = 'bilinear',
+        relu_attributions: bool = False,
+    ) -> Tensor:
+        """
+        Returns GradCam upsampled to the spatial size of the first forward argument.
+        """
+        forward_args = format_into_tuple(forward_args)
+        cam = self.compute(layer, forward_args, targets, additional_forward_args).cam
+        if relu_attributions:
+            cam = cam.relu()
+        multi_target = is_multi_target(targets)
+        upsampled = LayerAttribution.interpolate(
+            layer_attribution=cam.flatten(0, 1) if multi_target else cam,
+            interpolate_dims=forward_args[0].shape[2:],
+            interpolate_mode=interpolate_mode,
+        )
+        if multi_target:
+            return upsampled.view(*cam.shape[:2], *upsampled.shape[1:])
+        return upsampled
+
+    def guided_grad_cam(
+        self,
+        layer: Module,
+        forward_args: Tuple[Tensor],
+        targets: Optional[Tensor],
+        additional_forward_args: Any = None,
+        interpolate_mode: str = 'nearest',
+    ) -> Tensor:
+        """
+        Returns guided backpropagation weighted by the rectified GradCam, as captum's `GuidedGradCam`.
+        """
+        forward_args = format_into_tuple(forward_args)
+        guided = self.compute(
+            layer, forward_args, targets, additional_forward_args, guided=True).guided
+        cam = self.grad_cam(
+            layer, forward_args, targets, additional_forward_args,
+            interpolate_mode=interpolate_mode, relu_attributions=True,
+        )
+        return guided * cam
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def _key(
+        self,
+        layer: Module,
+        forward_args: Tuple[Tensor],
+        targets: Optional[Tensor],
+        additional_forward_args: Any,
+    ) -> Hashable:
+        tensors = list(forward_args) + [
+            arg for arg in format_into_tuple(additional_forward_args)
+            if torch.is_tensor(arg)
+        ]
+        if targets is not None:
+            tensors.append(torch.as_tensor(targets))
+        return (
+            id(layer),
+            model_version(self.model),
+            targets is None,
+            tensor_fingerprint(*tensors),
+        )
+
+    def _compute(
+        self,
+        layer: Module,
+        forward_args: Tuple[Tensor],
+        targets: Optional[Tensor],
+        additional_forward_args: Any,
+        guided: bool,
+    ) -> CamTensors:
+        multi_target = is_multi_target(targets)
+        inputs = forward_args[0].detach().requires_grad_()
+        forward_args = (inputs,) + tuple(forward_args[1:])
+        captured = {}
+
+        def capture_activations(module, args, output):
+            captured['activations'] = output
+
+        def guide_relu(module, args, output):
+            if output.requires_grad:
+                output.register_hook(self._guide)
+
+        handles = [layer.register_forward_hook(capture_activations)]
+        if guided:
+            handles += [
+                module.register_forward_hook(guide_relu)
+                for module in self.model.modules() if isinstance(module, nn.ReLU)
+            ]
+        guided_grads = None
+        try:
+            with torch.enable_grad():
+                outputs = _run_forward(
+                    self.model, forward_args, additional_forward_args=additional_forward_args)
+                activations = captured['activations']
+                if multi_target:
+                    layer_grads, = multi_target_gradients(
+                        outputs, targets, (activations,), retain_graph=guided)
+                else:
+                    scores = _select_targets(outputs, targets).sum()
+                    layer_grads, = torch.autograd.grad(scores, activations, retain_graph=guided)
+                if guided:
+                    self._guided = True
+                    try:
+                        if multi_target:
+                            guided_grads, = multi_target_gradients(outputs, targets, (inputs,))
+                        else:
+                            guided_grads, = torch.autograd.grad(scores, inputs)
+                    finally:
+                        self._guided = False
+        finally:
+            for handle in handles:
+                handle.remove()
+
+        activations = activations.detach()
+        channel_dim = 1
+        if multi_target:
+            activations = activations.unsqueeze(1)
+            channel_dim = 2
+        if layer_grads.dim() > channel_dim + 1:
+            weights = layer_grads.mean(
+                dim=tuple(range(channel_dim + 1, layer_grads.dim())), keepdim=True)
+        else:
+            weights = layer_grads
+        cam = (weights * activations).sum(dim=channel_dim, keepdim=True)
+        return CamTensors(
+            cam=cam, guided=guided_grads.detach() if guided_grads is not None else None)
+
+    def _guide(self, grad: Tensor) -> Optional[Tensor]:
+        # gradients through relus are clamped only while backpropagating the guided pass
+        if self._guided:
+            return grad.clamp(min=0)
+        return None
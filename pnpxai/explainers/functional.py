@@ -0,0 +1,169 @@
+from typing import Any, Callable, Literal, Optional, Tuple
+
+import torch
+from torch import Tensor
+from torch.nn.modules import Module
+from captum.attr._utils.approximation_methods import approximation_parameters
+
+from pnpxai.utils import format_into_tuple
+from pnpxai.explainers.utils.multi_target import is_multi_target
+
+
+# 'autograd' differentiates summed outputs of a batch, 'func' vectorizes per-sample gradients
+GradientBackend = Literal['autograd', 'func']
+
+
+def per_sample_gradients(
+    model: Module,
+    forward_args: Tuple[Tensor],
+    targets: Optional[Tensor],
+    additional_forward_args: Any = None,
+    chunk_size: Optional[int] = None,
+) -> Tuple[Tensor]:
+    """
+    Computes gradients of the targets w.r.t. forward arguments by `torch.func.grad` of a
+    per-sample forward, vectorized over samples, and over k targets of a sample for targets of
+    shape (bsz, k), by `torch.func.vmap`.
+
+    Each sample is forwarded as a batch of one by `torch.func.functional_call`, so layers
+    depending on the batch, e.g. batch norms in training mode, are not supported.
+
+    Args:
+        model (Module): The model.
+        forward_args (Tuple[Tensor]): Floating forward arguments of shape (bsz, ...).
+        targets (Optional[Tensor]): Targets of shape (bsz,) or (bsz, k).
+        additional_forward_args (Any): Additional forward arguments. Tensors whose leading
+            dimension is the batch size are split along it, and others are shared by all samples.
+        chunk_size (Optional[int]): Number of samples vectorized at once. Defaults to all.
+
+    Returns:
+        Tuple[Tensor]: Gradients of shape (bsz, ...), or (bsz, k, ...), per forward argument.
+    """
+    from torch.func import vmap
+
+    forward_args = format_into_tuple(forward_args)
+    additional_forward_args = format_into_tuple(additional_forward_args)
+    n_args = len(forward_args)
+    additional_dims = _batch_dims(additional_forward_args, len(forward_args[0]))
+    grad_fn = _sample_grad_fn(model, n_args, additional_dims)
+    if is_multi_target(targets):
+        grad_fn = vmap(grad_fn, in_dims=(0,) + (None,) * (n_args + len(additional_forward_args)))
+    in_dims = (
+        (None if targets is None else 0,)
+        + (0,) * n_args
+        + additional_dims
+    )
+    return vmap(grad_fn, in_dims=in_dims, chunk_size=chunk_size)(
+        targets, *forward_args, *additional_forward_args)
+
+
+def per_sample_integrated_gradients(
+    model: Module,
+    forward_args: Tuple[Tensor],
+    baselines: Tuple[Tensor],
+    targets: Optional[Tensor],
+    additional_forward_args: Any = None,
+    n_steps: int = 50,
+    method: str = 'gausslegendre',
+    chunk_size: Optional[int] = None,
+) -> Tuple[Tensor]:
+    """
+    Computes integrated gradients as captum's `IntegratedGradients`, with gradients at the steps
+    of the path, samples and targets of shape (bsz, k) vectorized by `torch.func.vmap` instead of
+    stacking scaled inputs into a batch.
+
+    Args:
+        model (Module): The model.
+        forward_args (Tuple[Tensor]): Floating forward arguments of shape (bsz, ...).
+        baselines (Tuple[Tensor]): Baselines broadcastable to the forward arguments.
+        targets (Optional[Tensor]): Targets of shape (bsz,) or (bsz, k).
+        additional_forward_args (Any): Additional forward arguments, as of `per_sample_gradients`.
+        n_steps (int): Number of steps approximating the path integral.
+        method (str): Approximation method of captum.
+        chunk_size (Optional[int]): Number of steps of a sample vectorized at once. Defaults to all.
+
+    Returns:
+        Tuple[Tensor]: Attributions of shape (bsz, ...), or (bsz, k, ...), per forward argument.
+    """
+    from torch.func import vmap
+
+    forward_args = format_into_tuple(forward_args)
+    additional_forward_args = format_into_tuple(additional_forward_args)
+    baselines = tuple(
+        torch.as_tensor(baseline, dtype=arg.dtype, device=arg.device).expand_as(arg)
+        for baseline, arg in zip(format_into_tuple(baselines), forward_args)
+    )
+    n_args = len(forward_args)
+    step_sizes_fn, alphas_fn = approximation_parameters(method)
+    device, dtype = forward_args[0].device, forward_args[0].dtype
+    alphas = torch.tensor(alphas_fn(n_steps), dtype=dtype, device=device)
+    step_sizes = torch.tensor(step_sizes_fn(n_steps), dtype=dtype, device=device)
+    additional_dims = _batch_dims(additional_forward_args, len(forward_args[0]))
+    grad_fn = _sample_grad_fn(model, n_args, additional_dims)
+
+    def step_grads(alpha, target, *args):
+        inputs, baselines, additional = args[:n_args], args[n_args:2*n_args], args[2*n_args:]
+        scaled = tuple(
+            baseline + alpha * (inp - baseline)
+            for inp, baseline in zip(inputs, baselines)
+        )
+        return grad_fn(target, *scaled, *additional)
+
+    path_grads = vmap(
+        step_grads,
+        in_dims=(0,) + (None,) * (1 + 2*n_args + len(additional_forward_args)),
+        chunk_size=chunk_size,
+    )
+
+    def sample_attrs(target, *args):
+        inputs, baselines = args[:n_args], args[n_args:2*n_args]
+        grads = path_grads(alphas, target, *args)
+        return tuple(
+            torch.tensordot(step_sizes, grad, dims=1) * (inp - baseline)
+            for grad, inp, baseline in zip(grads, inputs, baselines)
+        )
+
+    attr_fn = sample_attrs
+    if is_multi_target(targets):
+        attr_fn = vmap(attr_fn, in_dims=(0,) + (None,) * (2*n_args + len(additional_forward_args)))
+    in_dims = (
+        (None if targets is None else 0,)
+        + (0,) * (2*n_args)
+        + additional_dims
+    )
+    return vmap(attr_fn, in_dims=in_dims)(
+        targets, *forward_args, *baselines, *additional_forward_args)
+
+
+def _sample_grad_fn(
+    model: Module,
+    n_args: int,
+    additional_dims: Tuple[Optional[int]],
+) -> Callable[..., Tuple[Tensor]]:
+    # gradient of the target output of a sample w.r.t. its first `n_args` arguments, the
+    # additional arguments following them being split by `additional_dims`
+    from torch.func import functional_call, grad
+
+    params = {
+        name: tensor.detach()
+        for name, tensor in (*model.named_parameters(), *model.named_buffers())
+    }
+
+    batched = (True,) * n_args + tuple(dim is not None for dim in additional_dims)
+
+    def score(target, *args):
+        args = tuple(arg.unsqueeze(0) if split else arg for arg, split in zip(args, batched))
+        outputs = functional_call(model, params, args).squeeze(0)
+        if target is None:
+            return outputs.sum()
+        return outputs.gather(-1, target.reshape(1)).sum()
+
+    return grad(score, argnums=tuple(range(1, n_args + 1)))
+
+
+def _batch_dims(args: Tuple[Any], bsz: int) -> Tuple[Optional[int]]:
+    # tensors of scalars or of another leading dimension are shared by all samples
+    return tuple(
+        0 if torch.is_tensor(arg) and arg.dim() > 0 and arg.shape[0] == bsz else None
+        for arg in args
+    )
@@ -7,6 +7,8 @@ from pnpxai.core.detector.types import Convolution
 from .base import Explainer
 from .utils import find_cam_target_layer
 from .errors import NoCamTargetLayerAndNotTraceableError
+from .cam_engine import CamEngine
+from .utils.multi_target import is_multi_target
 
 
 class GradCam(Explainer):
@@ -17,10 +19,12 @@ class GradCam(Explainer):
         model: nn.Module,
         layer: Optional[nn.Module] = None,
         interpolate_mode: str = "bilinear",
+        cam_engine: Optional[CamEngine] = None,
     ) -> None:
         super().__init__(model)
         self._layer = layer
         self.interpolate_mode = interpolate_mode
+        self.cam_engine = cam_engine
 
     @property
     def layer(self):
@@ -45,6 +49,16 @@ class GradCam(Explainer):
         additional_forward_args = format_into_tuple(additional_forward_args)
         assert len(
             forward_args) == 1, 'GradCam for multiple inputs is not supported yet.'
+        if self.cam_engine is not None or is_multi_target(targets):
+            # captum explains a single target per sample
+            cam_engine = self.cam_engine or CamEngine(self.model, max_entries=1)
+            return cam_engine.grad_cam(
+                self.layer,
+                forward_args,
+                targets,
+                additional_forward_args,
+                interpolate_mode=self.interpolate_mode,
+            )
         explainer = LayerGradCam(forward_func=self.model, layer=self.layer)
         attrs = explainer.attribute(
             forward_args[0],
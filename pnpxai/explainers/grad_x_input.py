@@ -8,6 +8,10 @@ from captum.attr import LayerGradientXActivation as CaptumLayerGradientXInput
 from pnpxai.core.detector.types import Linear, Convolution, LSTM, RNN, Attention
 from .base import Explainer
 from .utils import captum_wrap_model_input
+from .gradient_cache import GradientCache, input_gradients
+from .functional import GradientBackend, per_sample_gradients
+from .utils.multi_target import is_multi_target
+from pnpxai.utils import format_into_tuple, format_out_tuple_if_single
 
 
 class GradientXInput(Explainer):
@@ -19,9 +23,13 @@ class GradientXInput(Explainer):
         layer: Optional[Union[Union[str, Module], Sequence[Union[str, Module]]]] = None,
         forward_arg_extractor: Optional[Callable[[Tuple[Tensor]], Union[Tensor, Tuple[Tensor]]]] = None,
         additional_forward_arg_extractor: Optional[Callable[[Tuple[Tensor]], Union[Tensor, Tuple[Tensor]]]] = None,
+        gradient_cache: Optional[GradientCache] = None,
+        backend: GradientBackend = 'autograd',
     ) -> None:
         super().__init__(model, forward_arg_extractor, additional_forward_arg_extractor)
         self.layer = layer
+        self.gradient_cache = gradient_cache
+        self.backend = backend
 
 
     @property
@@ -52,6 +60,27 @@ class GradientXInput(Explainer):
         targets: Tensor
     ) -> Union[Tensor, Tuple[Tensor]]:
         forward_args, additional_forward_args = self._extract_forward_args(inputs)
+        multi_target = is_multi_target(targets)
+        functional = self.backend == 'func'
+        assert not (functional and self.layer is not None), \
+            "The functional backend does not support layers."
+        if self.layer is None and (self.gradient_cache is not None or multi_target or functional):
+            forward_args = format_into_tuple(forward_args)
+            compute_gradients = per_sample_gradients if functional else input_gradients
+            if self.gradient_cache is not None:
+                grads = self.gradient_cache.gradients(
+                    self.model, forward_args, targets, additional_forward_args,
+                    compute=lambda: compute_gradients(
+                        self.model, forward_args, targets, additional_forward_args),
+                    backend=self.backend,
+                )
+            else:
+                grads = compute_gradients(
+                    self.model, forward_args, targets, additional_forward_args)
+            return format_out_tuple_if_single(tuple(
+                grad * (inp.unsqueeze(1) if multi_target else inp)
+                for grad, inp in zip(grads, forward_args)
+            ))
         attrs = self.explainer.attribute(
             inputs=forward_args,
             target=targets,
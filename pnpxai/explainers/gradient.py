@@ -8,6 +8,9 @@ from .zennit.attribution import Gradient as GradientAttributor
 from .zennit.attribution import LayerGradient as LayerGradientAttributor
 from .zennit.base import ZennitExplainer
 from .utils import captum_wrap_model_input
+from .gradient_cache import GradientCache
+from .functional import GradientBackend, per_sample_gradients
+from pnpxai.utils import format_out_tuple_if_single
 
 
 class Gradient(ZennitExplainer):
@@ -20,6 +23,8 @@ class Gradient(ZennitExplainer):
         additional_forward_arg_extractor: Optional[Callable[[Tuple[Tensor]], Union[Tensor, Tuple[Tensor]]]]=None,
         layer: Optional[Union[Union[str, Module], Sequence[Union[str, Module]]]]=None,
         n_classes: Optional[int] = None,
+        gradient_cache: Optional[GradientCache] = None,
+        backend: GradientBackend = 'autograd',
     ) -> None:
         super().__init__(
             model,
@@ -28,6 +33,8 @@ class Gradient(ZennitExplainer):
             n_classes
         )
         self.layer = layer
+        self.gradient_cache = gradient_cache
+        self.backend = backend
 
     @property
     def _layer_attributor(self) -> LayerGradientAttributor:
@@ -59,6 +66,19 @@ class Gradient(ZennitExplainer):
         targets: Tensor
     ) -> Union[Tensor, Tuple[Tensor]]:
         forward_args, additional_forward_args = self._extract_forward_args(inputs)
+        if self.backend == 'func':
+            assert self.layer is None, "The functional backend does not support layers."
+            compute = lambda: per_sample_gradients(
+                self.model, forward_args, targets, additional_forward_args)
+            if self.gradient_cache is None:
+                return format_out_tuple_if_single(compute())
+            return format_out_tuple_if_single(self.gradient_cache.gradients(
+                self.model, forward_args, targets, additional_forward_args,
+                compute=compute, backend=self.backend))
+        if self.gradient_cache is not None and self.layer is None:
+            grads = self.gradient_cache.gradients(
+                self.model, forward_args, targets, additional_forward_args)
+            return format_out_tuple_if_single(grads)
         attrs = self.attributor.forward(
             forward_args,
             targets,
@@ -0,0 +1,135 @@
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import threading
+from collections import OrderedDict
+
+import torch
+from torch import Tensor
+from torch.nn.modules import Module
+from captum._utils.common import _run_forward
+from captum._utils.gradient import compute_gradients
+
+from pnpxai.utils import format_into_tuple, tensor_fingerprint
+from pnpxai.explainers.utils.multi_target import is_multi_target, multi_target_gradients
+from pnpxai.explainers.functional import GradientBackend
+
+
+class GradientCache:
+    """
+    An LRU of input gradients keyed by (inputs, targets, model version, backend), shared by
+    explainers computing the same plain gradient, i.e. `Gradient`, `GradientXInput` and the
+    noise-free copy of `SmoothGrad` and `VarGrad`.
+
+    The model version consists of identities and in-place version counters of its parameters, so
+    updated weights invalidate cached gradients. Gradients of a model carrying hooks that modify
+    them (e.g. of an open LRP session) must not be cached. Inputs are keyed by a digest of their
+    contents, copied to host on every lookup, so the cache pays off only if several explainers
+    explain the same data.
+
+    Parameters:
+        max_entries (int): Number of batches whose gradients are kept.
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._gradients: 'OrderedDict[Hashable, Tuple[Tensor]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._gradients),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._gradients.clear()
+
+    def gradients(
+        self,
+        model: Module,
+        forward_args: Tuple[Tensor],
+        targets: Optional[Tensor],
+        additional_forward_args: Any = None,
+        compute: Optional[Callable[[], Tuple[Tensor]]] = None,
+        backend: GradientBackend = 'autograd',
+    ) -> Tuple[Tensor]:
+        """
+        Returns gradients of the targets w.r.t. forward arguments, computing them by `compute`, or
+        by `input_gradients` if not given, on a miss. Gradients of different backends are kept
+        apart.
+        """
+        forward_args = format_into_tuple(forward_args)
+        key = self._key(model, forward_args, targets, additional_forward_args, backend)
+        with self._lock:
+            grads = self._gradients.get(key)
+            if grads is not None:
+                self._gradients.move_to_end(key)
+                self.hits += 1
+                return grads
+            self.misses += 1
+        if compute is None:
+            grads = input_gradients(model, forward_args, targets, additional_forward_args)
+        else:
+            grads = format_into_tuple(compute())
+        grads = tuple(grad.detach() for grad in grads)
+        with self._lock:
+            self._gradients[key] = grads
+            while len(self._gradients) > self.max_entries:
+                self._gradients.popitem(last=False)
+        return grads
+
+    @staticmethod
+    def _key(
+        model: Module,
+        forward_args: Tuple[Tensor],
+        targets: Optional[Tensor],
+        additional_forward_args: Any,
+        backend: GradientBackend,
+    ) -> Hashable:
+        tensors = list(forward_args) + [
+            arg for arg in format_into_tuple(additional_forward_args)
+            if torch.is_tensor(arg)
+        ]
+        if targets is not None:
+            tensors.append(torch.as_tensor(targets))
+        return (
+            id(model),
+            model_version(model),
+            targets is None,
+            backend,
+            tensor_fingerprint(*tensors),
+        )
+
+
+def model_version(model: Module) -> Tuple:
+    """
+    Returns identities and in-place version counters of parameters of a model.
+    """
+    return tuple((id(param), param._version) for param in model.parameters())
+
+
+def input_gradients(
+    model: Module,
+    forward_args: Tuple[Tensor],
+    targets: Optional[Tensor],
+    additional_forward_args: Any = None,
+) -> Tuple[Tensor]:
+    """
+    Computes gradients of the targets w.r.t. forward arguments by a single forward and backward,
+    or by batched vector-Jacobian products for targets of shape (bsz, k).
+    """
+    forward_args = tuple(
+        arg.detach().requires_grad_() if arg.is_floating_point() else arg
+        for arg in format_into_tuple(forward_args)
+    )
+    if is_multi_target(targets):
+        with torch.enable_grad():
+            outputs = _run_forward(
+                model, forward_args, additional_forward_args=additional_forward_args)
+            return multi_target_gradients(outputs, targets, forward_args)
+    return compute_gradients(
+        model, forward_args, targets, additional_forward_args=additional_forward_args)
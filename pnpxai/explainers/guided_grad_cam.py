@@ -8,6 +8,8 @@ from pnpxai.explainers.base import Explainer
 from pnpxai.explainers.utils import find_cam_target_layer
 from pnpxai.utils import format_into_tuple
 from .errors import NoCamTargetLayerAndNotTraceableError
+from .cam_engine import CamEngine
+from .utils.multi_target import is_multi_target
 
 
 class GuidedGradCam(Explainer):
@@ -18,10 +20,12 @@ class GuidedGradCam(Explainer):
         model: Module,
         layer: Optional[Module] = None,
         interpolate_mode: str = "nearest",
+        cam_engine: Optional[CamEngine] = None,
     ) -> None:
         super().__init__(model)
         self._layer = layer
         self.interpolate_mode = interpolate_mode
+        self.cam_engine = cam_engine
 
     @property
     def layer(self):
@@ -46,6 +50,16 @@ class GuidedGradCam(Explainer):
         additional_forward_args = format_into_tuple(additional_forward_args)
         assert len(
             forward_args) == 1, 'GuidedGradCam for multiple inputs is not supported yet.'
+        if self.cam_engine is not None or is_multi_target(targets):
+            # captum explains a single target per sample
+            cam_engine = self.cam_engine or CamEngine(self.model, max_entries=1)
+            return cam_engine.guided_grad_cam(
+                self.layer,
+                forward_args,
+                targets,
+                additional_forward_args,
+                interpolate_mode=self.interpolate_mode,
+            )
         explainer = CaptumGuidedGradCam(model=self.model, layer=self.layer)
         attrs = explainer.attribute(
             inputs=forward_args[0],
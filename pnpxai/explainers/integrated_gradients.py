@@ -1,18 +1,39 @@
-from typing import Callable, Optional, Tuple, Union, Sequence, Dict
+from typing import Any, Callable, Optional, Tuple, Union, Sequence, Dict
 
+import torch
 from torch import Tensor
 from torch.nn.modules import Module
 from captum.attr import IntegratedGradients as CaptumIntegratedGradients
 from captum.attr import LayerIntegratedGradients as CaptumLayerIntegratedGradients
 
 from pnpxai.core.detector.types import Linear, Convolution, Attention
-from pnpxai.utils import format_into_tuple, format_out_tuple_if_single
+from pnpxai.utils import format_into_tuple, format_out_tuple_if_single, select_batch
 from pnpxai.explainers.utils.baselines import BaselineMethodOrFunction, BaselineFunction
 from .base import Explainer
 from .utils import captum_wrap_model_input
+from .functional import GradientBackend, per_sample_integrated_gradients
 
 
 class IntegratedGradients(Explainer):
+    """
+    Integrated gradients, approximating the path integral of gradients from baselines to inputs
+    with `n_steps` steps.
+
+    Scaled inputs of all steps are forwarded in chunks of `internal_batch_size`. If it is not
+    given but `memory_budget` is, the chunk size is derived from the budget and the memory a sample
+    takes in a forward pass, measured once per input shape.
+
+    In the adaptive mode, the number of steps is doubled, up to `max_steps`, only for samples whose
+    completeness error (the convergence delta) relative to the output difference between inputs and
+    baselines exceeds `tolerance`. Steps of the Gauss-Legendre rule are not nested, so each doubling
+    recomputes the integral of pending samples from scratch: a sample refined up to n steps costs
+    about 2n gradient evaluations in total.
+
+    With the 'func' backend, gradients at the steps of the path are vectorized per sample by
+    `torch.func.vmap` in chunks of `internal_batch_size` steps, which also explains targets of shape
+    (bsz, k). It supports neither layers nor the adaptive mode.
+    """
+
     SUPPORTED_MODULES = [Linear, Convolution, Attention]
 
     def __init__(
@@ -27,11 +48,25 @@ class IntegratedGradients(Explainer):
             Tuple[Tensor]], Union[Tensor, Tuple[Tensor]]]] = None,
         additional_forward_arg_extractor: Optional[Callable[[
             Tuple[Tensor]], Union[Tensor, Tuple[Tensor]]]] = None,
+        internal_batch_size: Optional[int] = None,
+        memory_budget: Optional[int] = None,
+        adaptive: bool = False,
+        tolerance: float = 1e-2,
+        max_steps: Optional[int] = None,
+        backend: GradientBackend = 'autograd',
     ) -> None:
         super().__init__(model, forward_arg_extractor, additional_forward_arg_extractor)
         self.layer = layer
         self.n_steps = n_steps
         self.baseline_fn = baseline_fn
+        self.internal_batch_size = internal_batch_size
+        self.memory_budget = memory_budget
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.max_steps = max_steps
+        self.backend = backend
+        # input shape -> bytes a sample takes in a forward pass
+        self._bytes_per_sample: Dict[Tuple, int] = {}
 
     @property
     def _layer_explainer(self) -> CaptumLayerIntegratedGradients:
@@ -64,19 +99,135 @@ class IntegratedGradients(Explainer):
             inputs)
         forward_args = format_into_tuple(forward_args)
         baselines = format_into_tuple(self._get_baselines(forward_args))
-        attrs = self.explainer.attribute(
-            inputs=forward_args,
-            baselines=baselines,
-            target=targets,
-            additional_forward_args=additional_forward_args,
-            n_steps=self.n_steps,
-        )
+        internal_batch_size = self._get_internal_batch_size(
+            forward_args, additional_forward_args)
+        if self.backend == 'func':
+            assert self.layer is None and not self.adaptive, \
+                "The functional backend supports neither layers nor the adaptive mode."
+            attrs = per_sample_integrated_gradients(
+                self.model, forward_args, baselines, targets,
+                additional_forward_args,
+                n_steps=self.n_steps,
+                chunk_size=internal_batch_size,
+            )
+        elif self.adaptive:
+            attrs = self._attribute_adaptively(
+                forward_args, baselines, targets,
+                additional_forward_args, internal_batch_size,
+            )
+        else:
+            attrs = self.explainer.attribute(
+                inputs=forward_args,
+                baselines=baselines,
+                target=targets,
+                additional_forward_args=additional_forward_args,
+                n_steps=self.n_steps,
+                internal_batch_size=internal_batch_size,
+            )
         if isinstance(attrs, tuple):
             attrs = format_out_tuple_if_single(attrs)
         return attrs
 
+    def _attribute_adaptively(
+        self,
+        forward_args: Tuple[Tensor],
+        baselines: Tuple[Tensor],
+        targets: Tensor,
+        additional_forward_args: Any,
+        internal_batch_size: Optional[int],
+    ) -> Tuple[Tensor]:
+        max_steps = self.max_steps or 8 * self.n_steps
+        explainer = self.explainer
+        attrs = None
+        # indices of samples not converged yet
+        pending = torch.arange(len(targets), device=targets.device)
+        n_steps = self.n_steps
+        while len(pending) > 0:
+            pending_attrs, deltas = explainer.attribute(
+                inputs=select_batch(forward_args, pending),
+                baselines=select_batch(baselines, pending),
+                target=select_batch(targets, pending),
+                additional_forward_args=select_batch(
+                    additional_forward_args, pending, bsz=len(targets)),
+                n_steps=n_steps,
+                internal_batch_size=internal_batch_size,
+                return_convergence_delta=True,
+            )
+            pending_attrs = format_into_tuple(pending_attrs)
+            if attrs is None:
+                attrs = tuple(attr.clone() for attr in pending_attrs)
+            else:
+                for attr, pending_attr in zip(attrs, pending_attrs):
+                    attr[pending] = pending_attr
+
+            # completeness: attributions sum up to the output difference, which equals sum - delta
+            total = sum(attr.flatten(1).sum(-1) for attr in pending_attrs)
+            relative_errors = deltas.abs() / ((total - deltas).abs() + 1e-8)
+            n_steps *= 2
+            if n_steps > max_steps:
+                break
+            pending = pending[relative_errors.to(pending.device) > self.tolerance]
+        return attrs
+
+    def _get_internal_batch_size(
+        self,
+        forward_args: Tuple[Tensor],
+        additional_forward_args: Any,
+    ) -> Optional[int]:
+        if self.internal_batch_size is not None or self.memory_budget is None:
+            return self.internal_batch_size
+        shape = tuple(tuple(arg.shape[1:]) for arg in forward_args)
+        if shape not in self._bytes_per_sample:
+            self._bytes_per_sample[shape] = _measure_bytes_per_sample(
+                self.model, forward_args, additional_forward_args)
+        return max(1, self.memory_budget // max(self._bytes_per_sample[shape], 1))
+
     def get_tunables(self) -> Dict[str, Tuple[type, dict]]:
         return {
             'n_steps': (int, {'low': 10, 'high': 100, 'step': 10}),
             'baseline_fn': (BaselineFunction, {}),
         }
+
+
+def _measure_bytes_per_sample(
+    model: Module,
+    forward_args: Tuple[Tensor],
+    additional_forward_args: Any = None,
+) -> int:
+    """
+    Measures bytes a sample takes in a forward pass with gradients, as the sum of its inputs,
+    outputs and tensors saved by autograd for the backward pass.
+
+    Saved tensors are counted by `saved_tensors_hooks` of the calling thread rather than hooks on
+    modules, so that forwards of the shared model run concurrently by other threads are neither
+    counted nor affected.
+    """
+    nbytes = 0
+    # parameters and buffers, and views of them, are shared by all samples
+    seen = {tensor.data_ptr() for tensor in (*model.parameters(), *model.buffers())}
+
+    def pack(tensor):
+        nonlocal nbytes
+        # a tensor saved by several operations is counted once
+        if tensor.data_ptr() not in seen:
+            seen.add(tensor.data_ptr())
+            nbytes += tensor.element_size() * tensor.nelement()
+        return tensor
+
+    indices = torch.arange(1, device=forward_args[0].device)
+    inputs = tuple(
+        arg.detach().requires_grad_() if arg.is_floating_point() else arg
+        for arg in select_batch(forward_args, indices)
+    )
+    bsz = len(forward_args[0])
+    with torch.enable_grad(), torch.autograd.graph.saved_tensors_hooks(pack, lambda tensor: tensor):
+        outputs = model(
+            *inputs,
+            *format_into_tuple(select_batch(additional_forward_args, indices, bsz=bsz)),
+        )
+    output_bytes = sum(
+        output.element_size() * output.nelement()
+        for output in format_into_tuple(outputs) if torch.is_tensor(output)
+    )
+    input_bytes = sum(arg.element_size() * arg.nelement() for arg in inputs)
+    return nbytes + output_bytes + input_bytes
@@ -6,6 +6,7 @@ from captum.attr import KernelShap as CaptumKernelShap
 
 from pnpxai.core.detector.types import Linear, Convolution, LSTM, RNN, Attention
 from pnpxai.explainers.base import Explainer
+from pnpxai.explainers.perturbation import PerturbationEngine
 from pnpxai.explainers.types import ForwardArgumentExtractor
 from pnpxai.explainers.utils.baselines import BaselineMethodOrFunction, BaselineFunction
 from pnpxai.explainers.utils.feature_masks import FeatureMaskMethodOrFunction, FeatureMaskFunction
@@ -27,6 +28,7 @@ class KernelShap(Explainer):
         forward_arg_extractor: Optional[ForwardArgumentExtractor] = None,
         additional_forward_arg_extractor: Optional[ForwardArgumentExtractor] = None,
         mask_token_id: Optional[int] = None,
+        perturbation_engine: Optional[PerturbationEngine] = None,
     ) -> None:
         super().__init__(
             model,
@@ -37,6 +39,7 @@ class KernelShap(Explainer):
         self.baseline_fn = baseline_fn
         self.feature_mask_fn = feature_mask_fn
         self.mask_token_id = mask_token_id
+        self.perturbation_engine = perturbation_engine
 
     def attribute(
         self,
@@ -46,6 +49,16 @@ class KernelShap(Explainer):
         forward_args, additional_forward_args = self._extract_forward_args(
             inputs)
         forward_args = format_into_tuple(forward_args)
+        if self.perturbation_engine is not None:
+            attrs = self.perturbation_engine.kernel_shap(
+                forward_args=forward_args,
+                targets=targets,
+                baselines=format_into_tuple(self._get_baselines(forward_args)),
+                feature_masks=format_into_tuple(self._get_feature_masks(forward_args)),
+                additional_forward_args=additional_forward_args,
+                n_samples=self.n_samples,
+            )
+            return format_out_tuple_if_single(attrs)
         explainer = CaptumKernelShap(self.model)
         attrs = explainer.attribute(
             inputs=forward_args,
@@ -7,12 +7,24 @@ from captum.attr import Lime as CaptumLime
 
 from pnpxai.core.detector.types import Linear, Convolution, LSTM, RNN, Attention
 from pnpxai.explainers.base import Explainer
+from pnpxai.explainers.perturbation import PerturbationEngine
 from pnpxai.explainers.utils.baselines import BaselineMethodOrFunction, BaselineFunction
 from pnpxai.explainers.utils.feature_masks import FeatureMaskMethodOrFunction, FeatureMaskFunction
-from pnpxai.utils import format_into_tuple
+from pnpxai.utils import format_into_tuple, format_out_tuple_if_single
 
 
 class Lime(Explainer):
+    """
+    Lime, fitting an interpretable surrogate on model outputs of inputs perturbed by coalitions of
+    features.
+
+    By default, it runs captum's `Lime`, fitting a lasso (alpha=0.01) weighted by the exponential
+    kernel on the cosine similarity of perturbed and original inputs. Given a `perturbation_engine`
+    and no `perturb_fn`, the surrogate is fitted by the engine from perturbed forwards shared with
+    `KernelShap` instead, as a ridge regression (alpha=0.01) weighted by the exponential kernel on
+    the cosine similarity of coalitions and the full coalition, so attributions differ from captum's.
+    """
+
     SUPPORTED_MODULES = [Linear, Convolution, LSTM, RNN, Attention]
 
     def __init__(
@@ -28,12 +40,14 @@ class Lime(Explainer):
             Tuple[Tensor]], Union[Tensor, Tuple[Tensor]]]] = None,
         additional_forward_arg_extractor: Optional[Callable[[
             Tuple[Tensor]], Tuple[Tensor]]] = None,
+        perturbation_engine: Optional[PerturbationEngine] = None,
     ) -> None:
         super().__init__(model, forward_arg_extractor, additional_forward_arg_extractor)
         self.baseline_fn = baseline_fn or torch.zeros_like
         self.feature_mask_fn = feature_mask_fn
         self.perturb_fn = perturb_fn
         self.n_samples = n_samples
+        self.perturbation_engine = perturbation_engine
 
     def attribute(
             self,
@@ -44,6 +58,17 @@ class Lime(Explainer):
             inputs)
         forward_args = format_into_tuple(forward_args)
 
+        if self.perturbation_engine is not None and self.perturb_fn is None:
+            attrs = self.perturbation_engine.lime(
+                forward_args=forward_args,
+                targets=targets,
+                baselines=format_into_tuple(self._get_baselines(forward_args)),
+                feature_masks=format_into_tuple(self._get_feature_masks(forward_args)),
+                additional_forward_args=additional_forward_args,
+                n_samples=self.n_samples,
+            )
+            return format_out_tuple_if_single(attrs)
+
         explainer = CaptumLime(self.model, perturb_func=self.perturb_fn)
         attrs = explainer.attribute(
             inputs=forward_args,
@@ -3,9 +3,11 @@ from typing import Dict, List, Tuple, Callable, Sequence, Union, Optional
 import _operator
 import warnings
 
+import torch
 from torch import nn, fx, Tensor
 from torch.nn.modules import Module
 
+from captum._utils.common import _run_forward
 from zennit.attribution import Gradient
 from zennit.core import Composite
 from zennit.composites import (
@@ -17,17 +19,20 @@ from zennit.composites import (
 )
 from zennit.types import Linear
 from zennit.rules import Epsilon
-from zennit.canonizers import SequentialMergeBatchNorm, Canonizer
+from zennit.canonizers import SequentialMergeBatchNorm, Canonizer, CompositeCanonizer
 
+from pnpxai.core.detector import ModelGraph
 from pnpxai.core.detector.types import Linear, Convolution, LSTM, RNN, Attention
 from pnpxai.explainers.attentions.module_converters import default_attention_converters
 from pnpxai.explainers.attentions.rules import ConservativeAttentionPropagation
 from pnpxai.explainers.zennit.attribution import Gradient, LayerGradient
 from pnpxai.explainers.zennit.rules import LayerNormRule
-from pnpxai.explainers.zennit.base import ZennitExplainer
+from pnpxai.explainers.zennit.base import ZennitExplainer, ExplainerSession
 from pnpxai.explainers.zennit.layer import StackAndSum
+from pnpxai.explainers.zennit.hooks import MultiplexComposite, RuleSelector
 from pnpxai.explainers.utils import captum_wrap_model_input
 from pnpxai.explainers.types import ForwardArgumentExtractor, TargetLayerOrListOfTargetLayers
+from pnpxai.utils import format_into_tuple, format_out_tuple_if_single
 
 
 class LRPBase(ZennitExplainer):
@@ -107,12 +112,26 @@ class LRPBase(ZennitExplainer):
             return self._explainer(model)
         return self._layer_explainer(model)
 
+    def _get_model(self) -> Union[Module, fx.GraphModule]:
+        return ModelGraph.of(self.model).get(
+            'add_replaced', lambda graph: _replace_add_function_with_sum_module(graph.model))
+
+    def session(self) -> ExplainerSession:
+        """
+        Returns a session keeping the composite registered across `attribute` calls. The session
+        registers it when entered or opened, and removes it when exited or closed.
+        """
+        return ExplainerSession(self, self.explainer(model=self._get_model()))
+
     def attribute(
         self,
         inputs: Union[Tensor, Tuple[Tensor]],
         targets: Tensor
     ) -> Union[Tensor, Tuple[Tensor]]:
-        model = _replace_add_function_with_sum_module(self.model)
+        session = self._active_session
+        if session is not None and session.explainer is self and session.is_open:
+            return session.attribute(inputs, targets)
+        model = self._get_model()
         forward_args, additional_forward_args = self._extract_forward_args(
             inputs)
         with self.explainer(model=model) as attributor:
@@ -124,6 +143,133 @@ class LRPBase(ZennitExplainer):
         return attrs
 
 
+class MultiRuleLRP:
+    """
+    Computes attributions of several LRP explainers of the same model from a single forward pass.
+
+    Hooks of all composites are multiplexed on each module, so that activations are stored once,
+    and the relevance of each composite is computed by a backward pass through the retained graph
+    with the rules of that composite. Canonizers are applied once and shared by all composites.
+
+    Parameters:
+        explainers (Sequence[LRPBase]): Explainers of the same model and argument extractors,
+            without target layers, whose composites have canonizers of the same types and
+            configurations.
+    """
+
+    def __init__(self, explainers: Sequence[LRPBase]):
+        assert self.compatible(explainers), "Explainers cannot share a forward pass."
+        self.explainers = list(explainers)
+        self.selector = RuleSelector()
+        self.composite = MultiplexComposite(
+            [explainer.zennit_composite for explainer in self.explainers],
+            self.selector,
+        )
+
+    @staticmethod
+    def compatible(explainers: Sequence[LRPBase]) -> bool:
+        """
+        Returns whether explainers can share a forward pass.
+        """
+        if len(explainers) == 0:
+            return False
+        first = explainers[0]
+        return all(
+            isinstance(explainer, LRPBase)
+            and explainer.layer is None
+            and explainer.model is first.model
+            and explainer.forward_arg_extractor is first.forward_arg_extractor
+            and explainer.additional_forward_arg_extractor is first.additional_forward_arg_extractor
+            and _same_canonizers(explainer, first)
+            for explainer in explainers
+        )
+
+    @classmethod
+    def group(cls, explainers: Sequence) -> List[List[int]]:
+        """
+        Returns positions of explainers grouped by shareable forward passes, for groups of at least two.
+        """
+        groups: List[List[int]] = []
+        for pos, explainer in enumerate(explainers):
+            if not cls.compatible([explainer]):
+                continue
+            group = next(
+                (group for group in groups
+                 if cls.compatible([explainers[group[0]], explainer])),
+                None,
+            )
+            if group is None:
+                groups.append([pos])
+            else:
+                group.append(pos)
+        return [group for group in groups if len(group) > 1]
+
+    def attribute(
+        self,
+        inputs: Union[Tensor, Tuple[Tensor]],
+        targets: Tensor,
+    ) -> List[Union[Tensor, Tuple[Tensor]]]:
+        """
+        Computes attributions of all explainers.
+
+        Returns:
+            List[Union[Tensor, Tuple[Tensor]]]: Attributions in the order of explainers.
+        """
+        first = self.explainers[0]
+        model = first._get_model()
+        forward_args, additional_forward_args = first._extract_forward_args(inputs)
+        forward_args = tuple(
+            forward_arg.detach().requires_grad_()
+            if forward_arg.is_floating_point() else forward_arg
+            for forward_arg in format_into_tuple(forward_args)
+        )
+        attrs = []
+        with self.composite.context(model) as hooked, torch.enable_grad():
+            outputs = _run_forward(hooked, forward_args, targets, additional_forward_args)
+            for index in range(len(self.explainers)):
+                self.selector.index = index
+                grads = torch.autograd.grad(
+                    torch.unbind(outputs),
+                    forward_args,
+                    retain_graph=index < len(self.explainers) - 1,
+                )
+                attrs.append(format_out_tuple_if_single(grads))
+        return attrs
+
+
+# attributes of zennit canonizers holding the modules and parameters they are registered to
+_CANONIZER_STATE_ATTRS = {
+    'linears',
+    'batch_norm',
+    'linear_params',
+    'batch_norm_params',
+    'attribute_keys',
+    'module',
+}
+
+
+def _same_canonizers(explainer: LRPBase, other: LRPBase) -> bool:
+    try:
+        return _canonizer_configs(explainer) == _canonizer_configs(other)
+    except Exception:
+        # configurations not comparable, e.g. holding tensors, are never shared
+        return False
+
+
+def _canonizer_configs(explainer: LRPBase) -> List[Tuple]:
+    return [_canonizer_config(canonizer) for canonizer in explainer.zennit_composite.canonizers]
+
+
+def _canonizer_config(canonizer: Canonizer) -> Tuple:
+    # type and configuration of a canonizer, without the state of its registration
+    if isinstance(canonizer, CompositeCanonizer):
+        return (type(canonizer), tuple(_canonizer_config(c) for c in canonizer.canonizers))
+    return (type(canonizer), tuple(sorted(
+        (name, value) for name, value in vars(canonizer).items()
+        if name not in _CANONIZER_STATE_ATTRS
+    )))
+
+
 class LRPUniformEpsilon(LRPBase):
     SUPPORTED_MODULES = [Linear, Convolution, LSTM, RNN, Attention]
 
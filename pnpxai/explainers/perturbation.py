@@ -0,0 +1,346 @@
+from typing import Any, List, NamedTuple, Optional, Tuple
+import math
+import threading
+from collections import OrderedDict
+
+import torch
+from torch import Tensor
+from torch.nn.modules import Module
+
+from pnpxai.utils import format_into_tuple, select_batch, tensor_fingerprint
+
+
+# weight of the full and empty coalitions, approximating the efficiency constraint of shapley values
+_EFFICIENCY_WEIGHT = 1e6
+
+
+class PerturbationTable(NamedTuple):
+    """
+    Sampled coalitions of a sample and model outputs of their perturbed inputs.
+
+    Attributes:
+        coalitions (Tensor): Coalitions of shape (n_samples, n_features), where 1 keeps a feature and 0 replaces it by the baseline.
+        outputs (Tensor): Model outputs of shape (n_samples, *output_size).
+    """
+    coalitions: Tensor
+    outputs: Tensor
+
+
+class PerturbationEngine:
+    """
+    Samples coalitions of features once per (input, baseline, feature mask) and evaluates the
+    model on their perturbed inputs, so that surrogates of several perturbation-based explainers
+    are fitted from one table of model outputs.
+
+    Coalitions are sampled uniformly, starting with the full and the empty coalition, and
+    perturbed inputs of all samples in a batch are forwarded together in chunks of `batch_size`.
+    Tables keep all model outputs, so they serve any target, and are kept in an LRU of
+    `max_entries` samples. A table with more coalitions serves requests of fewer, and a table with
+    fewer coalitions is extended by forwarding only the new ones.
+
+    Lime and KernelShap share an engine by passing the same instance as `perturbation_engine`.
+
+    Parameters:
+        model (Module): The model to evaluate.
+        batch_size (int): Number of perturbed inputs per forward.
+        max_entries (int): Number of samples whose tables are kept.
+        seed (int): Seed of coalitions, which are deterministic per sample.
+    """
+
+    def __init__(
+        self,
+        model: Module,
+        batch_size: int = 256,
+        max_entries: int = 128,
+        seed: int = 0,
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_entries = max_entries
+        self.seed = seed
+        self.hits = 0
+        self.misses = 0
+        self._tables: 'OrderedDict[str, PerturbationTable]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+    def tables(
+        self,
+        forward_args: Tuple[Tensor],
+        baselines: Tuple[Tensor],
+        feature_masks: Tuple[Tensor],
+        additional_forward_args: Any = None,
+        n_samples: int = 25,
+    ) -> List[PerturbationTable]:
+        """
+        Returns tables of `n_samples` coalitions for each sample in the batch, forwarding only
+        coalitions not cached yet.
+
+        Args:
+            forward_args (Tuple[Tensor]): Batched inputs.
+            baselines (Tuple[Tensor]): Baselines of inputs.
+            feature_masks (Tuple[Tensor]): Compact feature masks of inputs, as returned by `compact_feature_masks`.
+            additional_forward_args (Any): Additional arguments of the model.
+            n_samples (int): Number of coalitions per sample.
+
+        Returns:
+            List[PerturbationTable]: A table per sample.
+        """
+        bsz = len(forward_args[0])
+        tables: List[Optional[PerturbationTable]] = [None] * bsz
+        requests = []
+        with self._lock:
+            for idx in range(bsz):
+                key = self._key(
+                    forward_args, baselines, feature_masks, additional_forward_args, idx)
+                table = self._tables.get(key)
+                if table is not None:
+                    self._tables.move_to_end(key)
+                    if len(table.coalitions) >= n_samples:
+                        self.hits += 1
+                        tables[idx] = PerturbationTable(
+                            table.coalitions[:n_samples], table.outputs[:n_samples])
+                        continue
+                self.misses += 1
+                n_cached = 0 if table is None else len(table.coalitions)
+                n_features = int(max(mask[idx].max() for mask in feature_masks)) + 1
+                coalitions = self._sample(key, n_features, n_cached, n_samples)
+                requests.append((idx, key, table, coalitions))
+
+        if not requests:
+            return tables
+
+        outputs = self._forward(
+            forward_args, baselines, feature_masks, additional_forward_args,
+            [(idx, coalitions) for idx, _, _, coalitions in requests],
+        )
+        with self._lock:
+            for (idx, key, table, coalitions), new_outputs in zip(requests, outputs):
+                if table is not None:
+                    coalitions = torch.cat([table.coalitions, coalitions])
+                    new_outputs = torch.cat([table.outputs, new_outputs])
+                tables[idx] = PerturbationTable(coalitions, new_outputs)
+                self._tables[key] = tables[idx]
+                self._tables.move_to_end(key)
+            while len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+        return tables
+
+    def _key(
+        self,
+        forward_args: Tuple[Tensor],
+        baselines: Tuple[Tensor],
+        feature_masks: Tuple[Tensor],
+        additional_forward_args: Any,
+        idx: int,
+    ) -> str:
+        indices = torch.tensor([idx])
+        bsz = len(forward_args[0])
+        selected = select_batch((forward_args, baselines, feature_masks), indices)
+        tensors = [t for group in selected for t in group]
+        tensors += [
+            t for t in format_into_tuple(select_batch(additional_forward_args, indices, bsz=bsz))
+            if torch.is_tensor(t)
+        ]
+        return tensor_fingerprint(*tensors)
+
+    def _sample(self, key: str, n_features: int, start: int, stop: int) -> Tensor:
+        # rows are generated from the key and their positions, so extensions of a table
+        # continue its sequence
+        generator = torch.Generator().manual_seed(self.seed + int(key[:8], 16) + start)
+        coalitions = torch.bernoulli(
+            torch.full((stop - start, n_features), .5), generator=generator)
+        for row, value in ((0, 1.), (1, 0.)):
+            if start <= row < stop:
+                coalitions[row - start] = value
+        return coalitions
+
+    def _forward(
+        self,
+        forward_args: Tuple[Tensor],
+        baselines: Tuple[Tensor],
+        feature_masks: Tuple[Tensor],
+        additional_forward_args: Any,
+        requests: List[Tuple[int, Tensor]],
+    ) -> List[Tensor]:
+        # (sample index, row of its coalitions) of all perturbed inputs
+        rows = [
+            (idx, row) for idx, coalitions in requests
+            for row in range(len(coalitions))
+        ]
+        coalitions = dict(requests)
+        outputs = []
+        with torch.no_grad():
+            for start in range(0, len(rows), self.batch_size):
+                chunk = rows[start:start+self.batch_size]
+                sample_ids = torch.tensor([idx for idx, _ in chunk])
+                perturbed = []
+                for inputs, baseline, mask in zip(forward_args, baselines, feature_masks):
+                    keep = torch.stack([
+                        coalitions[idx][row].to(mask.device)[mask[idx]] for idx, row in chunk
+                    ]).bool()
+                    keep = keep.view(
+                        len(chunk), *[1] * (inputs.dim() - mask.dim()), *mask.shape[1:])
+                    perturbed.append(torch.where(
+                        keep, inputs[sample_ids.to(inputs.device)],
+                        _expand_baseline(baseline, inputs)[sample_ids.to(inputs.device)],
+                    ))
+                outputs.append(self.model(
+                    *perturbed,
+                    *format_into_tuple(select_batch(
+                        additional_forward_args, sample_ids, bsz=len(forward_args[0]))),
+                ).detach())
+        outputs = torch.cat(outputs)
+        splits = [len(coalitions) for _, coalitions in requests]
+        return list(outputs.split(splits))
+
+    def lime(
+        self,
+        forward_args: Tuple[Tensor],
+        targets: Optional[Tensor],
+        baselines: Tuple[Tensor],
+        feature_masks: Tuple[Tensor],
+        additional_forward_args: Any = None,
+        n_samples: int = 25,
+        kernel_width: float = 1.,
+        alpha: float = 1e-2,
+    ) -> Tuple[Tensor]:
+        """
+        Fits a ridge regression weighted by the exponential kernel on the cosine distance
+        between coalitions and the full coalition. Unlike captum's default Lime, which fits a lasso
+        weighted by distances of perturbed inputs, distances are measured in the space of
+        coalitions, so results differ from captum's.
+
+        Returns:
+            Tuple[Tensor]: Attributions of inputs.
+        """
+        masks = compact_feature_masks(forward_args, feature_masks)
+        tables = self.tables(
+            forward_args, baselines, masks, additional_forward_args, n_samples)
+        coefs = []
+        for idx, table in enumerate(tables):
+            z = table.coalitions.double()
+            cosine = z.sum(-1) / (z.norm(dim=-1) * math.sqrt(z.size(1))).clamp(min=1e-12)
+            weights = torch.exp(-(1. - cosine) ** 2 / kernel_width ** 2)
+            coefs.append(_fit_linear(
+                z, _select_target(table.outputs, targets, idx), weights, alpha))
+        return _to_attributions(forward_args, masks, coefs)
+
+    def kernel_shap(
+        self,
+        forward_args: Tuple[Tensor],
+        targets: Optional[Tensor],
+        baselines: Tuple[Tensor],
+        feature_masks: Tuple[Tensor],
+        additional_forward_args: Any = None,
+        n_samples: int = 25,
+    ) -> Tuple[Tensor]:
+        """
+        Fits a linear regression weighted by the shapley kernel, i.e. shapley values approximated
+        from the sampled coalitions.
+
+        Returns:
+            Tuple[Tensor]: Attributions of inputs.
+        """
+        masks = compact_feature_masks(forward_args, feature_masks)
+        tables = self.tables(
+            forward_args, baselines, masks, additional_forward_args, n_samples)
+        coefs = []
+        for idx, table in enumerate(tables):
+            z = table.coalitions.double()
+            coefs.append(_fit_linear(
+                z, _select_target(table.outputs, targets, idx), _shapley_kernel(z), 0.))
+        return _to_attributions(forward_args, masks, coefs)
+
+
+def compact_feature_masks(
+    forward_args: Tuple[Tensor],
+    feature_masks: Tuple[Tensor],
+) -> Tuple[Tensor]:
+    """
+    Relabels feature masks of each sample to consecutive ids from 0, across all inputs. If no
+    feature masks are given, every element of inputs is a feature.
+    """
+    feature_masks = format_into_tuple(feature_masks)
+    if not feature_masks:
+        feature_masks, offset = [], 0
+        for inputs in forward_args:
+            size = inputs[0].numel()
+            mask = torch.arange(offset, offset + size, device=inputs.device)
+            feature_masks.append(mask.view(1, *inputs.shape[1:]).expand_as(inputs))
+            offset += size
+        feature_masks = tuple(feature_masks)
+
+    bsz = len(forward_args[0])
+    compacted = [[] for _ in feature_masks]
+    for idx in range(bsz):
+        flattened = [mask[idx].reshape(-1) for mask in feature_masks]
+        _, inverse = torch.unique(torch.cat(flattened), return_inverse=True)
+        for mask_id, chunk in enumerate(inverse.split([len(f) for f in flattened])):
+            compacted[mask_id].append(chunk.view(feature_masks[mask_id].shape[1:]))
+    return tuple(torch.stack(masks) for masks in compacted)
+
+
+def _expand_baseline(baseline: Tensor, inputs: Tensor) -> Tensor:
+    if not torch.is_tensor(baseline):
+        baseline = torch.tensor(baseline, device=inputs.device)
+    return baseline.to(inputs.dtype).expand_as(inputs)
+
+
+def _select_target(outputs: Tensor, targets: Optional[Tensor], idx: int) -> Tensor:
+    outputs = outputs.reshape(len(outputs), -1)
+    if targets is None:
+        if outputs.size(1) != 1:
+            raise ValueError(
+                f"Targets are required to explain outputs of {outputs.size(1)} elements per sample.")
+        return outputs[:, 0].double()
+    return outputs[:, int(targets[idx])].double()
+
+
+def _shapley_kernel(coalitions: Tensor) -> Tensor:
+    n_features = coalitions.size(1)
+    sizes = coalitions.sum(-1)
+    partial = (sizes > 0) & (sizes < n_features)
+    k = sizes[partial]
+    # (M-1) / (C(M, k) k (M-k)), in log space as the binomial overflows for many features
+    log_weights = (
+        math.log(max(n_features - 1, 1))
+        - (math.lgamma(n_features + 1) - torch.lgamma(k + 1) - torch.lgamma(n_features - k + 1))
+        - torch.log(k) - torch.log(n_features - k)
+    )
+    weights = torch.full_like(sizes, _EFFICIENCY_WEIGHT)
+    if len(log_weights):
+        weights[partial] = torch.exp(log_weights - log_weights.max())
+    return weights
+
+
+def _fit_linear(x: Tensor, y: Tensor, weights: Tensor, alpha: float) -> Tensor:
+    # weighted (ridge) least squares with an unpenalized intercept, fitted on the device of
+    # coalitions (cpu), while model outputs may be on any device
+    y = y.to(x.device)
+    weights = weights.to(x.device)
+    design = torch.cat([x, torch.ones_like(x[:, :1])], dim=1)
+    weighted = design * weights[:, None]
+    gram = design.T @ weighted
+    gram[:-1, :-1] += alpha * torch.eye(x.size(1), dtype=x.dtype, device=x.device)
+    coefs = torch.linalg.lstsq(gram, weighted.T @ y[:, None]).solution
+    return coefs[:-1, 0]
+
+
+def _to_attributions(
+    forward_args: Tuple[Tensor],
+    feature_masks: Tuple[Tensor],
+    coefs: List[Tensor],
+) -> Tuple[Tensor]:
+    attrs = []
+    for inputs, mask in zip(forward_args, feature_masks):
+        attr = torch.stack([
+            coef.to(mask.device)[mask[idx]] for idx, coef in enumerate(coefs)
+        ])
+        attr = attr.view(len(inputs), *[1] * (inputs.dim() - mask.dim()), *mask.shape[1:])
+        dtype = inputs.dtype if inputs.is_floating_point() else torch.float
+        attrs.append(attr.expand(inputs.shape).to(dtype))
+    return tuple(attrs)
@@ -4,6 +4,7 @@ from typing import Dict, Sequence, Callable, Optional, Tuple, Set
 import warnings
 import torch
 from torch import nn, Tensor, fx
+from pnpxai.core.detector import ModelGraph
 from pnpxai.explainers.rap import rules
 from pnpxai.explainers.rap.rule_map import SUPPORTED_OPS
 from pnpxai.messages import get_message
@@ -12,7 +13,7 @@ from pnpxai.utils import flatten, map_recursive
 
 class RelativeAttributePropagation():
     def __init__(self, model: nn.Module):
-        self._trace = fx.symbolic_trace(model)
+        self._trace = ModelGraph.of(model).fx_trace
         self._trace.eval()
         self._results: Dict[str, fx.Node] = {}
         self._inputs: Dict[str, fx.Node] = defaultdict(tuple)
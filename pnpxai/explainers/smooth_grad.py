@@ -8,6 +8,7 @@ from pnpxai.utils import format_into_tuple, format_out_tuple_if_single
 from pnpxai.explainers.zennit.attribution import SmoothGradient as SmoothGradAttributor
 from pnpxai.explainers.zennit.attribution import LayerSmoothGradient as LayerSmoothGradAttributor
 from pnpxai.explainers.zennit.base import ZennitExplainer
+from pnpxai.explainers.gradient_cache import GradientCache
 from pnpxai.explainers.utils import captum_wrap_model_input, _format_to_tuple
 from pnpxai.evaluator.optimizer.utils import generate_param_key
 
@@ -28,6 +29,8 @@ class SmoothGrad(ZennitExplainer):
         layer: Optional[Union[Union[str, Module],
                               Sequence[Union[str, Module]]]] = None,
         n_classes: Optional[int] = None,
+        max_batch_size: Optional[int] = None,
+        gradient_cache: Optional[GradientCache] = None,
     ) -> None:
         super().__init__(
             model,
@@ -38,6 +41,8 @@ class SmoothGrad(ZennitExplainer):
         self.noise_level = noise_level
         self.n_iter = n_iter
         self.layer = layer
+        self.max_batch_size = max_batch_size
+        self.gradient_cache = gradient_cache
 
     @property
     def _layer_attributor(self) -> LayerSmoothGradAttributor:
@@ -53,6 +58,7 @@ class SmoothGrad(ZennitExplainer):
             layer=layers,
             noise_level=self.noise_level,
             n_iter=self.n_iter,
+            max_batch_size=self.max_batch_size,
         )
 
     @property
@@ -61,6 +67,8 @@ class SmoothGrad(ZennitExplainer):
             model=self.model,
             noise_level=self.noise_level,
             n_iter=self.n_iter,
+            max_batch_size=self.max_batch_size,
+            gradient_cache=self.gradient_cache,
         )
 
     def attributor(self) -> Union[SmoothGradAttributor, LayerSmoothGradAttributor]:
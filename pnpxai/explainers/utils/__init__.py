@@ -7,6 +7,9 @@ from pnpxai.explainers.utils.utils import (
 from pnpxai.explainers.utils.base import UtilFunction
 from pnpxai.explainers.utils.baselines import BaselineFunction
 from pnpxai.explainers.utils.feature_masks import FeatureMaskFunction
+from pnpxai.explainers.utils.feature_mask_cache import FeatureMaskCache
+from pnpxai.explainers.utils.segmentation_pool import SegmentationPool
+from pnpxai.explainers.utils.multi_target import is_multi_target, multi_target_gradients
 from pnpxai.explainers.utils.function_selectors import FunctionSelector
 from pnpxai.explainers.utils.postprocess import (
     PoolingFunction,
@@ -0,0 +1,107 @@
+from typing import Callable, Dict, List, Optional
+import hashlib
+import threading
+from collections import OrderedDict
+
+import torch
+
+from pnpxai.utils import tensor_fingerprint
+
+
+class FeatureMaskCache:
+    """
+    A bounded cache of feature masks, keyed by contents of an input and the segmentation function
+    with its parameters, so that repeated segmentations of the same image (e.g. by Lime and
+    KernelShap, optuna trials, or re-attributions of metrics) are computed once.
+
+    Masks are kept on cpu in an LRU of at most `max_bytes`. If `cache_dir` is given, they are also
+    written to a `DiskCache`, which persists them across processes and runs.
+
+    Parameters:
+        max_bytes (int): Maximum bytes of masks kept in memory.
+        cache_dir (Optional[str]): Directory of the on-disk store.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 2**20,
+        cache_dir: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._masks: 'OrderedDict[str, torch.Tensor]' = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._disk = None
+        if cache_dir is not None:
+            # imported lazily, as the experiment package depends on explainers
+            from pnpxai.core.experiment.disk_cache import DiskCache
+            self._disk = DiskCache(cache_dir)
+
+    @staticmethod
+    def make_key(fn: Callable, inputs: torch.Tensor, **kwargs) -> str:
+        """
+        Returns the key of a mask of a single input segmented by `fn` with `kwargs`.
+        """
+        params = ','.join(f"{k}={v!r}" for k, v in sorted(kwargs.items()))
+        signature = f"{fn.__module__}.{fn.__qualname__}({params})"
+        digest = hashlib.sha1(signature.encode()).hexdigest()[:16]
+        return f"{digest}.{tensor_fingerprint(inputs)}"
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._masks),
+            'bytes': self._nbytes,
+        }
+
+    def get(self, key: str) -> Optional[torch.Tensor]:
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                self.hits += 1
+                return mask
+        mask = self._disk.get(key) if self._disk is not None else None
+        with self._lock:
+            if mask is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put(key, mask)
+        return mask
+
+    def put_many(self, keys: List[str], masks: List[torch.Tensor]):
+        masks = [mask.detach().cpu() for mask in masks]
+        with self._lock:
+            for key, mask in zip(keys, masks):
+                self._put(key, mask)
+        if self._disk is not None:
+            self._disk.put_many(keys, masks)
+
+    def _put(self, key: str, mask: torch.Tensor):
+        if key in self._masks:
+            self._nbytes -= _nbytes(self._masks.pop(key))
+        self._masks[key] = mask
+        self._nbytes += _nbytes(mask)
+        while self._nbytes > self.max_bytes and len(self._masks) > 1:
+            _, evicted = self._masks.popitem(last=False)
+            self._nbytes -= _nbytes(evicted)
+
+    def clear(self):
+        """
+        Clears masks in memory and on disk.
+        """
+        with self._lock:
+            self._masks.clear()
+            self._nbytes = 0
+        if self._disk is not None:
+            self._disk.clear()
+
+
+def _nbytes(mask: torch.Tensor) -> int:
+    return mask.element_size() * mask.nelement()
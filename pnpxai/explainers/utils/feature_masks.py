@@ -1,5 +1,6 @@
 from typing import Literal, Union, Optional, Sequence
 import copy
+from concurrent.futures import Future
 import torch
 from skimage.segmentation import (
     felzenszwalb,
@@ -9,6 +10,8 @@ from skimage.segmentation import (
 )
 from optuna.trial import Trial
 from pnpxai.explainers.utils.base import UtilFunction
+from pnpxai.explainers.utils.feature_mask_cache import FeatureMaskCache
+from pnpxai.explainers.utils.segmentation_pool import SegmentationPool
 from pnpxai.evaluator.optimizer.utils import generate_param_key
 
 
@@ -29,21 +32,58 @@ class FeatureMaskFunction(UtilFunction):
             and then converts the result back to a tensor. This method is useful for generating masks 
             for image or spatial data.
 
+        set_cache(cache: Optional[FeatureMaskCache]):
+            Sets the cache of masks shared by all feature mask functions, or disables caching if None.
+
+        set_pool(pool: Optional[SegmentationPool]):
+            Sets the pool segmenting images of a batch concurrently, or segments them serially if None.
+
+        submit(inputs: torch.Tensor) -> Future:
+            Generates feature masks in the background of the pool, overlapping with work of the caller.
+
     Notes:
         - `FeatureMaskFunction` is designed to be subclassed. Concrete feature mask functions 
           should inherit from this class and implement the actual masking logic.
-        - The `_skseg_for_tensor` method is a static method that handles the process of applying 
+        - The `_skseg_for_tensor` method is a class method that handles the process of applying 
           a segmentation function to tensors. This method is intended to be used within subclasses 
-          that need to generate feature masks.
+          that need to generate feature masks. Masks of inputs segmented before with the same
+          function and parameters are read from the class-level `FeatureMaskCache`.
         - Ensure that the function `fn` provided is compatible with the shape and type of the input 
           tensors.
     """
     
+    _cache: Optional[FeatureMaskCache] = FeatureMaskCache()
+    _pool: Optional[SegmentationPool] = None
+
     def __init__(self):
         pass
 
-    @staticmethod
-    def _skseg_for_tensor(fn, inputs: torch.Tensor, **kwargs) -> torch.Tensor:
+    @classmethod
+    def set_cache(cls, cache: Optional[FeatureMaskCache]):
+        FeatureMaskFunction._cache = cache
+
+    @classmethod
+    def get_cache(cls) -> Optional[FeatureMaskCache]:
+        return FeatureMaskFunction._cache
+
+    @classmethod
+    def set_pool(cls, pool: Optional[SegmentationPool]):
+        FeatureMaskFunction._pool = pool
+
+    @classmethod
+    def get_pool(cls) -> Optional[SegmentationPool]:
+        return FeatureMaskFunction._pool
+
+    def submit(self, inputs: torch.Tensor) -> Future:
+        pool = self.get_pool()
+        if pool is not None:
+            return pool.submit(self, inputs)
+        future = Future()
+        future.set_result(self(inputs))
+        return future
+
+    @classmethod
+    def _skseg_for_tensor(cls, fn, inputs: torch.Tensor, **kwargs) -> torch.Tensor:
         """
         Applies a segmentation function to each tensor in the input batch to generate feature masks.
 
@@ -58,12 +98,25 @@ class FeatureMaskFunction(UtilFunction):
             torch.Tensor: A tensor of generated feature masks, stacked along the batch dimension. 
                 The result is converted to a long tensor and moved to the same device as the input.
         """
+        cache = cls.get_cache()
+        keys = [
+            FeatureMaskCache.make_key(fn, inp, **kwargs) for inp in inputs
+        ] if cache is not None else [None] * len(inputs)
         feature_mask = [
-            torch.tensor(fn(
-                inp.permute(1, 2, 0).detach().cpu().numpy(),
-                **kwargs
-            )) for inp in inputs
+            cache.get(key) if cache is not None else None for key in keys
         ]
+        missing = [i for i, mask in enumerate(feature_mask) if mask is None]
+        # a single transfer of the batch rather than one per image
+        images = inputs[missing].permute(0, 2, 3, 1).detach().cpu().numpy()
+        pool = cls.get_pool()
+        if pool is not None:
+            masks = pool.map(fn, list(images), **kwargs)
+        else:
+            masks = [fn(image, **kwargs) for image in images]
+        for i, mask in zip(missing, masks):
+            feature_mask[i] = torch.tensor(mask)
+        if cache is not None and missing:
+            cache.put_many([keys[i] for i in missing], [feature_mask[i] for i in missing])
         return torch.stack(feature_mask).long().to(inputs.device)
 
 
@@ -183,6 +236,214 @@ class Watershed(FeatureMaskFunction):
         }
 
 
+class Grid(FeatureMaskFunction):
+    """
+    Square cells of a regular grid, computed on the device of inputs.
+    """
+
+    def __init__(self, cell_size: int = 16):
+        super().__init__()
+        self.cell_size = cell_size
+
+    def __call__(self, inputs: torch.Tensor):
+        bsz, _, height, width = inputs.size()
+        return _grid_mask(bsz, height, width, self.cell_size, inputs.device)
+
+    def get_tunables(self):
+        return {
+            'cell_size': (int, {'low': 4, 'high': 64, 'step': 4}),
+        }
+
+
+class JitteredGrid(FeatureMaskFunction):
+    """
+    Square cells of a grid whose lines are shifted per image by random offsets of up to `jitter`
+    times the cell size. Offsets are drawn from `seed`, so masks of a batch are deterministic.
+    """
+
+    def __init__(self, cell_size: int = 16, jitter: float = .5, seed: int = 0):
+        super().__init__()
+        self.cell_size = cell_size
+        self.jitter = jitter
+        self.seed = seed
+
+    def __call__(self, inputs: torch.Tensor):
+        bsz, _, height, width = inputs.size()
+        generator = torch.Generator().manual_seed(self.seed)
+        max_offset = max(int(self.jitter * self.cell_size), 0) + 1
+        offsets = torch.randint(
+            max_offset, (2, bsz, 1, 1), generator=generator).to(inputs.device)
+        return _grid_mask(
+            bsz, height, width, self.cell_size, inputs.device,
+            offset_y=offsets[0], offset_x=offsets[1],
+        )
+
+    def get_tunables(self):
+        return {
+            'cell_size': (int, {'low': 4, 'high': 64, 'step': 4}),
+            'jitter': (float, {'low': 0., 'high': 1., 'step': .1}),
+        }
+
+
+class TorchSlic(FeatureMaskFunction):
+    """
+    SLIC-style superpixels by k-means on colors and coordinates of pixels, vectorized over the
+    batch on the device of inputs.
+
+    Colors are standardized per image, and coordinates are scaled by `compactness` over the grid
+    interval of initial centers. As in SLIC, every pixel is compared only with centers initialized
+    in the 3x3 grid cells around it.
+    """
+
+    def __init__(
+        self,
+        n_segments: int = 150,
+        compactness: float = 1.,
+        n_iter: int = 10,
+    ):
+        super().__init__()
+        self.n_segments = n_segments
+        self.compactness = compactness
+        self.n_iter = n_iter
+
+    def __call__(self, inputs: torch.Tensor):
+        bsz, n_channels, height, width = inputs.size()
+        device = inputs.device
+        n_rows = max(1, round((self.n_segments * height / width) ** .5))
+        n_cols = max(1, round(self.n_segments / n_rows))
+        interval = ((height * width) / (n_rows * n_cols)) ** .5
+
+        # pixel features: (bsz, height * width, n_channels + 2)
+        colors = _standardize(inputs.detach().float()).flatten(2).transpose(1, 2)
+        ys, xs = torch.meshgrid(
+            torch.arange(height, device=device, dtype=torch.float),
+            torch.arange(width, device=device, dtype=torch.float),
+            indexing='ij',
+        )
+        coords = torch.stack([ys, xs], dim=-1).view(1, -1, 2) * self.compactness / interval
+        features = torch.cat([colors, coords.expand(bsz, -1, -1)], dim=-1)
+
+        # initial centers at the grid, and candidates of each pixel among its 3x3 cells
+        cell_y = (ys.flatten() * n_rows / height).long()
+        cell_x = (xs.flatten() * n_cols / width).long()
+        labels = cell_y * n_cols + cell_x
+        candidates = torch.stack([
+            (cell_y + dy).clamp(0, n_rows - 1) * n_cols + (cell_x + dx).clamp(0, n_cols - 1)
+            for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+        ], dim=-1)
+        labels = labels.expand(bsz, -1)
+        centers = _cluster_means(features, labels, n_rows * n_cols)
+
+        for _ in range(self.n_iter):
+            # (bsz, height * width, 9, n_features)
+            candidate_centers = centers[:, candidates]
+            distances = (candidate_centers - features[:, :, None]).pow(2).sum(-1)
+            labels = candidates.expand(bsz, -1, -1).gather(
+                -1, distances.argmin(-1, keepdim=True)).squeeze(-1)
+            centers = _cluster_means(features, labels, n_rows * n_cols, centers)
+        return _relabel(labels.view(bsz, height, width))
+
+    def get_tunables(self):
+        return {
+            'n_segments': (int, {'low': 100, 'high': 500, 'step': 10}),
+            'compactness': (float, {'low': 1e-2, 'high': 1e2, 'log': True}),
+        }
+
+
+class Quadtree(FeatureMaskFunction):
+    """
+    Leaves of a quadtree, splitting cells whose color variance exceeds `threshold` until
+    `max_depth`, vectorized over the batch on the device of inputs. Colors are standardized per
+    image, so the threshold is relative to the variance of the whole image.
+    """
+
+    def __init__(self, max_depth: int = 4, threshold: float = .1):
+        super().__init__()
+        self.max_depth = max_depth
+        self.threshold = threshold
+
+    def __call__(self, inputs: torch.Tensor):
+        bsz, _, height, width = inputs.size()
+        device = inputs.device
+        colors = _standardize(inputs.detach().float()).flatten(2)
+        ys = torch.arange(height, device=device)[:, None]
+        xs = torch.arange(width, device=device)[None, :]
+
+        mask = torch.empty(bsz, height * width, dtype=torch.long, device=device)
+        resolved = torch.zeros(bsz, height * width, dtype=torch.bool, device=device)
+        offset = 0
+        for depth in range(self.max_depth + 1):
+            n_cells = 2 ** depth
+            cells = ((ys * n_cells // height) * n_cells + xs * n_cells // width).flatten()
+            cells = cells.expand(bsz, -1)
+            # a pixel is a leaf of the first depth at which its cell is homogeneous
+            means = _cluster_means(colors.transpose(1, 2), cells, n_cells ** 2)
+            sq_means = _cluster_means(colors.transpose(1, 2).pow(2), cells, n_cells ** 2)
+            variances = (sq_means - means.pow(2)).mean(-1).gather(1, cells)
+            leaves = ~resolved & (
+                (variances <= self.threshold) | (depth == self.max_depth))
+            mask[leaves] = (cells + offset)[leaves]
+            resolved |= leaves
+            offset += n_cells ** 2
+        return _relabel(mask.view(bsz, height, width))
+
+    def get_tunables(self):
+        return {
+            'max_depth': (int, {'low': 2, 'high': 6, 'step': 1}),
+            'threshold': (float, {'low': 1e-3, 'high': 1., 'log': True}),
+        }
+
+
+def _grid_mask(
+    bsz: int,
+    height: int,
+    width: int,
+    cell_size: int,
+    device: torch.device,
+    offset_y: Union[int, torch.Tensor] = 0,
+    offset_x: Union[int, torch.Tensor] = 0,
+) -> torch.Tensor:
+    ys = torch.arange(height, device=device)[None, :, None] + offset_y
+    xs = torch.arange(width, device=device)[None, None, :] + offset_x
+    n_cols = (width + cell_size - 1) // cell_size + 1
+    mask = (ys // cell_size) * n_cols + xs // cell_size
+    return _relabel(mask.expand(bsz, height, width))
+
+
+def _relabel(mask: torch.Tensor) -> torch.Tensor:
+    # relabels masks of each sample to consecutive ids from 0, as `compact_feature_masks`
+    flattened = mask.flatten(1)
+    n_ids = int(flattened.max()) + 1
+    shifted = flattened + n_ids * torch.arange(len(mask), device=mask.device)[:, None]
+    _, inverse = torch.unique(shifted, return_inverse=True)
+    return (inverse - inverse.min(1, keepdim=True).values).view_as(mask)
+
+
+def _standardize(inputs: torch.Tensor) -> torch.Tensor:
+    dims = tuple(range(1, inputs.dim()))
+    mean = inputs.mean(dim=dims, keepdim=True)
+    std = inputs.std(dim=dims, keepdim=True).clamp(min=1e-8)
+    return (inputs - mean) / std
+
+
+def _cluster_means(
+    features: torch.Tensor,
+    labels: torch.Tensor,
+    n_clusters: int,
+    fallback: Optional[torch.Tensor] = None,
+) -> torch.Tensor:
+    # means of features (bsz, n, d) per cluster, keeping fallback values of empty clusters
+    bsz, _, n_features = features.size()
+    sums = features.new_zeros(bsz, n_clusters, n_features).scatter_add_(
+        1, labels[..., None].expand(-1, -1, n_features), features)
+    counts = features.new_zeros(bsz, n_clusters).scatter_add_(
+        1, labels, torch.ones_like(labels, dtype=features.dtype))
+    means = sums / counts.clamp(min=1)[..., None]
+    if fallback is not None:
+        means = torch.where(counts[..., None] > 0, means, fallback)
+    return means
+
+
 class NoMask1d(FeatureMaskFunction):
     def __init__(self):
         super().__init__()
@@ -208,6 +469,10 @@ FEATURE_MASK_FUNCTIONS_FOR_IMAGE = {
     'felzenszwalb': Felzenszwalb,
     'quickshift': Quickshift,
     'slic': Slic,
+    'grid': Grid,
+    'jittered_grid': JitteredGrid,
+    'torch_slic': TorchSlic,
+    'quadtree': Quadtree,
     # 'watershed': watershed_for_tensor, TODO: watershed
 }
 
@@ -227,6 +492,7 @@ FEATURE_MASK_FUNCTIONS = {
 
 
 FeatureMaskMethod = Literal[
-    'felzenszwalb', 'quickshift', 'slic', 'watershed', 'no_mask_1d'
+    'felzenszwalb', 'quickshift', 'slic', 'watershed', 'no_mask_1d',
+    'grid', 'jittered_grid', 'torch_slic', 'quadtree',
 ]
 FeatureMaskMethodOrFunction = Union[FeatureMaskMethod, FeatureMaskFunction]
@@ -0,0 +1,60 @@
+from typing import Any, Optional, Tuple
+
+import torch
+from torch import Tensor
+
+
+def is_multi_target(targets: Any) -> bool:
+    """
+    Returns whether targets have shape (bsz, k), i.e. k targets per sample.
+    """
+    return torch.is_tensor(targets) and targets.dim() == 2
+
+
+def multi_target_gradients(
+    outputs: Tensor,
+    targets: Tensor,
+    inputs: Tuple[Tensor],
+    batched: bool = True,
+    retain_graph: bool = False,
+) -> Tuple[Tensor]:
+    """
+    Computes gradients of outputs selected by targets of shape (bsz, k) w.r.t. inputs, by k
+    vector-Jacobian products on the graph of a single forward.
+
+    The products are batched over one-hot grad outputs of the k targets. If the graph has operations
+    not supporting batched gradients, e.g. custom autograd functions of rule hooks, or `batched` is
+    False, they are computed by one backward per target on the retained graph.
+
+    Args:
+        outputs (Tensor): Model outputs of shape (bsz, n_classes).
+        targets (Tensor): Targets of shape (bsz, k).
+        inputs (Tuple[Tensor]): Tensors w.r.t. which gradients are computed.
+        batched (bool): Whether to try batched vector-Jacobian products.
+        retain_graph (bool): Whether to keep the graph for further backwards.
+
+    Returns:
+        Tuple[Tensor]: Gradients of shape (bsz, k, *input.shape[1:]) per input.
+    """
+    bsz, k = targets.shape
+    grad_outputs = torch.zeros((k, *outputs.shape), dtype=outputs.dtype, device=outputs.device)
+    grad_outputs[
+        torch.arange(k, device=outputs.device)[:, None],
+        torch.arange(bsz, device=outputs.device)[None, :],
+        targets.to(outputs.device).T,
+    ] = 1.
+    grads: Optional[Tuple[Tensor]] = None
+    if batched:
+        try:
+            grads = torch.autograd.grad(
+                outputs, inputs, grad_outputs, retain_graph=True, is_grads_batched=True)
+        except RuntimeError:
+            grads = None
+    if grads is None:
+        grads = tuple(torch.stack(grads_per_target) for grads_per_target in zip(*(
+            torch.autograd.grad(
+                outputs, inputs, grad_outputs[j],
+                retain_graph=retain_graph or j < k - 1,
+            ) for j in range(k)
+        )))
+    return tuple(grad.transpose(0, 1) for grad in grads)
@@ -0,0 +1,93 @@
+from typing import Any, Callable, List, Literal, Optional
+import os
+import threading
+import multiprocessing as mp
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+
+SegmentationBackend = Literal['thread', 'process']
+
+
+def _segment(fn: Callable, image: np.ndarray, kwargs: dict) -> np.ndarray:
+    return fn(image, **kwargs)
+
+
+class SegmentationPool:
+    """
+    A pool of workers segmenting images of a batch concurrently.
+
+    Threads suit segmentations releasing the GIL and avoid copying images, while processes suit
+    ones holding it, at the cost of pickling images and masks. Results of `map` are in the order
+    of images regardless of the order workers finish them. `submit` runs a whole call, e.g. of a
+    feature mask function, in the background, so that segmentation overlaps with model work of the
+    caller.
+
+    Parameters:
+        n_workers (Optional[int]): Number of workers. Defaults to the number of cpus.
+        backend (SegmentationBackend): Whether workers are threads or processes.
+        mp_context (str): Start method of worker processes.
+    """
+
+    def __init__(
+        self,
+        n_workers: Optional[int] = None,
+        backend: SegmentationBackend = 'thread',
+        mp_context: str = 'spawn',
+    ):
+        assert backend in ('thread', 'process'), f"Unsupported backend: {backend}"
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.backend = backend
+        self.mp_context = mp_context
+        self._executor: Optional[Executor] = None
+        self._dispatcher: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.backend == 'thread':
+                    self._executor = ThreadPoolExecutor(max_workers=self.n_workers)
+                else:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.n_workers,
+                        mp_context=mp.get_context(self.mp_context),
+                    )
+            return self._executor
+
+    def map(self, fn: Callable, images: List[np.ndarray], **kwargs) -> List[np.ndarray]:
+        """
+        Segments images concurrently.
+
+        Args:
+            fn (Callable): The segmentation function. Must be picklable for the process backend.
+            images (List[np.ndarray]): Images to segment.
+            **kwargs: Keyword arguments of the segmentation function.
+
+        Returns:
+            List[np.ndarray]: Masks in the order of images.
+        """
+        if len(images) <= 1 or self.n_workers == 1:
+            return [fn(image, **kwargs) for image in images]
+        return list(self.executor.map(
+            _segment, [fn] * len(images), images, [kwargs] * len(images)))
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any) -> Future:
+        """
+        Runs `fn(*args, **kwargs)` in a background thread, which may in turn use the workers.
+        """
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = ThreadPoolExecutor(max_workers=1)
+            dispatcher = self._dispatcher
+        return dispatcher.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            for executor in (self._dispatcher, self._executor):
+                if executor is not None:
+                    executor.shutdown(wait=wait)
+            self._executor = None
+            self._dispatcher = None
@@ -6,13 +6,18 @@ from torch import nn
 from captum.attr._utils.input_layer_wrapper import ModelInputWrapper
 from skimage.segmentation import felzenszwalb
 
-from pnpxai.core.detector import symbolic_trace
+from pnpxai.core.detector import ModelGraph
 from pnpxai.core.detector.utils import get_target_module_of, find_nearest_user_of
 from pnpxai.core.detector.types import Convolution, Pool
 
 
 def find_cam_target_layer(model: nn.Module) -> nn.Module:
-    traced_model = symbolic_trace(model)
+    return ModelGraph.of(model).get('cam_target_layer', _find_cam_target_layer)
+
+
+def _find_cam_target_layer(graph: ModelGraph) -> nn.Module:
+    model = graph.model
+    traced_model = graph.trace
     last_conv_node = next(
         node for node in reversed(traced_model.graph.nodes)
         if isinstance(get_target_module_of(node), Convolution)
@@ -12,6 +12,7 @@ from torch.nn.modules import Module
 from pnpxai.core.detector.types import Linear, Convolution, LSTM, RNN, Attention
 from pnpxai.utils import format_into_tuple, format_out_tuple_if_single
 from pnpxai.explainers.smooth_grad import SmoothGrad
+from pnpxai.explainers.gradient_cache import GradientCache
 
 
 class VarGrad(SmoothGrad):
@@ -26,6 +27,8 @@ class VarGrad(SmoothGrad):
         additional_forward_arg_extractor: Optional[Callable[[Tuple[Tensor]], Union[Tensor, Tuple[Tensor]]]]=None,
         layer: Optional[Union[Union[str, Module], Sequence[Union[str, Module]]]]=None,
         n_classes: Optional[int]=None,
+        max_batch_size: Optional[int]=None,
+        gradient_cache: Optional[GradientCache]=None,
 	) -> None:
 		super().__init__(
 			model=model,
@@ -35,6 +38,8 @@ class VarGrad(SmoothGrad):
 			additional_forward_arg_extractor=additional_forward_arg_extractor,
 			layer=layer,
 			n_classes=n_classes,
+			max_batch_size=max_batch_size,
+			gradient_cache=gradient_cache,
 		)
 
 	def attribute(
@@ -7,7 +7,14 @@ import torch
 import torchvision.transforms.functional as TF
 from torch import Tensor, device
 from torch.nn import Module
-from captum._utils.common import _run_forward, _sort_key_list, _reduce_list
+from captum._utils.common import (
+    _run_forward,
+    _sort_key_list,
+    _reduce_list,
+    _expand_target,
+    _expand_additional_forward_args,
+    ExpansionTypes,
+)
 from captum._utils.gradient import (
     compute_layer_gradients_and_eval,
     compute_gradients,
@@ -19,7 +26,9 @@ from zennit.core import Composite, Hook
 from zennit.composites import LayerMapComposite
 from zennit.types import Convolution, BatchNorm
 
-from pnpxai.utils import format_into_tuple
+from pnpxai.utils import format_into_tuple, compiled
+from pnpxai.explainers.gradient_cache import GradientCache
+from pnpxai.explainers.utils.multi_target import is_multi_target, multi_target_gradients
 from pnpxai.core._types import TensorOrTupleOfTensors, Tensor
 
 
@@ -36,6 +45,8 @@ class Gradient(ZennitGradient):
 
     def grad(self, forward_args, targets, additional_forward_args=None):
         self._process_forward_args_before_grad(forward_args)
+        if is_multi_target(targets):
+            return self._multi_target_grad(forward_args, targets, additional_forward_args)
         grads = compute_gradients(
             self.model,
             forward_args,
@@ -51,6 +62,22 @@ class Gradient(ZennitGradient):
         forward_args = self._process_forward_args_before_forward(forward_args)
         return self.grad(forward_args, targets, additional_forward_args)
 
+    def _multi_target_grad(self, forward_args, targets, additional_forward_args=None):
+        # one forward for all targets, whose gradients are of shape (bsz, k, ...)
+        with torch.autograd.set_grad_enabled(True):
+            outputs = _run_forward(
+                self.model, forward_args, additional_forward_args=additional_forward_args)
+            grads = multi_target_gradients(
+                outputs,
+                targets,
+                format_into_tuple(forward_args),
+                # custom autograd functions of rule hooks do not support batched gradients
+                batched=self.composite is None,
+            )
+        if len(grads) == 1:
+            return grads[0]
+        return grads
+
     def _process_forward_args_before_forward(self, forward_args):
         if isinstance(forward_args, Sequence):
             return tuple(
@@ -98,6 +125,17 @@ class LayerGradient(Gradient):
 
 
 class SmoothGradient(Gradient):
+    """
+    Averages gradients of `n_iter` noisy copies of inputs, the last of which is noise-free.
+
+    If `max_batch_size` is given, noisy copies are stacked along the batch dimension and their
+    gradients are computed in as few passes as possible, each forwarding at most `max_batch_size`
+    samples. Otherwise, each copy is forwarded separately.
+
+    If `gradient_cache` is given and no composite modifies gradients, the gradient of the
+    noise-free copy is looked up in the cache, where `Gradient` and `GradientXInput` of the same
+    inputs and targets share it.
+    """
     def __init__(
         self,
         model: Module,
@@ -107,10 +145,14 @@ class SmoothGradient(Gradient):
         attr_output=None,
         create_graph=None,
         retain_graph=None,
+        max_batch_size: Optional[int]=None,
+        gradient_cache: Optional[GradientCache]=None,
     ) -> None:
         super().__init__(model, composite, attr_output, create_graph, retain_graph)
         self.noise_level = noise_level
         self.n_iter = n_iter
+        self.max_batch_size = max_batch_size
+        self.gradient_cache = gradient_cache
 
     def forward(
         self,
@@ -124,19 +166,25 @@ class SmoothGradient(Gradient):
 
         result = torch.zeros_like(inputs)
         result_sq = torch.zeros_like(inputs)
-        for n in range(self.n_iter):
-            if n == self.n_iter - 1:
-                epsilon = torch.zeros_like(inputs)
-            else:
-                epsilon = torch.randn_like(inputs) * std
+        n_noisy = self.n_iter
+        if self.gradient_cache is not None and self.composite is None:
+            n_noisy -= 1
+            clean = self.gradient_cache.gradients(
+                self.model, (inputs,), targets, additional_forward_args)[0]
+            result += clean / self.n_iter
+            if return_squared:
+                result_sq += clean.pow(2) / self.n_iter
+        for start, stop in _iter_chunks(n_noisy, len(inputs), self.max_batch_size):
+            n_copies = stop - start
+            noisy = _noisy_copies(inputs, std, n_copies, stop == self.n_iter)
             grad = self.grad(
-                inputs + epsilon,
-                targets,
-                additional_forward_args,
+                noisy,
+                _expand_target(targets, n_copies, ExpansionTypes.repeat),
+                _expand_additional_forward_args(
+                    additional_forward_args, n_copies, ExpansionTypes.repeat),
             )
-            result += grad / self.n_iter
-            if return_squared:
-                result_sq += grad.pow(2) / self.n_iter
+            result, result_sq = _accumulate_gradients(
+                result, result_sq, grad, self.n_iter, return_squared)
         if return_squared:
             return result, result_sq
         return result
@@ -153,10 +201,12 @@ class LayerSmoothGradient(LayerGradient):
         attr_output=None,
         create_graph=None,
         retain_graph=None,
+        max_batch_size: Optional[int]=None,
     ) -> None:
         super().__init__(model, layer, composite, attr_output, create_graph, retain_graph)
         self.noise_level = noise_level
         self.n_iter = n_iter
+        self.max_batch_size = max_batch_size
 
     def grad(self, forward_args, targets, noise_fn, additional_forward_args=None):
         forward_args = self._process_forward_args_before_grad(forward_args)
@@ -185,33 +235,82 @@ class LayerSmoothGradient(LayerGradient):
 
         # forward to the layer
         forward_args = format_into_tuple(forward_args)
-        for i in range(self.n_iter):
-            noise_fn = torch.zeros_like if i == self.n_iter - 1 else torch.randn_like
+        bsz = len(forward_args[0])
+        results, results_sq = None, None
+        for start, stop in _iter_chunks(self.n_iter, bsz, self.max_batch_size):
+            n_copies = stop - start
+            # noisy copies are stacked along the batch dimension, and the last copy is noise-free
+            noise_fn = _copy_noise_fn(n_copies, bsz, last_noise_free=stop == self.n_iter)
             grads = self.grad(
-                forward_args,
-                targets,
+                tuple(
+                    _expand_additional_forward_args(forward_args, n_copies, ExpansionTypes.repeat)
+                ),
+                _expand_target(targets, n_copies, ExpansionTypes.repeat),
                 noise_fn,
-                additional_forward_args=additional_forward_args,
+                additional_forward_args=_expand_additional_forward_args(
+                    additional_forward_args, n_copies, ExpansionTypes.repeat),
+            )
+            grads = tuple(
+                grad.view(n_copies, bsz, *grad.shape[1:])
+                for grad in format_into_tuple(grads)
             )
-            if i == 0:
-                results = tuple(grad/self.n_iter for grad in grads)
-                if return_squared:
-                    results_sq = tuple(grad.pow(2)/self.n_iter for grad in grads)
-                continue
-            results = tuple(
-                result+grad/self.n_iter
-                for result, grad in zip(results, grads)
+            summed = tuple(grad.sum(0) / self.n_iter for grad in grads)
+            results = summed if results is None else tuple(
+                result + grad for result, grad in zip(results, summed)
             )
             if return_squared:
-                results_sq = tuple(
-                    result_sq+grad.pow(2)/self.n_iter
-                    for result_sq, grad in zip(results, grads)
+                summed_sq = tuple(grad.pow(2).sum(0) / self.n_iter for grad in grads)
+                results_sq = summed_sq if results_sq is None else tuple(
+                    result_sq + grad_sq for result_sq, grad_sq in zip(results_sq, summed_sq)
                 )
         if return_squared:
             return results, results_sq
         return results
 
 
+@compiled
+def _noisy_copies(inputs: Tensor, std: Tensor, n_copies: int, last_noise_free: bool) -> Tensor:
+    # copies of inputs stacked along the batch dimension
+    epsilon = torch.randn(
+        (n_copies, *inputs.shape), dtype=inputs.dtype, device=inputs.device,
+    ) * std
+    if last_noise_free:
+        # the last copy is noise-free
+        epsilon[-1] = 0.
+    return (inputs.unsqueeze(0) + epsilon).flatten(0, 1)
+
+
+@compiled
+def _accumulate_gradients(
+    result: Tensor,
+    result_sq: Tensor,
+    grad: Tensor,
+    n_iter: int,
+    return_squared: bool,
+) -> Tuple[Tensor, Tensor]:
+    grad = grad.view(-1, *result.shape)
+    result = result + grad.sum(0) / n_iter
+    if return_squared:
+        result_sq = result_sq + grad.pow(2).sum(0) / n_iter
+    return result, result_sq
+
+
+def _iter_chunks(n_iter: int, bsz: int, max_batch_size: Optional[int]=None):
+    # yields ranges of noisy copies forwarded together
+    n_copies = 1 if max_batch_size is None else max(1, max_batch_size // max(bsz, 1))
+    for start in range(0, n_iter, n_copies):
+        yield start, min(start + n_copies, n_iter)
+
+
+def _copy_noise_fn(n_copies: int, bsz: int, last_noise_free: bool) -> Callable[[Tensor], Tensor]:
+    def noise_fn(x: Tensor) -> Tensor:
+        noise = torch.randn_like(x)
+        if last_noise_free:
+            noise.view(n_copies, bsz, *x.shape[1:])[-1] = 0.
+        return noise
+    return noise_fn
+
+
 def _forward_layer_distributed_eval_with_noise(
     forward_fn: Callable,
     inputs: Any,
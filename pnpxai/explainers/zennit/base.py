@@ -1,8 +1,11 @@
-from typing import Callable, Optional, Tuple, Union
+from typing import Any, Callable, Optional, Tuple, Union
+import threading
 
 from torch import Tensor
 from torch.nn import Module
+from zennit.attribution import Attributor
 
+from pnpxai.core.detector import ModelGraph
 from ..base import Explainer
 
 
@@ -17,6 +20,7 @@ class ZennitExplainer(Explainer):
     ) -> None:
         super().__init__(model, forward_arg_extractor, additional_forward_arg_extractor)
         self.n_classes = n_classes
+        self._active_session: Optional['ExplainerSession'] = None
 
 
     def __init_subclass__(cls) -> None:
@@ -24,15 +28,77 @@ class ZennitExplainer(Explainer):
         return super().__init_subclass__()
 
 
+class ExplainerSession:
+    """
+    A long-lived attribution session of a zennit explainer. The composite of its attributor is
+    registered once when the session opens, i.e. canonizers are applied, modules are converted and
+    hooks are registered, and stays registered across `attribute` calls until the session closes.
+
+    While open, `attribute` of the explainer itself is also served by the session. Since the model
+    carries the hooks of the composite meanwhile, other explainers must not use the model until
+    the session is closed.
+
+    Example:
+        with explainer.session() as session:
+            for inputs, targets in batches:
+                attrs = session.attribute(inputs, targets)
+
+    Parameters:
+        explainer (ZennitExplainer): The explainer whose arguments are extracted from inputs.
+        attributor (Attributor): The attributor with the composite to register.
+    """
+
+    def __init__(self, explainer: ZennitExplainer, attributor: Attributor):
+        self.explainer = explainer
+        self.attributor = attributor
+        self._lock = threading.Lock()
+        self._is_open = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._is_open
+
+    def open(self) -> 'ExplainerSession':
+        with self._lock:
+            if not self._is_open:
+                self.attributor.__enter__()
+                self._is_open = True
+                self.explainer._active_session = self
+        return self
+
+    def close(self):
+        with self._lock:
+            if self._is_open:
+                self.attributor.__exit__(None, None, None)
+                self._is_open = False
+                if self.explainer._active_session is self:
+                    self.explainer._active_session = None
+
+    def __enter__(self) -> 'ExplainerSession':
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def attribute(
+        self,
+        inputs: Union[Tensor, Tuple[Tensor]],
+        targets: Tensor,
+    ) -> Any:
+        assert self._is_open, "The session is closed."
+        forward_args, additional_forward_args = self.explainer._extract_forward_args(inputs)
+        with self._lock:
+            return self.attributor.forward(forward_args, targets, additional_forward_args)
+
+
 def set_n_classes_before(func):
     def wrapper(*args, **kwargs):
         self = args[0]
         if self.n_classes is None:
-            inputs = kwargs.get("inputs") or args[1]
+            inputs = kwargs["inputs"] if "inputs" in kwargs else args[1]
             if isinstance(inputs, Tensor):
                 inputs = (inputs,)
-            if self.n_classes is None:
-                outputs = self.model(*inputs)
-                self.n_classes = outputs.shape[-1]
+            # inferred once per model rather than by a forward of every call
+            self.n_classes = ModelGraph.of(self.model).n_classes(inputs)
         return func(*args, **kwargs)
     return wrapper
\ No newline at end of file
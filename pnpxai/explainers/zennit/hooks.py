@@ -1,4 +1,6 @@
-from zennit.core import RemovableHandleList, RemovableHandle, Hook, BasicHook
+from typing import List, Optional, Sequence
+
+from zennit.core import RemovableHandleList, RemovableHandle, Hook, BasicHook, Composite
 
 class HookWithKwargs(Hook):
     '''Base class for hooks to be used to compute layer-wise attributions.'''
@@ -30,3 +32,69 @@ class BasicHookWithRelevanceModifier(BasicHook):
     ) -> None:
         pass
 
+
+class RuleSelector:
+    '''Index of the composite whose rules apply to the current backward pass of multiplexed hooks.'''
+    def __init__(self):
+        self.index = 0
+
+
+class MultiplexHook(Hook):
+    '''Hooks of several composites for the same module, registered once. Forward states are stored by
+    all hooks, while every backward pass is dispatched to the hook of the composite selected by `selector`, or
+    passes the gradient through if that composite has no hook for the module.'''
+    def __init__(self, hooks: Sequence[Optional[Hook]], selector: RuleSelector):
+        super().__init__()
+        self.hooks = list(hooks)
+        self.selector = selector
+
+    def forward(self, module, input, output):
+        for hook in self.hooks:
+            if hook is not None:
+                hook.forward(module, input, output)
+
+    def backward(self, module, grad_input, grad_output):
+        hook = self.hooks[self.selector.index]
+        if hook is None:
+            return None
+        return hook.backward(module, grad_input, grad_output)
+
+    def copy(self):
+        return MultiplexHook(
+            [hook.copy() if hook is not None else None for hook in self.hooks],
+            self.selector,
+        )
+
+    def remove(self):
+        for hook in self.hooks:
+            if hook is not None:
+                hook.stored_tensors.clear()
+        super().remove()
+
+
+class MultiplexComposite(Composite):
+    '''A composite registering `MultiplexHook`s of several composites, so that relevances of all of them are
+    computed from a single forward pass. Canonizers of the first composite are shared by all composites, which
+    therefore must have canonizers of the same types.'''
+    def __init__(self, composites: List[Composite], selector: RuleSelector):
+        super().__init__(module_map=self._multiplex_module_map, canonizers=composites[0].canonizers)
+        self.composites = composites
+        self.selector = selector
+        self._contexts = [{} for _ in composites]
+
+    def register(self, module):
+        self._contexts = [{} for _ in self.composites]
+        super().register(module)
+
+    def _multiplex_module_map(self, ctx, name, module):
+        templates = [
+            composite.module_map(composite_ctx, name, module)
+            for composite, composite_ctx in zip(self.composites, self._contexts)
+        ]
+        if all(template is None for template in templates):
+            return None
+        for template in templates:
+            if template is not None and type(template).register is not Hook.register:
+                raise NotImplementedError(
+                    f"{type(template).__name__} registers custom hooks and cannot be multiplexed.")
+        return MultiplexHook(templates, self.selector)
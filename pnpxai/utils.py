@@ -1,4 +1,9 @@
 import random
+import hashlib
+import functools
+import threading
+import warnings
+import weakref
 from io import TextIOWrapper
 from contextlib import contextmanager
 from typing import Sequence, Callable, Any, Union, Optional, Tuple, TypeVar
@@ -80,6 +85,28 @@ def map_recursive(data, func: Callable):
     return data
 
 
+def select_batch(data, indices: Tensor, bsz: Optional[int] = None):
+    # selects samples of batched tensors, leaving scalars and other objects as they are. If `bsz`
+    # is given, tensors of another leading dimension are shared by all samples and left too
+    return map_recursive(
+        data,
+        lambda t: t[indices.to(t.device)]
+        if t.dim() > 0 and (bsz is None or len(t) == bsz) else t,
+    )
+
+
+def tensor_fingerprint(*tensors: Tensor) -> str:
+    """
+    Returns a digest of shapes, dtypes and contents of tensors.
+    """
+    digest = hashlib.sha1()
+    for tensor in tensors:
+        tensor = tensor.detach().cpu().contiguous()
+        digest.update(f"{tuple(tensor.shape)}:{tensor.dtype};".encode())
+        digest.update(tensor.reshape(-1).view(torch.uint8).numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
 def to_device(data, device: torch.device):
     return map_recursive(data, lambda x: x.to(device))
 
@@ -120,3 +147,94 @@ def format_into_tuple_all(**kwargs):
     return {k: format_into_tuple(v) for k, v in kwargs.items()}
 
 
+
+
+_compile_mode = threading.local()
+
+
+def is_compile_enabled() -> bool:
+    return getattr(_compile_mode, 'enabled', False)
+
+
+@contextmanager
+def compile_mode(enabled: bool = True):
+    """
+    Runs kernels wrapped by `compiled` and model forwards of `compiled_model` compiled by
+    `torch.compile` within the context, e.g. inner loops of smooth gradients, pixel flipping and
+    rollouts.
+    """
+    prev = is_compile_enabled()
+    _compile_mode.enabled = enabled
+    try:
+        yield
+    finally:
+        _compile_mode.enabled = prev
+
+
+class CompiledFunction:
+    """
+    A function compiled by `torch.compile` on its first call in the compile mode, and called
+    eagerly otherwise.
+
+    If torch has no `torch.compile` or the compiled function fails, e.g. as its graph breaks on
+    hooks, a warning is issued once and the function is called eagerly from then on, so that
+    errors of the function itself are raised by the eager call.
+
+    Parameters:
+        fn (Callable): The function to compile.
+        **compile_kwargs: Keyword arguments of `torch.compile`.
+    """
+
+    def __init__(self, fn: Callable, **compile_kwargs):
+        self.fn = fn
+        self.compile_kwargs = compile_kwargs
+        self._compiled: Optional[Callable] = None
+        self._failed = not hasattr(torch, 'compile')
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        if not is_compile_enabled() or self._failed:
+            return self.fn(*args, **kwargs)
+        with self._lock:
+            if self._compiled is None:
+                self._compiled = torch.compile(self.fn, **self.compile_kwargs)
+        try:
+            return self._compiled(*args, **kwargs)
+        except Exception as e:
+            self._failed = True
+            warnings.warn(
+                f"[CompiledFunction] Falling back to eager {self.fn!r}: {type(e).__name__}: {e}")
+            return self.fn(*args, **kwargs)
+
+
+def compiled(fn: Optional[Callable] = None, **compile_kwargs):
+    """
+    Wraps a function by `CompiledFunction`, usable as a decorator with or without arguments.
+    """
+    if fn is None:
+        return lambda fn: CompiledFunction(fn, **compile_kwargs)
+    return CompiledFunction(fn, **compile_kwargs)
+
+
+def _call_model(model: nn.Module, *args, **kwargs):
+    return model(*args, **kwargs)
+
+
+# a kernel per model, so that a model failing to compile falls back alone. Models are weak keys
+# and arguments rather than closures, so that no model is kept alive by its kernel
+_compiled_call_models = weakref.WeakKeyDictionary()
+_compiled_call_models_lock = threading.Lock()
+
+
+def compiled_model(model: nn.Module) -> Callable:
+    """
+    Returns the forward of a model, compiled in the compile mode. Compiled graphs are cached by
+    torch per model, so the forward is compiled once.
+    """
+    if not is_compile_enabled():
+        return model
+    with _compiled_call_models_lock:
+        kernel = _compiled_call_models.get(model)
+        if kernel is None:
+            kernel = _compiled_call_models[model] = CompiledFunction(_call_model)
+    return functools.partial(kernel, model)
@@ -0,0 +1,43 @@
+import pytest
+import torch
+from torch import nn
+
+from pnpxai.explainers.perturbation import PerturbationEngine
+
+
+def _devices():
+    devices = ['cpu']
+    if torch.cuda.is_available():
+        devices.append('cuda')
+    return devices
+
+
+@pytest.mark.parametrize('device', _devices())
+@pytest.mark.parametrize('method', ['lime', 'kernel_shap'])
+def test_perturbation_engine_on_device(device, method):
+    torch.manual_seed(0)
+    model = nn.Sequential(nn.Flatten(), nn.Linear(3 * 8 * 8, 5)).to(device).eval()
+    inputs = torch.randn(2, 3, 8, 8, device=device)
+    baselines = torch.zeros_like(inputs)
+    feature_masks = torch.arange(16, device=device).view(1, 1, 4, 4)
+    feature_masks = feature_masks.repeat_interleave(2, -1).repeat_interleave(2, -2)
+    feature_masks = feature_masks.expand(2, 3, 8, 8)
+    targets = torch.tensor([0, 3], device=device)
+
+    engine = PerturbationEngine(model, batch_size=16)
+    attrs, = getattr(engine, method)(
+        (inputs,), targets, (baselines,), (feature_masks,), n_samples=40)
+
+    assert attrs.shape == inputs.shape
+    assert attrs.device == inputs.device
+    assert torch.isfinite(attrs).all()
+
+
+def test_perturbation_engine_requires_targets_of_several_outputs():
+    model = nn.Sequential(nn.Flatten(), nn.Linear(3 * 4 * 4, 5)).eval()
+    inputs = torch.randn(2, 3, 4, 4)
+    feature_masks = torch.arange(16).view(1, 1, 4, 4).expand(2, 3, 4, 4)
+
+    engine = PerturbationEngine(model)
+    with pytest.raises(ValueError):
+        engine.lime((inputs,), None, (torch.zeros_like(inputs),), (feature_masks,), n_samples=10)
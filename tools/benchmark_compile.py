@@ -0,0 +1,100 @@
+"""
+Benchmarks kernels of explainers and metrics run eagerly and in the compile mode.
+
+    python tools/benchmark_compile.py --device cpu --repeats 20
+
+Reports the median time of each kernel in both modes and the speedup. Compilation happens in
+warmup runs, which are not timed.
+"""
+import argparse
+import statistics
+import time
+
+import torch
+from torch import nn
+
+from pnpxai.utils import set_seed, compile_mode
+from pnpxai.explainers import SmoothGrad
+from pnpxai.explainers.attention_rollout import _rollout_step, rollout_min_head_fusion_function
+from pnpxai.explainers.utils.baselines import ZeroBaselineFunction
+from pnpxai.evaluator.metrics import AbPC
+
+
+def _small_cnn(n_classes: int = 10) -> nn.Module:
+    return nn.Sequential(
+        nn.Conv2d(3, 16, 3, padding=1),
+        nn.ReLU(),
+        nn.Conv2d(16, 16, 3, padding=1),
+        nn.ReLU(),
+        nn.AdaptiveAvgPool2d(4),
+        nn.Flatten(),
+        nn.Linear(16 * 16, n_classes),
+    )
+
+
+def _time(fn, repeats: int, warmup: int, device: torch.device) -> float:
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeats):
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        start = time.perf_counter()
+        fn()
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--image-size', type=int, default=32)
+    parser.add_argument('--n-layers', type=int, default=12)
+    parser.add_argument('--n-tokens', type=int, default=197)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=3)
+    args = parser.parse_args()
+
+    set_seed(0)
+    device = torch.device(args.device)
+    model = _small_cnn().to(device).eval()
+    inputs = torch.randn(args.batch_size, 3, args.image_size, args.image_size, device=device)
+    targets = model(inputs).argmax(-1)
+
+    smooth_grad = SmoothGrad(model, n_iter=20, max_batch_size=4 * args.batch_size)
+    attrs = smooth_grad.attribute(inputs, targets).sum(1)
+    abpc = AbPC(
+        model, smooth_grad, n_steps=20,
+        baseline_fn=ZeroBaselineFunction(),
+    )
+    attn_weights = [
+        torch.rand(args.batch_size, 12, args.n_tokens, args.n_tokens, device=device).softmax(-1)
+        for _ in range(args.n_layers)
+    ]
+    eye = torch.eye(args.n_tokens, device=device).repeat(args.batch_size, 1, 1)
+
+    def rollout():
+        result = eye
+        for weights in attn_weights:
+            result = _rollout_step(result, weights, rollout_min_head_fusion_function, .9)
+        return result
+
+    kernels = {
+        'SmoothGrad.attribute': lambda: smooth_grad.attribute(inputs, targets),
+        'AbPC.evaluate': lambda: abpc.evaluate(inputs, targets, attrs),
+        'AttentionRollout.rollout': rollout,
+    }
+
+    print(f"{'kernel':<28}{'eager (ms)':>12}{'compiled (ms)':>16}{'speedup':>10}")
+    for name, fn in kernels.items():
+        eager = _time(fn, args.repeats, args.warmup, device)
+        with compile_mode():
+            compiled = _time(fn, args.repeats, args.warmup, device)
+        print(f"{name:<28}{eager * 1e3:>12.2f}{compiled * 1e3:>16.2f}{eager / compiled:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()